@@ -0,0 +1,111 @@
+"""CloudWatch Logs subscription handler for the RDS slow query log.
+
+Parses each delivered batch, groups the entries by fingerprint and publishes per-fingerprint count,
+latency and rows examined to CloudWatch, then adds the same totals to the fingerprint's DynamoDB item.
+"""
+import base64
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import boto3
+from botocore.exceptions import ClientError
+
+from slowlog import aggregate, parse
+
+NAMESPACE = os.environ.get("METRIC_NAMESPACE", "WebApp/SlowQueries")
+TABLE_NAME = os.environ["FINGERPRINT_TABLE"]
+# PutMetricData takes at most 1000 datums per call
+MAX_DATUMS = 1000
+# Keep sample statements well under the 400 KB DynamoDB item limit
+MAX_SAMPLE_LENGTH = 4000
+
+cloudwatch = boto3.client("cloudwatch")
+table = boto3.resource("dynamodb").Table(TABLE_NAME)
+
+
+def decode(event: dict) -> dict:
+    return json.loads(gzip.decompress(base64.b64decode(event["awslogs"]["data"])))
+
+
+def instance_identifier(log_group: str) -> str:
+    """/aws/rds/instance/<identifier>/slowquery -> <identifier>"""
+    parts = log_group.strip("/").split("/")
+    return parts[3] if len(parts) > 3 else log_group
+
+
+def metric_data(stats: dict, instance: str, timestamp: datetime) -> list:
+    data = []
+    for key, item in stats.items():
+        dimensions = [
+            {"Name": "DBInstanceIdentifier", "Value": instance},
+            {"Name": "Fingerprint", "Value": key},
+        ]
+        data.append({"MetricName": "QueryCount", "Dimensions": dimensions, "Timestamp": timestamp,
+                     "Value": item.count, "Unit": "Count"})
+        data.append({"MetricName": "QueryTime", "Dimensions": dimensions, "Timestamp": timestamp, "Unit": "Seconds",
+                     "StatisticValues": {"SampleCount": item.count, "Sum": item.total_time,
+                                         "Minimum": item.min_time,
+                                         "Maximum": item.max_time}})
+        data.append({"MetricName": "RowsExamined", "Dimensions": dimensions, "Timestamp": timestamp,
+                     "Value": item.total_rows_examined, "Unit": "Count"})
+    return data
+
+
+def record(key: str, item, instance: str, seen_at: int):
+    table.update_item(
+        Key={"fingerprintId": key},
+        UpdateExpression=("SET fingerprint = :fingerprint, sampleQuery = :sample, dbInstance = :instance, "
+                          "lastSeen = :seen ADD queryCount :count, totalQueryTime :time, "
+                          "totalLockTime :lock, totalRowsExamined :rows"),
+        ExpressionAttributeValues={
+            ":fingerprint": item.fingerprint,
+            ":sample": item.sample[:MAX_SAMPLE_LENGTH],
+            ":instance": instance,
+            ":seen": seen_at,
+            ":count": item.count,
+            ":time": decimal(item.total_time),
+            ":lock": decimal(item.total_lock_time),
+            ":rows": item.total_rows_examined,
+        })
+    try:
+        table.update_item(
+            Key={"fingerprintId": key},
+            UpdateExpression="SET maxQueryTime = :max",
+            ConditionExpression="attribute_not_exists(maxQueryTime) OR maxQueryTime < :max",
+            ExpressionAttributeValues={":max": decimal(item.max_time)})
+    except ClientError as error:
+        if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def decimal(value: float) -> Decimal:
+    """DynamoDB numbers must be Decimals, not floats."""
+    return Decimal(str(round(value, 6)))
+
+
+def lambda_handler(event, context):
+    payload = decode(event)
+    if payload.get("messageType") != "DATA_MESSAGE":
+        return {"entries": 0}
+
+    entries = []
+    for log_event in payload["logEvents"]:
+        entries.extend(parse(log_event["message"]))
+    if not entries:
+        return {"entries": 0}
+
+    instance = instance_identifier(payload["logGroup"])
+    newest = max(log_event["timestamp"] for log_event in payload["logEvents"])
+    timestamp = datetime.fromtimestamp(newest / 1000, tz=timezone.utc)
+    stats = aggregate(entries)
+
+    data = metric_data(stats, instance, timestamp)
+    for start in range(0, len(data), MAX_DATUMS):
+        cloudwatch.put_metric_data(Namespace=NAMESPACE, MetricData=data[start:start + MAX_DATUMS])
+    for key, item in stats.items():
+        record(key, item, instance, item.last_seen or newest // 1000)
+
+    return {"entries": len(entries), "fingerprints": len(stats)}
@@ -0,0 +1,167 @@
+"""Parse MariaDB/MySQL slow query log entries and reduce statements to fingerprints.
+
+A fingerprint is the statement with literals, whitespace, comments and case normalised away, so
+`SELECT * FROM t WHERE id = 42` and `select *  from t where id=7` count as the same query.
+Standard library only, so the module runs unchanged in Lambda and on a laptop.
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+
+# "# Key: value" lines; MariaDB adds more of them than MySQL, depending on log_slow_verbosity
+HEADER = re.compile(r"^# [\w@]+: ")
+# Lines that always open a new entry
+ENTRY_START = re.compile(r"^# (Time|User@Host): ")
+FIELD = re.compile(r"(\w+): +(\S+)")
+USER_HOST = re.compile(r"^# User@Host: (?P<user>[^\[\s]*)\[[^\]]*\] @ *(?P<host>\S*) *\[(?P<ip>[^\]]*)\]")
+SET_TIMESTAMP = re.compile(r"^SET timestamp=(\d+);\s*$", re.IGNORECASE)
+USE_DATABASE = re.compile(r"^use `?([^`;\s]+)`?;\s*$", re.IGNORECASE)
+# Startup banners the server writes at the top of every slow log file
+BANNER = re.compile(r"^(/\S+, Version: |Tcp port: |Time +Id Command)")
+
+# String literals and comments, matched in one left-to-right scan so a `#`, `--` or `/*` inside a
+# literal is not taken for a comment, nor a quote inside a comment for a literal
+LITERAL_OR_COMMENT = re.compile(
+    r"(?P<literal>'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\")"
+    r"|(?P<comment>/\*.*?\*/|(?:--(?=\s|$)|#)[^\n]*)",
+    re.DOTALL)
+# Applied in order by fingerprint(), after LITERAL_OR_COMMENT
+NORMALISATIONS = [
+    (re.compile(r"\b0x[0-9a-f]+\b"), "?"),
+    (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\s*([(),=<>!+*/-])\s*"), r"\1"),
+    (re.compile(r"\b(in|values)\s*\((?:\?,)*\?\)(?:,\((?:\?,)*\?\))*"), r"\1(?+)"),
+    (re.compile(r"\blimit \?(?:,\?| offset \?)?"), "limit ?"),
+]
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    query_time: float
+    lock_time: float = 0.0
+    rows_sent: int = 0
+    rows_examined: int = 0
+    user: str = ""
+    host: str = ""
+    database: str = ""
+    # Epoch seconds from the entry's SET timestamp, when it has one
+    timestamp: int = None
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.statement)
+
+    @property
+    def fingerprint_id(self) -> str:
+        return fingerprint_id(self.fingerprint)
+
+
+@dataclass
+class FingerprintStats:
+    fingerprint: str
+    sample: str
+    count: int = 0
+    total_time: float = 0.0
+    min_time: float = None
+    max_time: float = 0.0
+    total_lock_time: float = 0.0
+    total_rows_examined: int = 0
+    databases: set = field(default_factory=set)
+    last_seen: int = None
+
+    def add(self, query: SlowQuery):
+        self.count += 1
+        self.total_time += query.query_time
+        self.min_time = query.query_time if self.min_time is None else min(self.min_time, query.query_time)
+        self.max_time = max(self.max_time, query.query_time)
+        self.total_lock_time += query.lock_time
+        self.total_rows_examined += query.rows_examined
+        if query.database:
+            self.databases.add(query.database)
+        if query.timestamp is not None:
+            self.last_seen = max(self.last_seen or 0, query.timestamp)
+
+
+def fingerprint(statement: str) -> str:
+    text = LITERAL_OR_COMMENT.sub(lambda m: "?" if m.group("literal") else " ", statement.strip().rstrip(";"))
+    text = text.lower()
+    for pattern, replacement in NORMALISATIONS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def fingerprint_id(fingerprint_text: str) -> str:
+    """Short stable id, usable as a CloudWatch dimension and DynamoDB key."""
+    return hashlib.sha1(fingerprint_text.encode()).hexdigest()[:16]
+
+
+def parse(text: str) -> list:
+    """Every complete entry in `text`, which may be a whole log file or a single CloudWatch log event."""
+    entries, headers, statement = [], [], []
+    database = ""
+
+    def flush():
+        nonlocal headers, statement
+        if statement and any(line.startswith("# Query_time:") for line in headers):
+            entries.append(build_entry(headers, statement, database))
+        headers, statement = [], []
+
+    for line in text.splitlines():
+        if HEADER.match(line):
+            if statement or (ENTRY_START.match(line) and any(h.startswith("# Query_time:") for h in headers)):
+                flush()
+            headers.append(line)
+        elif BANNER.match(line) or not line.strip():
+            continue
+        elif headers or statement:
+            use = USE_DATABASE.match(line)
+            if use and not statement:
+                database = use.group(1)
+            else:
+                statement.append(line)
+    flush()
+    return entries
+
+
+def build_entry(headers: list, statement_lines: list, database: str) -> SlowQuery:
+    fields, user, host = {}, "", ""
+    for line in headers:
+        match = USER_HOST.match(line)
+        if match:
+            user, host = match.group("user"), match.group("ip") or match.group("host")
+            continue
+        fields.update(FIELD.findall(line))
+
+    timestamp = None
+    lines = []
+    for line in statement_lines:
+        match = SET_TIMESTAMP.match(line)
+        if match:
+            timestamp = int(match.group(1))
+        else:
+            lines.append(line)
+
+    return SlowQuery(
+        statement="\n".join(lines).strip(),
+        query_time=float(fields.get("Query_time", 0)),
+        lock_time=float(fields.get("Lock_time", 0)),
+        rows_sent=int(fields.get("Rows_sent", 0)),
+        rows_examined=int(fields.get("Rows_examined", 0)),
+        user=user,
+        host=host,
+        database=fields.get("Schema") or database,
+        timestamp=timestamp,
+    )
+
+
+def aggregate(entries: list) -> dict:
+    """fingerprint id -> FingerprintStats over `entries`."""
+    stats = {}
+    for entry in entries:
+        key = entry.fingerprint_id
+        if key not in stats:
+            stats[key] = FingerprintStats(fingerprint=entry.fingerprint, sample=entry.statement)
+        stats[key].add(entry)
+    return stats
@@ -0,0 +1 @@
+"""Importable building blocks of the aws-infrastructure-setup Pulumi program."""
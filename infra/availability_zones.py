@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import time
+
+import pulumi
+from pulumi_aws import get_availability_zones
+
+CACHE_DIR_ENV = "PULUMI_AZ_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aws-infrastructure-setup")
+CACHE_FILE = "availability-zones.json"
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+
+def cache_path() -> str:
+    return os.path.join(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR), CACHE_FILE)
+
+
+def read_cache(key: str, ttl: int, now: float = None) -> list:
+    """Return the cached zone names for `key`, or None when missing, unreadable or older than `ttl` seconds."""
+    try:
+        with open(cache_path()) as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+    if not entry:
+        return None
+    if (now if now is not None else time.time()) - entry["fetched_at"] > ttl:
+        return None
+    return entry["names"]
+
+
+def write_cache(key: str, names: list, now: float = None):
+    """Store `names` under `key`, replacing the cache file atomically so concurrent stacks never see it half written."""
+    path = cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    entries[key] = {"names": names, "fetched_at": now if now is not None else time.time()}
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(entries, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def resolve_availability_zones(config: pulumi.Config) -> list:
+    """Resolve the availability zones to spread subnets over as a plain list.
+
+    Explicit `availabilityZones` from stack config win. Otherwise the zones come from a
+    local cache keyed by region and account, and `get_availability_zones()` is only
+    invoked when that cache misses or has expired.
+    """
+    count = config.get_int("availabilityZoneCount") or 3
+
+    explicit = config.get_object("availabilityZones")
+    if explicit:
+        return list(explicit)[0:count]
+
+    ttl = config.get_int("availabilityZoneCacheTtl")
+    ttl = DEFAULT_CACHE_TTL if ttl is None else ttl
+    key = f"{config.require('region')}:{config.require('account_id')}"
+
+    names = read_cache(key, ttl)
+    if names is None:
+        names = get_availability_zones().names
+        write_cache(key, names)
+
+    return names[0:count]
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2
+
+from infra.network import Network
+from infra.security import SecurityGroups
+
+DEFAULT_CACHE = {
+    "enabled": False,
+    "nodeType": "cache.t4g.micro",
+    "engineVersion": "7.1",
+    "family": "redis7",
+    # More than one shard switches the replication group to cluster mode
+    "shards": 1,
+    "replicasPerShard": 1,
+    "parameters": {
+        "maxmemory-policy": "allkeys-lru",
+    },
+    "snapshotRetentionLimit": 0,
+}
+REDIS_PORT = 6379
+
+
+class CacheConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Cache:
+    replication_group: aws.elasticache.ReplicationGroup
+    security_group: ec2.SecurityGroup
+    # host the web app connects to: the configuration endpoint in cluster mode, the primary otherwise
+    endpoint: pulumi.Output
+    # host for read-only commands: the reader endpoint, or the configuration endpoint in cluster mode
+    reader_endpoint: pulumi.Output
+
+
+def load_cache_config(config: pulumi.Config) -> dict:
+    overrides = config.get_object("cache") or {}
+    settings = {**DEFAULT_CACHE, **overrides}
+    settings["parameters"] = {**DEFAULT_CACHE["parameters"], **overrides.get("parameters", {})}
+    if not 1 <= settings["shards"] <= 500:
+        raise CacheConfigError("cache.shards must be between 1 and 500")
+    if not 0 <= settings["replicasPerShard"] <= 5:
+        raise CacheConfigError("cache.replicasPerShard must be between 0 and 5")
+    if settings["shards"] > 1 and settings["replicasPerShard"] == 0:
+        raise CacheConfigError("cluster mode needs at least one replica per shard for automatic failover")
+    return settings
+
+
+def create_cache(config: pulumi.Config, network: Network, security_groups: SecurityGroups):
+    """Create the Redis replication group in the private subnets, or return None when disabled."""
+    settings = load_cache_config(config)
+    if not settings["enabled"]:
+        return None
+
+    cluster_mode = settings["shards"] > 1
+
+    # Only the web app may reach the cache
+    cache_security_group = ec2.SecurityGroup('cache-security-group',
+        vpc_id=network.vpc.id,
+        description='Security Group for the Redis cache',
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol='tcp',
+                from_port=REDIS_PORT,
+                to_port=REDIS_PORT,
+                security_groups=[security_groups.app.id]
+            )
+        ],
+        tags={"Name": "cache-security-group"})
+
+    cache_subnet_group = aws.elasticache.SubnetGroup('cache-subnet-group',
+        description='Private subnets for the Redis cache',
+        subnet_ids=[subnet.id for subnet in network.private_subnets])
+
+    parameters = dict(settings["parameters"])
+    if cluster_mode:
+        parameters["cluster-enabled"] = "yes"
+
+    cache_parameter_group = aws.elasticache.ParameterGroup('cache-parameter-group',
+        family=settings["family"],
+        description='Redis parameter group for the web app cache',
+        parameters=[
+            aws.elasticache.ParameterGroupParameterArgs(name=name, value=str(value))
+            for name, value in sorted(parameters.items())
+        ])
+
+    failover = settings["replicasPerShard"] > 0
+    replication_group = aws.elasticache.ReplicationGroup('cache-replication-group',
+        description='Shared cache for the web app instances',
+        engine='redis',
+        engine_version=settings["engineVersion"],
+        node_type=settings["nodeType"],
+        port=REDIS_PORT,
+        num_node_groups=settings["shards"],
+        replicas_per_node_group=settings["replicasPerShard"],
+        automatic_failover_enabled=failover,
+        multi_az_enabled=failover,
+        parameter_group_name=cache_parameter_group.name,
+        subnet_group_name=cache_subnet_group.name,
+        security_group_ids=[cache_security_group.id],
+        at_rest_encryption_enabled=True,
+        snapshot_retention_limit=settings["snapshotRetentionLimit"],
+        apply_immediately=True)
+
+    endpoint = (replication_group.configuration_endpoint_address if cluster_mode
+                else replication_group.primary_endpoint_address)
+    # Cluster mode has no reader endpoint; cluster clients send reads to replicas through the configuration
+    # endpoint themselves
+    reader_endpoint = endpoint if cluster_mode else replication_group.reader_endpoint_address
+
+    return Cache(
+        replication_group=replication_group,
+        security_group=cache_security_group,
+        endpoint=endpoint,
+        reader_endpoint=reader_endpoint,
+    )
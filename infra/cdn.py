@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+
+DEFAULT_CDN = {
+    "enabled": False,
+    # Must be in us-east-1; defaults to certificate_arn when that one already is
+    "certificateArn": None,
+    "priceClass": "PriceClass_100",
+    # Region of the origin shield cache; defaults to the stack region
+    "originShieldRegion": None,
+    # prefixList: only CloudFront's origin-facing addresses reach lbSecurityGroup
+    # header: the listener only forwards requests carrying the secret cdnOriginSecret header
+    "originLock": ["prefixList", "header"],
+    # Everything not matched below goes to the app uncached
+    "defaultCachePolicy": "CachingDisabled",
+    "cacheBehaviors": [
+        {"pathPattern": "/static/*", "cachePolicy": "CachingOptimized"},
+    ],
+}
+# AWS managed policies; their IDs are the same in every account
+MANAGED_CACHE_POLICIES = {
+    "CachingOptimized": "658327ea-f89d-4fab-a63d-7e88639e58f6",
+    "CachingOptimizedForUncompressedObjects": "b2884449-e4de-46a7-ac36-70bc7f1ddd6d",
+    "CachingDisabled": "4135ea2d-6df8-44a3-9df3-4b5a84be39ad",
+}
+# Forwards the viewer's Host header, so the origin TLS handshake matches the ALB certificate for the domain
+ALL_VIEWER_ORIGIN_REQUEST_POLICY = "216adef6-5c7f-47e4-b989-5492eafa07d3"
+ORIGIN_FACING_PREFIX_LIST = "com.amazonaws.global.cloudfront.origin-facing"
+ORIGIN_HEADER = "X-Origin-Verify"
+ORIGIN_LOCKS = ("prefixList", "header")
+ORIGIN_ID = "appLoadBalancer"
+
+
+class CdnConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Cdn:
+    distribution: aws.cloudfront.Distribution
+    origin_secret: pulumi.Output = None
+
+
+def load_cdn_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_CDN, **(config.get_object("cdn") or {})}
+    if not settings["enabled"]:
+        return settings
+
+    settings["certificateArn"] = settings["certificateArn"] or config.require("certificate_arn")
+    if ":us-east-1:" not in settings["certificateArn"]:
+        raise CdnConfigError("CloudFront needs an ACM certificate in us-east-1; set cdn.certificateArn")
+    settings["originShieldRegion"] = settings["originShieldRegion"] or config.require("region")
+    for lock in settings["originLock"]:
+        if lock not in ORIGIN_LOCKS:
+            raise CdnConfigError(f"cdn.originLock entries must be one of {', '.join(ORIGIN_LOCKS)}")
+    if not settings["originLock"]:
+        raise CdnConfigError("cdn.originLock needs at least one lock, or the ALB stays reachable around CloudFront")
+    for behavior in [{"cachePolicy": settings["defaultCachePolicy"]}] + settings["cacheBehaviors"]:
+        if "cachePolicyId" not in behavior and behavior.get("cachePolicy") not in MANAGED_CACHE_POLICIES:
+            raise CdnConfigError(
+                f"cache policy {behavior.get('cachePolicy')} must be one of {', '.join(MANAGED_CACHE_POLICIES)}"
+                " or given as cachePolicyId")
+    return settings
+
+
+def origin_prefix_list_id(settings: dict):
+    """ID of CloudFront's origin-facing prefix list when the origin is locked to it, otherwise None."""
+    if not settings["enabled"] or "prefixList" not in settings["originLock"]:
+        return None
+    return aws.ec2.get_managed_prefix_list(name=ORIGIN_FACING_PREFIX_LIST).id
+
+
+def origin_secret(config: pulumi.Config, settings: dict):
+    """Secret header value CloudFront sends to the origin when the header lock is on."""
+    if not settings["enabled"] or "header" not in settings["originLock"]:
+        return None
+    return config.require_secret("cdnOriginSecret")
+
+
+def _cache_policy_id(behavior: dict) -> str:
+    return behavior.get("cachePolicyId") or MANAGED_CACHE_POLICIES[behavior["cachePolicy"]]
+
+
+def create_distribution(settings: dict, domain_name: str, app_lb: aws.lb.LoadBalancer, secret=None) -> Cdn:
+    """Put a CloudFront distribution with origin shield in front of the load balancer."""
+    distribution = aws.cloudfront.Distribution('cdnDistribution',
+        enabled=True,
+        is_ipv6_enabled=True,
+        http_version="http2and3",
+        aliases=[domain_name],
+        price_class=settings["priceClass"],
+        comment=f"{domain_name} in front of appLoadBalancer",
+        origins=[aws.cloudfront.DistributionOriginArgs(
+            origin_id=ORIGIN_ID,
+            domain_name=app_lb.dns_name,
+            custom_origin_config=aws.cloudfront.DistributionOriginCustomOriginConfigArgs(
+                http_port=80,
+                https_port=443,
+                origin_protocol_policy="https-only",
+                origin_ssl_protocols=["TLSv1.2"],
+                origin_keepalive_timeout=60,
+            ),
+            origin_shield=aws.cloudfront.DistributionOriginOriginShieldArgs(
+                enabled=True,
+                origin_shield_region=settings["originShieldRegion"],
+            ),
+            custom_headers=[aws.cloudfront.DistributionOriginCustomHeaderArgs(
+                name=ORIGIN_HEADER,
+                value=secret,
+            )] if secret is not None else None,
+        )],
+        default_cache_behavior=aws.cloudfront.DistributionDefaultCacheBehaviorArgs(
+            target_origin_id=ORIGIN_ID,
+            viewer_protocol_policy="redirect-to-https",
+            allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"],
+            cached_methods=["GET", "HEAD"],
+            compress=True,
+            cache_policy_id=_cache_policy_id({"cachePolicy": settings["defaultCachePolicy"]}),
+            origin_request_policy_id=ALL_VIEWER_ORIGIN_REQUEST_POLICY,
+        ),
+        ordered_cache_behaviors=[
+            aws.cloudfront.DistributionOrderedCacheBehaviorArgs(
+                path_pattern=behavior["pathPattern"],
+                target_origin_id=ORIGIN_ID,
+                viewer_protocol_policy="redirect-to-https",
+                allowed_methods=["GET", "HEAD", "OPTIONS"],
+                cached_methods=["GET", "HEAD"],
+                compress=behavior.get("compress", True),
+                cache_policy_id=_cache_policy_id(behavior),
+                origin_request_policy_id=ALL_VIEWER_ORIGIN_REQUEST_POLICY,
+            ) for behavior in settings["cacheBehaviors"]
+        ],
+        restrictions=aws.cloudfront.DistributionRestrictionsArgs(
+            geo_restriction=aws.cloudfront.DistributionRestrictionsGeoRestrictionArgs(
+                restriction_type="none",
+            ),
+        ),
+        viewer_certificate=aws.cloudfront.DistributionViewerCertificateArgs(
+            acm_certificate_arn=settings["certificateArn"],
+            ssl_support_method="sni-only",
+            minimum_protocol_version="TLSv1.2_2021",
+        ))
+
+    return Cdn(distribution=distribution, origin_secret=secret)
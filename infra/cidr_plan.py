@@ -0,0 +1,74 @@
+import ipaddress
+from dataclasses import dataclass
+
+# Tier defaults reproduce the original addressing: public x.y.1-3.0/24 and private x.y.11-13.0/24.
+# The data tier is only planned when it is configured.
+DEFAULT_TIERS = {
+    "public": {"prefixLength": 24, "offset": 1},
+    "private": {"prefixLength": 24, "offset": 11},
+}
+TIER_ORDER = ("public", "private", "data")
+
+
+class CidrPlanError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PlannedSubnet:
+    tier: str
+    index: int
+    availability_zone: str
+    cidr_block: str
+
+
+def _tier_blocks(vpc_network, tier, settings, count, taken):
+    prefix_length = int(settings.get("prefixLength", 24))
+    if prefix_length < vpc_network.prefixlen or prefix_length > 28:
+        raise CidrPlanError(
+            f"{tier}: prefixLength /{prefix_length} must be between /{vpc_network.prefixlen} and /28")
+
+    blocks = list(vpc_network.subnets(new_prefix=prefix_length))
+    offset = settings.get("offset")
+    if offset is None:
+        # Pack the tier right after the highest address already handed out.
+        end = max((int(block.broadcast_address) for block in taken), default=int(vpc_network.network_address) - 1)
+        offset = next((i for i, block in enumerate(blocks) if int(block.network_address) > end), len(blocks))
+    offset = int(offset)
+
+    if offset < 0 or offset + count > len(blocks):
+        raise CidrPlanError(
+            f"{tier}: {count} x /{prefix_length} from offset {offset} does not fit in {vpc_network}")
+    return blocks[offset:offset + count]
+
+
+def plan_subnets(vpc_cidr: str, availability_zones: list, tiers: dict = None) -> dict:
+    """Carve one subnet per availability zone for every tier out of `vpc_cidr`.
+
+    `tiers` maps tier name to {"prefixLength": int, "offset": int}; `offset` is the index of the
+    tier's first block among all blocks of that size in the VPC and is packed after the previous
+    tiers when omitted. Returns {tier: [PlannedSubnet, ...]} and raises CidrPlanError when a tier
+    does not fit or two subnets overlap.
+    """
+    vpc_network = ipaddress.ip_network(vpc_cidr)
+    tiers = dict(DEFAULT_TIERS if tiers is None else tiers)
+    unknown = set(tiers) - set(TIER_ORDER)
+    if unknown:
+        raise CidrPlanError(f"unknown subnet tiers: {', '.join(sorted(unknown))}")
+
+    plan = {}
+    taken = []
+    for tier in TIER_ORDER:
+        if tier not in tiers:
+            continue
+        blocks = _tier_blocks(vpc_network, tier, tiers[tier], len(availability_zones), taken)
+        for block in blocks:
+            clash = next((other for other in taken if block.overlaps(other)), None)
+            if clash is not None:
+                raise CidrPlanError(f"{tier}: {block} overlaps {clash}")
+            taken.append(block)
+        plan[tier] = [
+            PlannedSubnet(tier=tier, index=index, availability_zone=az, cidr_block=str(block))
+            for index, (az, block) in enumerate(zip(availability_zones, blocks))
+        ]
+    return plan
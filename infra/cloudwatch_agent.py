@@ -0,0 +1,143 @@
+import json
+
+import pulumi
+import pulumi_aws as aws
+
+from infra.db_logs import RETENTION_DAYS
+
+DEFAULT_CLOUDWATCH_AGENT = {
+    # Off keeps the CloudWatchAgent.json baked into the AMI, including the log files it collects;
+    # the generated config replaces that file and only collects what logFiles lists
+    "enabled": False,
+    # Seconds between samples; below 60 the metrics are stored as high resolution
+    "interval": 10,
+    "diskPaths": ["/"],
+    # Command-line patterns of the processes to watch individually
+    "processes": ["/opt/webapp"],
+    # UDP port of the StatsD listener the web app reports request latency to
+    "statsdPort": 8125,
+    # Log files to ship, each {"path": ..., "logGroup": ..., "retentionDays": ...}; streams are named by instance ID
+    "logFiles": [],
+}
+NAMESPACE = "CWAgent"
+# StatsD timer the web app reports per request, in milliseconds
+REQUEST_LATENCY_METRIC = "webapp.request.latency"
+MEMORY_METRIC = "mem_used_percent"
+# The agent only reads parameters under this prefix with CloudWatchAgentServerPolicy
+PARAMETER_PREFIX = "AmazonCloudWatch-"
+HIGH_RESOLUTION_INTERVALS = (1, 5, 10, 30)
+
+
+class CloudWatchAgentConfigError(ValueError):
+    pass
+
+
+def load_agent_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_CLOUDWATCH_AGENT, **(config.get_object("cloudwatchAgent") or {})}
+    if settings["interval"] not in HIGH_RESOLUTION_INTERVALS and settings["interval"] % 60:
+        raise CloudWatchAgentConfigError("cloudwatchAgent.interval must be 1, 5, 10, 30 or a multiple of 60")
+    if not 1 <= settings["statsdPort"] <= 65535:
+        raise CloudWatchAgentConfigError("cloudwatchAgent.statsdPort must be a valid UDP port")
+    for log_file in settings["logFiles"]:
+        if not log_file.get("path") or not log_file.get("logGroup"):
+            raise CloudWatchAgentConfigError("every cloudwatchAgent.logFiles entry needs a path and a logGroup")
+        if log_file.get("retentionDays", 0) not in RETENTION_DAYS:
+            raise CloudWatchAgentConfigError(
+                "cloudwatchAgent.logFiles retentionDays must be one of the CloudWatch Logs retention periods")
+    return settings
+
+
+def agent_config(settings: dict) -> dict:
+    """The agent's JSON configuration.
+
+    Every metric also gets an AutoScalingGroupName-only rollup, which is the shape target tracking
+    policies on the group need.
+    """
+    interval = settings["interval"]
+    agent = {
+        "agent": {
+            "metrics_collection_interval": interval,
+            "run_as_user": "root",
+        },
+        "metrics": {
+            "namespace": NAMESPACE,
+            "append_dimensions": {
+                "AutoScalingGroupName": "${aws:AutoScalingGroupName}",
+                "InstanceId": "${aws:InstanceId}",
+            },
+            "aggregation_dimensions": [["AutoScalingGroupName"]],
+            "metrics_collected": {
+                "mem": {
+                    "measurement": [MEMORY_METRIC, "mem_available_percent"],
+                },
+                "swap": {
+                    "measurement": ["swap_used_percent"],
+                },
+                "disk": {
+                    "measurement": ["used_percent", "inodes_free"],
+                    "resources": settings["diskPaths"],
+                    "ignore_file_system_types": ["sysfs", "devtmpfs", "tmpfs"],
+                },
+                "diskio": {
+                    "measurement": ["io_time", "read_bytes", "write_bytes", "iops_in_progress"],
+                    "resources": ["*"],
+                },
+                "netstat": {
+                    "measurement": ["tcp_established", "tcp_time_wait", "tcp_close_wait"],
+                },
+                "procstat": [
+                    {
+                        "pattern": pattern,
+                        "measurement": ["cpu_usage", "memory_rss", "num_threads", "num_fds"],
+                    } for pattern in settings["processes"]
+                ],
+                "statsd": {
+                    "service_address": f":{settings['statsdPort']}",
+                    "metrics_collection_interval": interval,
+                    "metrics_aggregation_interval": 60,
+                },
+            },
+        },
+        "logs": {
+            # Embedded metric format listener on TCP and UDP port 25888
+            "metrics_collected": {
+                "emf": {},
+            },
+        },
+    }
+    if settings["logFiles"]:
+        agent["logs"]["logs_collected"] = {
+            "files": {
+                "collect_list": [log_file_entry(log_file) for log_file in settings["logFiles"]],
+            },
+        }
+    return agent
+
+
+def log_file_entry(log_file: dict) -> dict:
+    entry = {
+        "file_path": log_file["path"],
+        "log_group_name": log_file["logGroup"],
+        "log_stream_name": "{instance_id}",
+    }
+    if log_file.get("retentionDays"):
+        entry["retention_in_days"] = log_file["retentionDays"]
+    return entry
+
+
+def create_agent_parameter(settings: dict) -> aws.ssm.Parameter:
+    """Store the agent configuration in Parameter Store for `fetch-config -c ssm:<name>`."""
+    return aws.ssm.Parameter('cloudwatchAgentConfig',
+        name=f"{PARAMETER_PREFIX}{pulumi.get_stack()}-webapp",
+        description="CloudWatch agent configuration for the web app instances",
+        type="String",
+        # Standard parameters stop at 4 KB, which a few more processes or disks would exceed
+        tier="Intelligent-Tiering",
+        value=json.dumps(agent_config(settings), indent=2))
+
+
+def agent_source(parameter) -> pulumi.Output:
+    """The `-c` argument of amazon-cloudwatch-agent-ctl fetch-config."""
+    if parameter is None:
+        return pulumi.Output.from_input("file:/opt/aws/amazon-cloudwatch-agent/etc/CloudWatchAgent.json")
+    return parameter.name.apply(lambda name: f"ssm:{name}")
@@ -0,0 +1,182 @@
+import base64
+import json
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2, iam
+
+from infra.cloudwatch_agent import agent_source, create_agent_parameter, load_agent_config
+from infra.database import Database
+from infra.fleet import launch_template_args, load_fleet_config, mixed_instances_policy_args
+from infra.instance_lifecycle import (grant_complete_lifecycle_action, instance_refresh_args, launch_hook_args,
+                                      load_instance_refresh_config, load_warm_pool_config, readiness_script,
+                                      warm_pool_args)
+from infra.network import Network
+from infra.scaling import AGENT_POLICY_KINDS, ScalingConfigError, create_scaling_policies, load_scaling_config
+from infra.security import SecurityGroups
+from infra.storage import Storage
+from infra.user_data import create_boot_config, create_user_data, grant_boot_config
+
+
+@dataclass
+class Compute:
+    ec2_role: iam.Role
+    instance_profile: iam.InstanceProfile
+    launch_template: ec2.LaunchTemplate
+    autoscaling_group: aws.autoscaling.Group
+    scaling_policies: list
+
+
+def create_instance_role() -> tuple:
+    """Create the EC2 IAM role and instance profile with SNS publish and CloudWatch agent access."""
+    # Create IAM Role for EC2 instance
+    ec2_role = iam.Role("ec2-role",
+        assume_role_policy="""{
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Action": "sts:AssumeRole",
+                    "Principal": {
+                        "Service": "ec2.amazonaws.com"
+                    },
+                    "Effect": "Allow",
+                    "Sid": ""
+                }
+            ]
+        }"""
+    )
+
+    # Create an instance profile for the EC2 instance
+    ec2_instance_profile = iam.InstanceProfile('my_instance_profile',
+       role=ec2_role.name, # Assign the IAM role to the instance profile
+    )
+
+    # Create an IAM policy for publishing to SNS topics
+    sns_publish_policy = aws.iam.Policy('snsPublishPolicy',
+        description='Allow EC2 instances to publish to SNS topics',
+        policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Action": "sns:Publish",
+                "Resource": "*"  # It's recommended to specify the exact ARN of the SNS topic if possible
+            }]
+        })
+    )
+
+    # Attach the SNS publish policy to the IAM role
+    aws.iam.RolePolicyAttachment('snsPolicyAttachment',
+        role=ec2_role.name,
+        policy_arn=sns_publish_policy.arn
+    )
+
+    # Attach the CloudWatch Agent policy to the IAM role
+    iam.RolePolicyAttachment("cloudwatch-policy-attachment",
+        policy_arn="arn:aws:iam::aws:policy/CloudWatchAgentServerPolicy",
+        role=ec2_role.name
+    )
+
+    return ec2_role, ec2_instance_profile
+
+
+def create_compute(config: pulumi.Config, network: Network, security_groups: SecurityGroups, database: Database,
+                   storage: Storage, sns_topic: aws.sns.Topic, target_group: aws.lb.TargetGroup,
+                   app_lb: aws.lb.LoadBalancer, environment: dict = None) -> Compute:
+    """Create the launch template, auto scaling group and its scaling policies."""
+    # Create the EC2 instance
+    ami_id = config.require("customAmiId")  # Ensure you set this value in your Pulumi configuration
+
+    ec2_role, ec2_instance_profile = create_instance_role()
+
+    warm_pool = load_warm_pool_config(config)
+    instance_refresh = load_instance_refresh_config(config)
+    fleet = load_fleet_config(config, warm_pool_enabled=warm_pool["enabled"])
+
+    scaling = load_scaling_config(config)
+    agent_settings = load_agent_config(config)
+    agent_policies = set(scaling["policies"]) & set(AGENT_POLICY_KINDS)
+    if agent_policies and not agent_settings["enabled"]:
+        raise ScalingConfigError(f"scaling policies {', '.join(sorted(agent_policies))} need cloudwatchAgent.enabled")
+    agent_parameter = create_agent_parameter(agent_settings) if agent_settings["enabled"] else None
+
+    # Instances read their environment at boot, so a changed endpoint or ARN leaves the launch template alone
+    boot_config = create_boot_config(config, database, sns_topic, storage, environment)
+    grant_boot_config(config, boot_config, ec2_role)
+
+    per_boot_scripts = {}
+    if warm_pool["enabled"]:
+        # Warm pool launches are gated on the app being healthy, see infra/instance_lifecycle.py
+        per_boot_scripts["90-complete-lifecycle-action.sh"] = readiness_script(config.require("region"),
+                                                                              "autoscalingGroup")
+    user_data = create_user_data(config, boot_config, "autoscalingGroup", agent_source(agent_parameter),
+                                 per_boot_scripts)
+
+    # Encode the user data script in base64
+    encoded_user_data = user_data.apply(lambda data: base64.b64encode(data.encode()).decode())
+
+    launch_template = ec2.LaunchTemplate("my-launch-template",
+        name= "my-launch-template",
+        image_id=ami_id,  # Specify the AMI ID here
+        key_name='webapp',
+        tags={
+            'Name': 'my-ec2-instance'
+        },
+        iam_instance_profile={
+            "arn": ec2_instance_profile.arn
+        },
+        user_data=encoded_user_data,
+        vpc_security_group_ids=[security_groups.app.id],
+        # No depends_on on the database: user data names webappEnvironment, which waits for its endpoint
+        **launch_template_args(fleet, ami_id),
+    )
+
+    launch_template_spec = {
+        'id': launch_template.id,
+        # Pin the version when instance refresh is on so a new launch template version triggers a rollout
+        'version': launch_template.latest_version.apply(str) if instance_refresh["enabled"] else "$Latest"
+    }
+    # Several instance types or Spot capacity go through a mixed-instances policy instead of the plain template
+    mixed_instances_policy = mixed_instances_policy_args(fleet, launch_template_spec)
+
+    # Instances must be allowed to complete the launch hook before the group launches the first of them
+    group_dependencies = []
+    if warm_pool["enabled"]:
+        group_dependencies.append(grant_complete_lifecycle_action(config, "autoscalingGroup", ec2_role))
+
+    # Auto Scaling Group
+    autoscaling_group = aws.autoscaling.Group('autoscalingGroup',
+        min_size=scaling["minSize"],
+        max_size=scaling["maxSize"],
+        name= "autoscalingGroup",
+        desired_capacity=scaling["desiredCapacity"],
+        default_instance_warmup=scaling["instanceWarmup"],
+        launch_template=launch_template_spec if mixed_instances_policy is None else None,
+        mixed_instances_policy=mixed_instances_policy,
+        # Replace Spot instances proactively when AWS signals they are at elevated risk of interruption
+        capacity_rebalance=True if fleet["spotPercentage"] else None,
+        warm_pool=warm_pool_args(warm_pool),
+        initial_lifecycle_hooks=launch_hook_args(warm_pool),
+        instance_refresh=instance_refresh_args(instance_refresh),
+        vpc_zone_identifiers=network.public_subnet_ids,
+        target_group_arns=[target_group.arn],
+        tags=[  # Ensure tags are outside and correctly placed in the function call
+            {
+                'key': 'Name',
+                'value': 'WebAppInstance',
+                'propagate_at_launch': True,
+            }
+        ],
+        opts=pulumi.ResourceOptions(depends_on=group_dependencies),
+    )
+
+    # Attach the scaling policies selected for this stack
+    scaling_policies = create_scaling_policies(scaling, autoscaling_group, app_lb, target_group)
+
+    return Compute(
+        ec2_role=ec2_role,
+        instance_profile=ec2_instance_profile,
+        launch_template=launch_template,
+        autoscaling_group=autoscaling_group,
+        scaling_policies=scaling_policies,
+    )
@@ -0,0 +1,309 @@
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2, iam, rds
+
+from infra.db_logs import DEFAULT_LOGS, create_log_groups, validate_logs
+from infra.db_parameters import DbParameterError, instance_memory_bytes, parameter_args, sized_parameters
+from infra.db_storage import (DEFAULT_MONITORING, DEFAULT_STORAGE, create_monitoring_role, monitoring_args,
+                              storage_args, validate_storage)
+from infra.network import Network
+from infra.security import SecurityGroups
+
+DEFAULT_DATABASE = {
+    # Fixed DB instance identifier; unset lets Pulumi generate one. Exporting logs needs it.
+    "identifier": None,
+    "instanceClass": "db.t2.micro",
+    # Only needed for instance classes missing from infra.db_parameters.INSTANCE_CLASS_MEMORY_GIB
+    "memoryGib": None,
+    # Derived from memory unless set
+    "maxConnections": None,
+    "readReplicas": 0,
+    # Replicas use instanceClass unless set
+    "replicaInstanceClass": None,
+    "backupRetentionPeriod": 1,
+    "privateZone": "db.internal",
+    "storage": DEFAULT_STORAGE,
+    "monitoring": DEFAULT_MONITORING,
+    "logs": DEFAULT_LOGS,
+    "proxy": {
+        "enabled": False,
+        "idleClientTimeout": 1800,
+        "connectionBorrowTimeout": 120,
+        "maxConnectionsPercent": 90,
+        "maxIdleConnectionsPercent": 50,
+        "requireTls": False,
+    },
+}
+
+
+@dataclass
+class Database:
+    parameter_group: rds.ParameterGroup
+    subnet_group: rds.SubnetGroup
+    instance: rds.Instance
+    proxy: Optional[rds.Proxy]
+    # host:port the web app connects to, the proxy when one is enabled
+    host: pulumi.Output
+    replicas: list
+    # host:port for read-only queries, the primary when there are no replicas
+    read_host: pulumi.Output
+    # log type -> CloudWatch log group the instance exports to
+    log_groups: dict
+
+
+def load_database_config(config: pulumi.Config) -> dict:
+    """Merge the stack's `database` object over DEFAULT_DATABASE."""
+    overrides = config.get_object("database") or {}
+    settings = {**DEFAULT_DATABASE, **overrides}
+    for nested in ("proxy", "storage", "monitoring", "logs"):
+        settings[nested] = {**DEFAULT_DATABASE[nested], **overrides.get(nested, {})}
+    validate_storage(settings["storage"])
+    validate_logs(settings["logs"], settings["identifier"])
+    if settings["proxy"]["maxIdleConnectionsPercent"] > settings["proxy"]["maxConnectionsPercent"]:
+        raise DbParameterError("database.proxy.maxIdleConnectionsPercent cannot exceed maxConnectionsPercent")
+    if settings["readReplicas"] and settings["backupRetentionPeriod"] < 1:
+        raise DbParameterError("database.readReplicas needs backupRetentionPeriod of at least 1 day")
+    return settings
+
+
+def create_database(config: pulumi.Config, network: Network, security_groups: SecurityGroups) -> Database:
+    """Create the MariaDB parameter group, subnet group and RDS instance."""
+    db_name = config.require("db_name")
+    db_username = config.require("username")
+    settings = load_database_config(config)
+
+    # Connection and buffer parameters follow the memory of the selected instance class
+    memory_bytes = instance_memory_bytes(settings["instanceClass"], settings["memoryGib"])
+
+    logs = settings["logs"]
+    general_log = []
+    if logs["enabled"] and logs["generalLog"]:
+        general_log.append(rds.ParameterGroupParameterArgs(name="general_log", value="1"))
+
+    # Create RDS Parameter Group for MySQL
+    rds_parameter_group = rds.ParameterGroup("db-parameter-group",
+        family="mariadb10.6",
+        description="Database parameter group for Mariadb",
+        parameters=[
+            rds.ParameterGroupParameterArgs(
+                name="character_set_server",
+                value="utf8mb4"  # Set the character set to utf8mb4 which supports a wide range of characters including emojis
+            ),
+            rds.ParameterGroupParameterArgs(
+                name="character_set_client",
+                value="utf8mb4"
+            ),
+            rds.ParameterGroupParameterArgs(
+                name="collation_server",
+                value="utf8mb4_unicode_ci"  # Set the collation for utf8mb4
+            ),
+            rds.ParameterGroupParameterArgs(
+                name="slow_query_log",
+                value="1"  # Enable the slow query log
+            ),
+            rds.ParameterGroupParameterArgs(
+                name="long_query_time",
+                value="2"  # Log queries that take more than 2 seconds
+            ),
+            # Add more parameters as necessary
+        ] + general_log + parameter_args(sized_parameters(memory_bytes, settings["maxConnections"]))
+    )
+
+    # Create a DB subnet group, in the data tier when one is planned
+    db_subnets = network.data_subnets or network.private_subnets
+    db_subnet_group = rds.SubnetGroup('db-subnet-group',
+                                      subnet_ids=[subnet.id for subnet in db_subnets],
+                                      description='My DB subnet group',
+                                      tags={"Name": "db-subnet-group"})
+
+    # Enhanced Monitoring needs a role to publish OS metrics with
+    monitoring_role = None
+    if settings["monitoring"]["enhancedMonitoringInterval"]:
+        monitoring_role = create_monitoring_role()
+
+    # The log groups must exist before the instance starts exporting to them
+    log_groups = create_log_groups(logs, settings["identifier"])
+
+    # Create RDS Instance
+    rds_instance = rds.Instance("db-instance",
+        identifier=settings["identifier"],
+        engine="mariadb",  # Choose your DB engine: 'mysql', 'mariadb', 'postgres', etc.
+        instance_class=settings["instanceClass"],
+        **storage_args(settings["storage"]),
+        **monitoring_args(settings["monitoring"], settings["instanceClass"], monitoring_role),
+        db_name=db_name,
+        username=db_username,
+        password=config.require_secret("dbPassword"),  #  keeping secrets like passwords in Pulumi config
+        parameter_group_name=rds_parameter_group.name,
+        skip_final_snapshot=True,
+        vpc_security_group_ids=[security_groups.db.id],
+        db_subnet_group_name=db_subnet_group.name,  # Choose the appropriate subnet group
+        multi_az=False,
+        publicly_accessible=False,
+        # Read replicas need automated backups on the source instance
+        backup_retention_period=settings["backupRetentionPeriod"] if settings["readReplicas"] else None,
+        enabled_cloudwatch_logs_exports=list(log_groups) or None,
+        opts=pulumi.ResourceOptions(depends_on=list(log_groups.values())),
+    )
+
+    proxy = None
+    host = rds_instance.endpoint
+    if settings["proxy"]["enabled"]:
+        proxy = create_proxy(config, settings["proxy"], network, security_groups, db_subnets, rds_instance)
+        # Keep the host:port shape of the instance endpoint that the web app already parses
+        host = proxy.endpoint.apply(lambda endpoint: f"{endpoint}:3306")
+
+    replicas = []
+    read_host = host
+    if settings["readReplicas"]:
+        replicas, read_host = create_read_replicas(settings, network, security_groups, db_subnets,
+                                                   rds_instance, rds_parameter_group, monitoring_role)
+
+    return Database(parameter_group=rds_parameter_group, subnet_group=db_subnet_group, instance=rds_instance,
+                    proxy=proxy, host=host, replicas=replicas, read_host=read_host,
+                    log_groups=log_groups)
+
+
+def create_read_replicas(settings: dict, network: Network, security_groups: SecurityGroups, db_subnets: list,
+                         rds_instance: rds.Instance, rds_parameter_group: rds.ParameterGroup,
+                         monitoring_role: Optional[iam.Role]) -> tuple:
+    """Create read replicas across the database subnet AZs behind one reader DNS name.
+
+    MariaDB on RDS has no reader endpoint of its own, so a private hosted zone holds an
+    equally weighted CNAME per replica under a stable name. Returns (replicas, reader host:port).
+    """
+    replica_class = settings["replicaInstanceClass"] or settings["instanceClass"]
+    # Replicas inherit the allocated size but take the same volume and monitoring profile
+    replica_storage = {key: value for key, value in storage_args(settings["storage"]).items()
+                       if key != "allocated_storage"}
+
+    replicas = []
+    for index in range(settings["readReplicas"]):
+        subnet = db_subnets[index % len(db_subnets)]
+        replicas.append(rds.Instance(f"db-read-replica-{index}",
+            replicate_source_db=rds_instance.identifier,
+            instance_class=replica_class,
+            **replica_storage,
+            **monitoring_args(settings["monitoring"], replica_class, monitoring_role),
+            availability_zone=subnet.availability_zone,
+            parameter_group_name=rds_parameter_group.name,
+            vpc_security_group_ids=[security_groups.db.id],
+            skip_final_snapshot=True,
+            publicly_accessible=False))
+
+    reader_zone = aws.route53.Zone('db-private-zone',
+        name=settings["privateZone"],
+        comment='Private DNS for the database tier',
+        vpcs=[aws.route53.ZoneVpcArgs(vpc_id=network.vpc.id)])
+
+    reader_name = f"reader.{settings['privateZone']}"
+    for index, replica in enumerate(replicas):
+        aws.route53.Record(f"db-reader-record-{index}",
+            zone_id=reader_zone.zone_id,
+            name=reader_name,
+            type='CNAME',
+            ttl=5,
+            set_identifier=f"db-read-replica-{index}",
+            weighted_routing_policies=[aws.route53.RecordWeightedRoutingPolicyArgs(weight=1)],
+            records=[replica.address])
+
+    return replicas, pulumi.Output.from_input(f"{reader_name}:3306")
+
+
+def create_proxy(config: pulumi.Config, proxy_settings: dict, network: Network, security_groups: SecurityGroups,
+                 db_subnets: list, rds_instance: rds.Instance) -> rds.Proxy:
+    """Put an RDS Proxy in front of the instance so the ASG shares one pool of database connections."""
+    # Store the database credentials in Secrets Manager for the proxy
+    db_secret = aws.secretsmanager.Secret('db-credentials',
+        description='Credentials RDS Proxy uses to connect to db-instance')
+
+    aws.secretsmanager.SecretVersion('db-credentials-version',
+        secret_id=db_secret.id,
+        secret_string=pulumi.Output.all(config.require("username"), config.require_secret("dbPassword")).apply(
+            lambda args: json.dumps({"username": args[0], "password": args[1]})))
+
+    proxy_role = iam.Role('db-proxy-role',
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Principal": {
+                    "Service": "rds.amazonaws.com",
+                },
+                "Effect": "Allow",
+            }],
+        }))
+
+    aws.iam.RolePolicy('db-proxy-secret-policy',
+        role=proxy_role.id,
+        policy=db_secret.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": ["secretsmanager:GetSecretValue"],
+                "Effect": "Allow",
+                "Resource": [arn]
+            }]
+        })))
+
+    # The proxy accepts connections from the app tier and opens its own to the database
+    proxy_security_group = ec2.SecurityGroup('db-proxy-security-group',
+        vpc_id=network.vpc.id,
+        description='Security Group for the RDS Proxy',
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol='tcp',
+                from_port=3306,
+                to_port=3306,
+                security_groups=[security_groups.app.id]
+            )
+        ],
+        egress=[
+            ec2.SecurityGroupEgressArgs(
+                protocol='tcp',
+                from_port=3306,
+                to_port=3306,
+                security_groups=[security_groups.db.id]
+            )
+        ],
+        tags={"Name": "db-proxy-security-group"})
+
+    ec2.SecurityGroupRule('db-ingress-from-proxy',
+        type="ingress",
+        security_group_id=security_groups.db.id,
+        protocol="tcp",
+        from_port=3306,
+        to_port=3306,
+        source_security_group_id=proxy_security_group.id)
+
+    proxy = rds.Proxy('db-proxy',
+        name="db-proxy",
+        engine_family="MYSQL",
+        role_arn=proxy_role.arn,
+        vpc_subnet_ids=[subnet.id for subnet in db_subnets],
+        vpc_security_group_ids=[proxy_security_group.id],
+        idle_client_timeout=proxy_settings["idleClientTimeout"],
+        require_tls=proxy_settings["requireTls"],
+        auths=[rds.ProxyAuthArgs(
+            auth_scheme="SECRETS",
+            iam_auth="DISABLED",
+            secret_arn=db_secret.arn,
+        )])
+
+    rds.ProxyDefaultTargetGroup('db-proxy-target-group',
+        db_proxy_name=proxy.name,
+        connection_pool_config=rds.ProxyDefaultTargetGroupConnectionPoolConfigArgs(
+            connection_borrow_timeout=proxy_settings["connectionBorrowTimeout"],
+            max_connections_percent=proxy_settings["maxConnectionsPercent"],
+            max_idle_connections_percent=proxy_settings["maxIdleConnectionsPercent"],
+        ))
+
+    rds.ProxyTarget('db-proxy-target',
+        db_proxy_name=proxy.name,
+        target_group_name="default",
+        db_instance_identifier=rds_instance.identifier)
+
+    return proxy
@@ -0,0 +1,149 @@
+import json
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2, iam
+
+from infra.network import Network
+from infra.security import SecurityGroups
+
+DEFAULT_DAX = {
+    "enabled": False,
+    "nodeType": "dax.t3.small",
+    # Three nodes spread over the AZs survive losing one; 1 is fine for dev
+    "replicationFactor": 3,
+    # Seconds items and query results stay cached
+    "itemTtl": 300,
+    "queryTtl": 300,
+}
+DAX_PORT = 8111
+
+
+class DaxConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Dax:
+    cluster: aws.dax.Cluster
+    security_group: ec2.SecurityGroup
+    # host:port the web app hands to the DAX client
+    endpoint: pulumi.Output
+
+
+def load_dax_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_DAX, **(config.get_object("dax") or {})}
+    if not 1 <= settings["replicationFactor"] <= 11:
+        raise DaxConfigError("dax.replicationFactor must be between 1 and 11")
+    for key in ("itemTtl", "queryTtl"):
+        if settings[key] < 0:
+            raise DaxConfigError(f"dax.{key} cannot be negative")
+    return settings
+
+
+def create_dax(config: pulumi.Config, network: Network, security_groups: SecurityGroups,
+               dynamodb_table: aws.dynamodb.Table):
+    """Create a DAX cluster in the private subnets in front of the table, or return None when disabled."""
+    settings = load_dax_config(config)
+    if not settings["enabled"]:
+        return None
+
+    dax_role = iam.Role('dax-role',
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Principal": {
+                    "Service": "dax.amazonaws.com",
+                },
+                "Effect": "Allow",
+            }],
+        }))
+
+    # DAX reads and writes through to the table and its indexes with this role
+    iam.RolePolicy('dax-table-policy',
+        role=dax_role.id,
+        policy=dynamodb_table.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": [
+                    "dynamodb:GetItem",
+                    "dynamodb:BatchGetItem",
+                    "dynamodb:Query",
+                    "dynamodb:Scan",
+                    "dynamodb:PutItem",
+                    "dynamodb:UpdateItem",
+                    "dynamodb:DeleteItem",
+                    "dynamodb:BatchWriteItem",
+                    "dynamodb:ConditionCheckItem",
+                    "dynamodb:DescribeTable",
+                ],
+                "Effect": "Allow",
+                "Resource": [arn, f"{arn}/index/*"],
+            }],
+        })))
+
+    dax_security_group = ec2.SecurityGroup('dax-security-group',
+        vpc_id=network.vpc.id,
+        description='Security Group for the DAX cluster',
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol='tcp',
+                from_port=DAX_PORT,
+                to_port=DAX_PORT,
+                security_groups=[security_groups.app.id]
+            )
+        ],
+        tags={"Name": "dax-security-group"})
+
+    dax_subnet_group = aws.dax.SubnetGroup('dax-subnet-group',
+        description='Private subnets for the DAX cluster',
+        subnet_ids=[subnet.id for subnet in network.private_subnets])
+
+    dax_parameter_group = aws.dax.ParameterGroup('dax-parameter-group',
+        description='Cache TTLs for the submissions table',
+        parameters=[
+            aws.dax.ParameterGroupParameterArgs(name="record-ttl-millis", value=str(settings["itemTtl"] * 1000)),
+            aws.dax.ParameterGroupParameterArgs(name="query-ttl-millis", value=str(settings["queryTtl"] * 1000)),
+        ])
+
+    cluster = aws.dax.Cluster('dax-cluster',
+        cluster_name=f"{pulumi.get_stack()}-dax",
+        node_type=settings["nodeType"],
+        replication_factor=settings["replicationFactor"],
+        iam_role_arn=dax_role.arn,
+        subnet_group_name=dax_subnet_group.name,
+        parameter_group_name=dax_parameter_group.name,
+        security_group_ids=[dax_security_group.id],
+        server_side_encryption=aws.dax.ClusterServerSideEncryptionArgs(enabled=True))
+
+    return Dax(
+        cluster=cluster,
+        security_group=dax_security_group,
+        endpoint=pulumi.Output.concat(cluster.cluster_address, ":", str(DAX_PORT)),
+    )
+
+
+def grant_access(dax: Dax, role: iam.Role):
+    """Allow the web app instances to call the DAX cluster."""
+    iam.RolePolicy('dax-access-policy',
+        role=role.id,
+        policy=dax.cluster.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": [
+                    "dax:GetItem",
+                    "dax:BatchGetItem",
+                    "dax:Query",
+                    "dax:Scan",
+                    "dax:PutItem",
+                    "dax:UpdateItem",
+                    "dax:DeleteItem",
+                    "dax:BatchWriteItem",
+                    "dax:ConditionCheckItem",
+                ],
+                "Effect": "Allow",
+                "Resource": [arn],
+            }],
+        })))
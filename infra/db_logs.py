@@ -0,0 +1,156 @@
+import json
+import os
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import cloudwatch, iam
+
+from infra.db_parameters import DbParameterError
+from infra.lambda_build import DEFAULT_LAMBDA_BUILD, build_function_package
+from infra.lambda_profile import load_lambda_profile
+
+DEFAULT_LOGS = {
+    "enabled": False,
+    # Log types RDS publishes to CloudWatch Logs
+    "exports": ["error", "slowquery", "general"],
+    "retentionDays": 14,
+    # The general log records every statement; only turn it on while debugging
+    "generalLog": False,
+    # Subscribe the slow query analyser to the slowquery log group
+    "slowQueryAnalysis": True,
+}
+LOG_TYPES = ("audit", "error", "general", "slowquery")
+# The values CloudWatch Logs accepts for retention_in_days; 0 keeps logs forever
+RETENTION_DAYS = (0, 1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731, 1096, 1827, 2192, 2557, 2922,
+                  3288, 3653)
+SLOW_QUERY_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions",
+                                 "slow_query")
+SLOW_QUERY_NAMESPACE = "WebApp/SlowQueries"
+
+
+@dataclass
+class SlowQueryAnalysis:
+    table: aws.dynamodb.Table
+    function: aws.lambda_.Function
+    subscription: cloudwatch.LogSubscriptionFilter
+
+
+def validate_logs(logs: dict, identifier: str):
+    unknown = sorted(set(logs["exports"]) - set(LOG_TYPES))
+    if unknown:
+        raise DbParameterError(f"database.logs.exports has unknown log types: {', '.join(unknown)}")
+    if logs["retentionDays"] not in RETENTION_DAYS:
+        raise DbParameterError("database.logs.retentionDays must be one of the CloudWatch Logs retention periods")
+    if not logs["enabled"]:
+        return
+    # RDS creates a missing log group itself, with no retention, as soon as it starts exporting
+    if not identifier:
+        raise DbParameterError("database.logs needs database.identifier so the log groups can be created first; "
+                               "on an existing stack, set it to the db_identifier stack output")
+    if logs["generalLog"] and "general" not in logs["exports"]:
+        raise DbParameterError("database.logs.generalLog needs general in database.logs.exports")
+    if logs["slowQueryAnalysis"] and "slowquery" not in logs["exports"]:
+        raise DbParameterError("database.logs.slowQueryAnalysis needs slowquery in database.logs.exports")
+
+
+def create_log_groups(logs: dict, identifier: str) -> dict:
+    """log type -> the /aws/rds/instance/<identifier>/<type> log group, created ahead of the instance."""
+    if not logs["enabled"]:
+        return {}
+    return {
+        log_type: cloudwatch.LogGroup(f"db-log-group-{log_type}",
+            name=f"/aws/rds/instance/{identifier}/{log_type}",
+            retention_in_days=logs["retentionDays"])
+        for log_type in logs["exports"]
+    }
+
+
+def create_slow_query_analysis(config: pulumi.Config, logs: dict, log_groups: dict):
+    """Subscribe a Lambda to the slow query log that counts and times each query fingerprint.
+
+    Per-fingerprint metrics go to the WebApp/SlowQueries namespace and running totals to a DynamoDB table.
+    Returns None unless the slowquery log is exported and the analysis is on.
+    """
+    if not logs["slowQueryAnalysis"] or "slowquery" not in log_groups:
+        return None
+    log_group = log_groups["slowquery"]
+    profile = load_lambda_profile(config)
+
+    table = aws.dynamodb.Table('slowQueryTable',
+        billing_mode="PAY_PER_REQUEST",
+        hash_key="fingerprintId",
+        attributes=[aws.dynamodb.TableAttributeArgs(name="fingerprintId", type="S")])
+
+    role = iam.Role('slowQueryRole', assume_role_policy=json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Action": "sts:AssumeRole",
+            "Principal": {
+                "Service": "lambda.amazonaws.com",
+            },
+            "Effect": "Allow",
+        }],
+    }))
+
+    iam.RolePolicy('slowQueryPolicy',
+        role=role.id,
+        policy=pulumi.Output.all(table.arn, config.require('region'), config.require('account_id')).apply(
+            lambda args: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Action": ["dynamodb:UpdateItem"],
+                        "Effect": "Allow",
+                        "Resource": [args[0]]
+                    },
+                    {
+                        "Action": ["cloudwatch:PutMetricData"],
+                        "Effect": "Allow",
+                        "Resource": ["*"],
+                        "Condition": {"StringEquals": {"cloudwatch:namespace": SLOW_QUERY_NAMESPACE}}
+                    },
+                    {
+                        "Action": [
+                            "logs:CreateLogGroup",
+                            "logs:CreateLogStream",
+                            "logs:PutLogEvents"
+                        ],
+                        "Effect": "Allow",
+                        "Resource": [f"arn:aws:logs:{args[1]}:{args[2]}:*"]
+                    }
+                ],
+            })))
+
+    # The sample logs only feed tools/slow_query_report.py --check
+    artifact = build_function_package(SLOW_QUERY_SOURCE, DEFAULT_LAMBDA_BUILD["exclude"] + ["samples"])
+    function = aws.lambda_.Function('slowQueryFunction',
+        role=role.arn,
+        runtime=profile["runtime"],
+        architectures=[profile["architecture"]],
+        memory_size=256,
+        timeout=60,
+        handler="lambda_function.lambda_handler",
+        code=artifact.archive,
+        source_code_hash=artifact.source_code_hash,
+        environment={
+            'variables': {
+                'FINGERPRINT_TABLE': table.name,
+                'METRIC_NAMESPACE': SLOW_QUERY_NAMESPACE,
+            }
+        })
+
+    permission = aws.lambda_.Permission('slowQueryLogsPermission',
+        action='lambda:InvokeFunction',
+        function=function.name,
+        principal='logs.amazonaws.com',
+        source_arn=log_group.arn.apply(lambda arn: f"{arn}:*"))
+
+    subscription = cloudwatch.LogSubscriptionFilter('slowQuerySubscription',
+        log_group=log_group.name,
+        # Every event; the parser skips the banners and partial entries itself
+        filter_pattern="",
+        destination_arn=function.arn,
+        opts=pulumi.ResourceOptions(depends_on=[permission]))
+
+    return SlowQueryAnalysis(table=table, function=function, subscription=subscription)
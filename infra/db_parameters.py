@@ -0,0 +1,98 @@
+from pulumi_aws import rds
+
+# Memory of the DB instance classes this project is likely to run on, in GiB.
+INSTANCE_CLASS_MEMORY_GIB = {
+    "db.t2.micro": 1,
+    "db.t2.small": 2,
+    "db.t2.medium": 4,
+    "db.t2.large": 8,
+    "db.t3.micro": 1,
+    "db.t3.small": 2,
+    "db.t3.medium": 4,
+    "db.t3.large": 8,
+    "db.t3.xlarge": 16,
+    "db.t4g.micro": 1,
+    "db.t4g.small": 2,
+    "db.t4g.medium": 4,
+    "db.t4g.large": 8,
+    "db.t4g.xlarge": 16,
+    "db.m5.large": 8,
+    "db.m5.xlarge": 16,
+    "db.m5.2xlarge": 32,
+    "db.m6g.large": 8,
+    "db.m6g.xlarge": 16,
+    "db.m6g.2xlarge": 32,
+    "db.m7g.large": 8,
+    "db.m7g.xlarge": 16,
+    "db.r5.large": 16,
+    "db.r5.xlarge": 32,
+    "db.r6g.large": 16,
+    "db.r6g.xlarge": 32,
+    "db.r7g.large": 16,
+    "db.r7g.xlarge": 32,
+}
+
+GIB = 1024 ** 3
+MIB = 1024 ** 2
+
+# RDS' own MariaDB default is {DBInstanceClassMemory/12582880}.
+BYTES_PER_CONNECTION = 12582880
+MAX_CONNECTIONS_CEILING = 16000
+# The limit the parameter group hardcoded before it was derived from memory; 1 GiB classes would
+# otherwise drop to 85, and the web tier already ran out of connections at 100
+MAX_CONNECTIONS_FLOOR = 100
+
+
+class DbParameterError(ValueError):
+    pass
+
+
+def instance_memory_bytes(instance_class: str, memory_gib: float = None) -> int:
+    """Memory of `instance_class`; `memory_gib` overrides the table for classes it does not know."""
+    if memory_gib is None:
+        if instance_class not in INSTANCE_CLASS_MEMORY_GIB:
+            raise DbParameterError(
+                f"unknown memory for {instance_class}; set database.memoryGib in stack config")
+        memory_gib = INSTANCE_CLASS_MEMORY_GIB[instance_class]
+    return int(memory_gib * GIB)
+
+
+def sized_parameters(memory_bytes: int, max_connections: int = None) -> dict:
+    """Connection and buffer parameters derived from the instance memory.
+
+    max_connections follows RDS' memory formula but never drops below the previous fixed 100.
+    Small instances keep half their memory for the InnoDB buffer pool so per-connection
+    buffers still fit; from 4 GiB up the pool gets the usual three quarters. Temporary
+    tables held in memory are capped at 1/64 of memory, between 16 and 256 MiB.
+    """
+    if max_connections is None:
+        max_connections = min(max(memory_bytes // BYTES_PER_CONNECTION, MAX_CONNECTIONS_FLOOR),
+                              MAX_CONNECTIONS_CEILING)
+
+    buffer_pool_ratio = 0.75 if memory_bytes >= 4 * GIB else 0.5
+    # InnoDB rounds the buffer pool to a multiple of its 128 MiB chunk size
+    chunk = 128 * MIB
+    buffer_pool = max(int(memory_bytes * buffer_pool_ratio) // chunk, 1) * chunk
+
+    tmp_table = min(max(memory_bytes // 64, 16 * MIB), 256 * MIB)
+
+    return {
+        "max_connections": str(max_connections),
+        "innodb_buffer_pool_size": str(buffer_pool),
+        "tmp_table_size": str(tmp_table),
+        "max_heap_table_size": str(tmp_table),
+    }
+
+
+# innodb_buffer_pool_size needs a reboot to take effect on RDS MariaDB
+PENDING_REBOOT_PARAMETERS = {"innodb_buffer_pool_size"}
+
+
+def parameter_args(parameters: dict) -> list:
+    return [
+        rds.ParameterGroupParameterArgs(
+            name=name,
+            value=value,
+            apply_method="pending-reboot" if name in PENDING_REBOOT_PARAMETERS else None,
+        ) for name, value in parameters.items()
+    ]
@@ -0,0 +1,104 @@
+import json
+
+from pulumi_aws import iam
+
+from infra.db_parameters import DbParameterError
+
+DEFAULT_STORAGE = {
+    "type": "gp3",
+    "allocatedStorage": 20,
+    # Storage autoscaling ceiling in GiB; 0 turns autoscaling off
+    "maxAllocatedStorage": 100,
+    "iops": None,
+    "throughput": None,
+}
+DEFAULT_MONITORING = {
+    # None turns Performance Insights on wherever the instance class supports it
+    "performanceInsights": None,
+    "performanceInsightsRetention": 7,
+    # Enhanced Monitoring granularity in seconds; 0 turns it off
+    "enhancedMonitoringInterval": 60,
+}
+STORAGE_TYPES = ("gp2", "gp3", "io1", "io2")
+MONITORING_INTERVALS = (0, 1, 5, 10, 15, 30, 60)
+# gp3 volumes below this size on MariaDB have a fixed 3000 IOPS / 125 MiB/s baseline
+GP3_PROVISIONING_THRESHOLD = 400
+PERFORMANCE_INSIGHTS_UNSUPPORTED = ("db.t2.", "db.t3.micro", "db.t3.small", "db.t4g.micro", "db.t4g.small")
+
+
+def validate_storage(storage: dict):
+    """Reject storage profiles RDS would refuse or silently ignore."""
+    storage_type = storage["type"]
+    allocated = storage["allocatedStorage"]
+    if storage_type not in STORAGE_TYPES:
+        raise DbParameterError(f"database.storage.type must be one of {', '.join(STORAGE_TYPES)}")
+    if storage["maxAllocatedStorage"] and storage["maxAllocatedStorage"] <= allocated:
+        raise DbParameterError("database.storage.maxAllocatedStorage must be above allocatedStorage")
+
+    if storage_type == "gp2" and (storage["iops"] or storage["throughput"]):
+        raise DbParameterError("gp2 storage does not take provisioned iops or throughput")
+    if storage_type == "gp3" and allocated < GP3_PROVISIONING_THRESHOLD and (storage["iops"] or storage["throughput"]):
+        raise DbParameterError(
+            f"gp3 iops and throughput can only be provisioned from {GP3_PROVISIONING_THRESHOLD} GiB")
+    if storage_type in ("io1", "io2"):
+        if not storage["iops"]:
+            raise DbParameterError(f"{storage_type} storage needs database.storage.iops")
+        if allocated < 100:
+            raise DbParameterError(f"{storage_type} storage needs at least 100 GiB allocated")
+        if storage["iops"] > allocated * 50:
+            raise DbParameterError(f"{storage_type} allows at most 50 iops per GiB")
+        if storage["throughput"]:
+            raise DbParameterError(f"{storage_type} storage does not take a throughput setting")
+
+
+def storage_args(storage: dict) -> dict:
+    return {
+        "storage_type": storage["type"],
+        "allocated_storage": storage["allocatedStorage"],
+        "max_allocated_storage": storage["maxAllocatedStorage"] or None,
+        "iops": storage["iops"],
+        "storage_throughput": storage["throughput"],
+    }
+
+
+def performance_insights_enabled(monitoring: dict, instance_class: str) -> bool:
+    if monitoring["performanceInsights"] is None:
+        return not instance_class.startswith(PERFORMANCE_INSIGHTS_UNSUPPORTED)
+    return monitoring["performanceInsights"]
+
+
+def create_monitoring_role() -> iam.Role:
+    """Role Enhanced Monitoring uses to publish OS metrics to CloudWatch Logs."""
+    monitoring_role = iam.Role('db-monitoring-role',
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Principal": {
+                    "Service": "monitoring.rds.amazonaws.com",
+                },
+                "Effect": "Allow",
+            }],
+        }))
+
+    iam.RolePolicyAttachment('db-monitoring-policy-attachment',
+        role=monitoring_role.name,
+        policy_arn="arn:aws:iam::aws:policy/service-role/AmazonRDSEnhancedMonitoringRole")
+
+    return monitoring_role
+
+
+def monitoring_args(monitoring: dict, instance_class: str, monitoring_role: iam.Role = None) -> dict:
+    if monitoring["enhancedMonitoringInterval"] not in MONITORING_INTERVALS:
+        raise DbParameterError(
+            f"database.monitoring.enhancedMonitoringInterval must be one of {MONITORING_INTERVALS}")
+
+    insights = performance_insights_enabled(monitoring, instance_class)
+    args = {
+        "performance_insights_enabled": insights,
+        "performance_insights_retention_period": monitoring["performanceInsightsRetention"] if insights else None,
+        "monitoring_interval": monitoring["enhancedMonitoringInterval"],
+    }
+    if monitoring["enhancedMonitoringInterval"]:
+        args["monitoring_role_arn"] = monitoring_role.arn
+    return args
@@ -0,0 +1,181 @@
+import pulumi
+import pulumi_aws as aws
+
+DEFAULT_TABLE = {
+    "hashKey": {"name": "id", "type": "S"},
+    # {"name": ..., "type": "S" | "N" | "B"} to make the primary key composite
+    "rangeKey": None,
+    # [{"name": ..., "hashKey": {...}, "rangeKey": {...}, "projection": "ALL", "nonKeyAttributes": [...]}]
+    "globalSecondaryIndexes": [],
+    # [{"name": ..., "rangeKey": {...}, "projection": "ALL", "nonKeyAttributes": [...]}]; needs a table rangeKey
+    "localSecondaryIndexes": [],
+    # Epoch-seconds attribute after which DynamoDB deletes the item
+    "ttlAttribute": None,
+    "stream": {
+        "enabled": False,
+        "viewType": "NEW_AND_OLD_IMAGES",
+    },
+    "billingMode": "PAY_PER_REQUEST",
+    # Used in PROVISIONED mode, for the table and every GSI
+    "capacity": {
+        "read": {"min": 5, "max": 100, "target": 70},
+        "write": {"min": 5, "max": 100, "target": 70},
+    },
+}
+KEY_TYPES = ("S", "N", "B")
+PROJECTIONS = ("ALL", "KEYS_ONLY", "INCLUDE")
+STREAM_VIEW_TYPES = ("KEYS_ONLY", "NEW_IMAGE", "OLD_IMAGE", "NEW_AND_OLD_IMAGES")
+BILLING_MODES = ("PAY_PER_REQUEST", "PROVISIONED")
+CAPACITY_METRICS = {
+    "read": ("ReadCapacityUnits", "DynamoDBReadCapacityUtilization"),
+    "write": ("WriteCapacityUnits", "DynamoDBWriteCapacityUtilization"),
+}
+
+
+class TableSchemaError(ValueError):
+    pass
+
+
+def load_table_schema(config: pulumi.Config) -> dict:
+    overrides = config.get_object("dynamodbTable") or {}
+    schema = {**DEFAULT_TABLE, **overrides}
+    schema["stream"] = {**DEFAULT_TABLE["stream"], **overrides.get("stream", {})}
+    capacity = overrides.get("capacity", {})
+    schema["capacity"] = {
+        kind: {**DEFAULT_TABLE["capacity"][kind], **capacity.get(kind, {})} for kind in ("read", "write")
+    }
+
+    if schema["billingMode"] not in BILLING_MODES:
+        raise TableSchemaError(f"dynamodbTable.billingMode must be one of {', '.join(BILLING_MODES)}")
+    if schema["stream"]["viewType"] not in STREAM_VIEW_TYPES:
+        raise TableSchemaError(f"dynamodbTable.stream.viewType must be one of {', '.join(STREAM_VIEW_TYPES)}")
+    if schema["localSecondaryIndexes"] and not schema["rangeKey"]:
+        raise TableSchemaError("local secondary indexes need a table rangeKey")
+    if len(schema["globalSecondaryIndexes"]) > 20 or len(schema["localSecondaryIndexes"]) > 5:
+        raise TableSchemaError("DynamoDB allows at most 20 global and 5 local secondary indexes")
+
+    names = [index["name"] for index in schema["globalSecondaryIndexes"] + schema["localSecondaryIndexes"]]
+    if len(names) != len(set(names)):
+        raise TableSchemaError("dynamodbTable index names must be unique")
+    for index in schema["globalSecondaryIndexes"] + schema["localSecondaryIndexes"]:
+        projection = index.get("projection", "ALL")
+        if projection not in PROJECTIONS:
+            raise TableSchemaError(f"index {index['name']}: projection must be one of {', '.join(PROJECTIONS)}")
+        if (projection == "INCLUDE") != bool(index.get("nonKeyAttributes")):
+            raise TableSchemaError(f"index {index['name']}: nonKeyAttributes go with, and only with, INCLUDE")
+
+    for kind, bounds in schema["capacity"].items():
+        if not 1 <= bounds["min"] <= bounds["max"]:
+            raise TableSchemaError(f"dynamodbTable.capacity.{kind} needs 1 <= min <= max")
+        if not 20 <= bounds["target"] <= 90:
+            raise TableSchemaError(f"dynamodbTable.capacity.{kind}.target must be between 20 and 90 percent")
+
+    # Fails on conflicting attribute types
+    key_attributes(schema)
+    return schema
+
+
+def key_attributes(schema: dict) -> list:
+    """Every attribute used as a table or index key, once, with a consistent type.
+
+    DynamoDB only accepts attribute definitions for key attributes, so this is exactly the list it wants.
+    """
+    keys = [schema["hashKey"], schema["rangeKey"]]
+    for index in schema["globalSecondaryIndexes"]:
+        keys += [index["hashKey"], index.get("rangeKey")]
+    for index in schema["localSecondaryIndexes"]:
+        keys.append(index["rangeKey"])
+
+    attributes = {}
+    for key in filter(None, keys):
+        if key["type"] not in KEY_TYPES:
+            raise TableSchemaError(f"key attribute {key['name']} has type {key['type']}, not one of {KEY_TYPES}")
+        if attributes.setdefault(key["name"], key["type"]) != key["type"]:
+            raise TableSchemaError(f"key attribute {key['name']} is declared with two different types")
+    return [{"name": name, "type": attribute_type} for name, attribute_type in attributes.items()]
+
+
+def table_args(schema: dict) -> dict:
+    provisioned = schema["billingMode"] == "PROVISIONED"
+    read_capacity = schema["capacity"]["read"]["min"] if provisioned else None
+    write_capacity = schema["capacity"]["write"]["min"] if provisioned else None
+    return {
+        "attributes": key_attributes(schema),
+        "hash_key": schema["hashKey"]["name"],
+        "range_key": schema["rangeKey"]["name"] if schema["rangeKey"] else None,
+        "billing_mode": schema["billingMode"],
+        "read_capacity": read_capacity,
+        "write_capacity": write_capacity,
+        "global_secondary_indexes": [
+            aws.dynamodb.TableGlobalSecondaryIndexArgs(
+                name=index["name"],
+                key_schemas=[
+                    aws.dynamodb.TableGlobalSecondaryIndexKeySchemaArgs(attribute_name=key["name"], key_type=key_type)
+                    for key, key_type in ((index["hashKey"], "HASH"), (index.get("rangeKey"), "RANGE")) if key
+                ],
+                projection_type=index.get("projection", "ALL"),
+                non_key_attributes=index.get("nonKeyAttributes"),
+                read_capacity=read_capacity,
+                write_capacity=write_capacity,
+            ) for index in schema["globalSecondaryIndexes"]
+        ] or None,
+        "local_secondary_indexes": [
+            aws.dynamodb.TableLocalSecondaryIndexArgs(
+                name=index["name"],
+                range_key=index["rangeKey"]["name"],
+                projection_type=index.get("projection", "ALL"),
+                non_key_attributes=index.get("nonKeyAttributes"),
+            ) for index in schema["localSecondaryIndexes"]
+        ] or None,
+        "ttl": aws.dynamodb.TableTtlArgs(
+            attribute_name=schema["ttlAttribute"],
+            enabled=True,
+        ) if schema["ttlAttribute"] else None,
+        "stream_enabled": schema["stream"]["enabled"] or None,
+        "stream_view_type": schema["stream"]["viewType"] if schema["stream"]["enabled"] else None,
+    }
+
+
+def table_options(schema: dict) -> pulumi.ResourceOptions:
+    """Let Application Auto Scaling own provisioned capacity without Pulumi resetting it on every update."""
+    if schema["billingMode"] != "PROVISIONED":
+        return None
+    return pulumi.ResourceOptions(ignore_changes=[
+        "readCapacity", "writeCapacity",
+        "globalSecondaryIndexes[*].readCapacity", "globalSecondaryIndexes[*].writeCapacity",
+    ])
+
+
+def create_table_autoscaling(schema: dict, table: aws.dynamodb.Table) -> list:
+    """Target tracking on read and write utilisation for the table and each GSI in provisioned mode."""
+    if schema["billingMode"] != "PROVISIONED":
+        return []
+
+    scaled = [("myDynamoDBTable", "table", table.name.apply(lambda name: f"table/{name}"))]
+    for index in schema["globalSecondaryIndexes"]:
+        scaled.append((f"myDynamoDBTable-{index['name']}", "index",
+                       table.name.apply(lambda name, index_name=index["name"]: f"table/{name}/index/{index_name}")))
+
+    policies = []
+    for prefix, resource, resource_id in scaled:
+        for kind, (dimension, metric) in CAPACITY_METRICS.items():
+            bounds = schema["capacity"][kind]
+            target = aws.appautoscaling.Target(f"{prefix}-{kind}-target",
+                service_namespace="dynamodb",
+                scalable_dimension=f"dynamodb:{resource}:{dimension}",
+                resource_id=resource_id,
+                min_capacity=bounds["min"],
+                max_capacity=bounds["max"])
+
+            policies.append(aws.appautoscaling.Policy(f"{prefix}-{kind}-tracking",
+                policy_type="TargetTrackingScaling",
+                service_namespace=target.service_namespace,
+                scalable_dimension=target.scalable_dimension,
+                resource_id=target.resource_id,
+                target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
+                    target_value=bounds["target"],
+                    predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
+                        predefined_metric_type=metric,
+                    ),
+                )))
+    return policies
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+
+import pulumi
+from pulumi_aws import ec2
+
+from infra.network import Network
+from infra.security import SecurityGroups
+
+DEFAULT_VPC_ENDPOINTS = {
+    "enabled": False,
+    # Gateway endpoints are free and only add routes to the route tables
+    "gateway": ["s3", "dynamodb"],
+    # Interface endpoints are billed per AZ-hour; drop services a stack does not need
+    "interface": ["sns", "logs", "monitoring", "ssm"],
+}
+GATEWAY_SERVICES = ("s3", "dynamodb")
+HTTPS_PORT = 443
+
+
+class EndpointConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Endpoints:
+    gateway: dict = field(default_factory=dict)
+    interface: dict = field(default_factory=dict)
+    security_groups: dict = field(default_factory=dict)
+
+
+def load_endpoint_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_VPC_ENDPOINTS, **(config.get_object("vpcEndpoints") or {})}
+    for service in settings["gateway"]:
+        if service not in GATEWAY_SERVICES:
+            raise EndpointConfigError(f"vpcEndpoints.gateway only supports {', '.join(GATEWAY_SERVICES)}, not {service}")
+    overlap = set(settings["gateway"]) & set(settings["interface"])
+    if overlap:
+        raise EndpointConfigError(f"{', '.join(sorted(overlap))} listed as both gateway and interface endpoint")
+    return settings
+
+
+def create_endpoints(config: pulumi.Config, network: Network, security_groups: SecurityGroups):
+    """Create the VPC endpoints so AWS API calls from the VPC stay off the internet, or return None when disabled."""
+    settings = load_endpoint_config(config)
+    if not settings["enabled"]:
+        return None
+
+    region = config.require("region")
+    endpoints = Endpoints()
+
+    for service in settings["gateway"]:
+        endpoints.gateway[service] = ec2.VpcEndpoint(f'vpc-endpoint-{service}',
+            vpc_id=network.vpc.id,
+            service_name=f"com.amazonaws.{region}.{service}",
+            vpc_endpoint_type="Gateway",
+            route_table_ids=[network.public_route_table.id, network.private_route_table.id],
+            tags={"Name": f"vpc-endpoint-{service}"})
+
+    for service in settings["interface"]:
+        # One security group per endpoint so each service's access can be narrowed on its own
+        endpoint_security_group = ec2.SecurityGroup(f'vpc-endpoint-{service}-security-group',
+            vpc_id=network.vpc.id,
+            description=f'HTTPS from the web app to the {service} VPC endpoint',
+            ingress=[
+                ec2.SecurityGroupIngressArgs(
+                    protocol='tcp',
+                    from_port=HTTPS_PORT,
+                    to_port=HTTPS_PORT,
+                    security_groups=[security_groups.app.id]
+                )
+            ],
+            tags={"Name": f"vpc-endpoint-{service}-security-group"})
+
+        endpoints.security_groups[service] = endpoint_security_group
+        endpoints.interface[service] = ec2.VpcEndpoint(f'vpc-endpoint-{service}',
+            vpc_id=network.vpc.id,
+            service_name=f"com.amazonaws.{region}.{service}",
+            vpc_endpoint_type="Interface",
+            # One network interface per AZ in the private subnets
+            subnet_ids=[subnet.id for subnet in network.private_subnets],
+            security_group_ids=[endpoint_security_group.id],
+            # The regular service hostnames resolve to the endpoint inside the VPC, so the SDKs need no changes
+            private_dns_enabled=True,
+            tags={"Name": f"vpc-endpoint-{service}"})
+
+    return endpoints
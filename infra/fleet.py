@@ -0,0 +1,133 @@
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2
+
+DEFAULT_FLEET = {
+    # Ranked, most preferred first; the launch template uses the first one. A single type keeps the group
+    # on the plain launch template, which warm pools need.
+    "instanceTypes": ["t3.micro"],
+    "onDemandBaseCapacity": 1,
+    # Share of the capacity above the on-demand base that runs on Spot
+    "spotPercentage": 0,
+    # prioritized follows instanceTypes order, lowest-price ignores it
+    "onDemandAllocationStrategy": "prioritized",
+    "spotAllocationStrategy": "price-capacity-optimized",
+    "rootVolume": {
+        # Device name of the AMI's root volume; None looks it up from the AMI
+        "deviceName": None,
+        # None keeps the size of the AMI snapshot
+        "size": None,
+        "iops": 3000,
+        "throughput": 125,
+    },
+    "metadata": {
+        # required enforces IMDSv2 session tokens
+        "httpTokens": "required",
+        # 2 lets containers on the instance reach IMDS as well
+        "hopLimit": 2,
+    },
+}
+ON_DEMAND_ALLOCATION_STRATEGIES = ("prioritized", "lowest-price")
+SPOT_ALLOCATION_STRATEGIES = ("price-capacity-optimized", "capacity-optimized", "capacity-optimized-prioritized",
+                              "lowest-price")
+# Families before the current generation; t2 in particular runs out of CPU credits under sustained load
+PREVIOUS_GENERATION_FAMILIES = ("t1", "t2", "m1", "m2", "m3", "m4", "c1", "c3", "c4", "r3", "r4", "i2")
+
+
+class FleetConfigError(ValueError):
+    pass
+
+
+def load_fleet_config(config: pulumi.Config, warm_pool_enabled: bool = False) -> dict:
+    overrides = config.get_object("fleet") or {}
+    fleet = {**DEFAULT_FLEET, **overrides}
+    for key in ("rootVolume", "metadata"):
+        fleet[key] = {**DEFAULT_FLEET[key], **overrides.get(key, {})}
+
+    if not fleet["instanceTypes"]:
+        raise FleetConfigError("fleet.instanceTypes needs at least one instance type")
+    for instance_type in fleet["instanceTypes"]:
+        if instance_type.split(".")[0] in PREVIOUS_GENERATION_FAMILIES:
+            raise FleetConfigError(f"{instance_type} is a previous-generation type; pick a current generation")
+    if not 0 <= fleet["spotPercentage"] <= 100:
+        raise FleetConfigError("fleet.spotPercentage must be between 0 and 100")
+    if fleet["onDemandAllocationStrategy"] not in ON_DEMAND_ALLOCATION_STRATEGIES:
+        raise FleetConfigError(
+            f"fleet.onDemandAllocationStrategy must be one of {', '.join(ON_DEMAND_ALLOCATION_STRATEGIES)}")
+    if fleet["spotAllocationStrategy"] not in SPOT_ALLOCATION_STRATEGIES:
+        raise FleetConfigError(f"fleet.spotAllocationStrategy must be one of {', '.join(SPOT_ALLOCATION_STRATEGIES)}")
+    if warm_pool_enabled and is_mixed(fleet):
+        raise FleetConfigError("warm pools do not support mixed instance types or Spot; use one on-demand type")
+
+    root_volume = fleet["rootVolume"]
+    if not 3000 <= root_volume["iops"] <= 16000:
+        raise FleetConfigError("fleet.rootVolume.iops must be between 3000 and 16000")
+    if not 125 <= root_volume["throughput"] <= 1000:
+        raise FleetConfigError("fleet.rootVolume.throughput must be between 125 and 1000 MiB/s")
+    # gp3 allows at most 0.25 MiB/s of throughput per provisioned IOPS
+    if root_volume["throughput"] > root_volume["iops"] / 4:
+        raise FleetConfigError("fleet.rootVolume.throughput can be at most iops / 4")
+    if fleet["metadata"]["httpTokens"] not in ("required", "optional"):
+        raise FleetConfigError("fleet.metadata.httpTokens must be required or optional")
+    return fleet
+
+
+def is_mixed(fleet: dict) -> bool:
+    return len(fleet["instanceTypes"]) > 1 or fleet["spotPercentage"] > 0
+
+
+def root_device_name(fleet: dict, ami_id: str):
+    """The configured root device name, or the AMI's own, which differs between AMI families."""
+    device_name = fleet["rootVolume"]["deviceName"]
+    if device_name:
+        return device_name
+    return ec2.get_ami_output(filters=[ec2.GetAmiFilterArgs(name="image-id", values=[ami_id])]).root_device_name
+
+
+def launch_template_args(fleet: dict, ami_id: str) -> dict:
+    """Instance type, gp3 root volume and metadata options of the launch template."""
+    root_volume = fleet["rootVolume"]
+    return {
+        "instance_type": fleet["instanceTypes"][0],
+        "block_device_mappings": [ec2.LaunchTemplateBlockDeviceMappingArgs(
+            # A mapping for any other device adds a second volume instead of changing the root one
+            device_name=root_device_name(fleet, ami_id),
+            ebs=ec2.LaunchTemplateBlockDeviceMappingEbsArgs(
+                volume_type="gp3",
+                volume_size=root_volume["size"],
+                iops=root_volume["iops"],
+                throughput=root_volume["throughput"],
+                encrypted="true",
+                delete_on_termination="true",
+            ),
+        )],
+        "metadata_options": ec2.LaunchTemplateMetadataOptionsArgs(
+            http_endpoint="enabled",
+            http_tokens=fleet["metadata"]["httpTokens"],
+            http_put_response_hop_limit=fleet["metadata"]["hopLimit"],
+        ),
+    }
+
+
+def mixed_instances_policy_args(fleet: dict, launch_template_spec: dict):
+    """Mixed-instances policy over the ranked instance types, or None for a single on-demand type."""
+    if not is_mixed(fleet):
+        return None
+    return aws.autoscaling.GroupMixedInstancesPolicyArgs(
+        instances_distribution=aws.autoscaling.GroupMixedInstancesPolicyInstancesDistributionArgs(
+            on_demand_base_capacity=fleet["onDemandBaseCapacity"],
+            on_demand_percentage_above_base_capacity=100 - fleet["spotPercentage"],
+            on_demand_allocation_strategy=fleet["onDemandAllocationStrategy"],
+            spot_allocation_strategy=fleet["spotAllocationStrategy"],
+        ),
+        launch_template=aws.autoscaling.GroupMixedInstancesPolicyLaunchTemplateArgs(
+            launch_template_specification=aws.autoscaling.GroupMixedInstancesPolicyLaunchTemplateLaunchTemplateSpecificationArgs(
+                launch_template_id=launch_template_spec["id"],
+                version=launch_template_spec["version"],
+            ),
+            overrides=[
+                aws.autoscaling.GroupMixedInstancesPolicyLaunchTemplateOverrideArgs(instance_type=instance_type)
+                for instance_type in fleet["instanceTypes"]
+            ],
+        ),
+    )
@@ -0,0 +1,146 @@
+import json
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import iam
+
+# Warm pools are opt-in per stack; instance refresh is on by default so launch template changes roll out.
+DEFAULT_WARM_POOL = {
+    "enabled": False,
+    "poolState": "Stopped",
+    "minSize": 1,
+    "maxGroupPreparedCapacity": None,
+    "reuseOnScaleIn": True,
+    "readinessTimeout": 300,
+    "defaultResult": "ABANDON",
+}
+DEFAULT_INSTANCE_REFRESH = {
+    "enabled": True,
+    "minHealthyPercentage": 100,
+    "maxHealthyPercentage": 200,
+    "instanceWarmup": 60,
+    "checkpointPercentages": [50, 100],
+    "checkpointDelay": 120,
+    "skipMatching": True,
+    "autoRollback": True,
+}
+POOL_STATES = ("Stopped", "Hibernated", "Running")
+LAUNCH_HOOK_NAME = "launch-readiness"
+HEALTH_URL = "http://localhost:8080/healthz"
+
+
+class InstanceLifecycleError(ValueError):
+    pass
+
+
+def load_warm_pool_config(config: pulumi.Config) -> dict:
+    warm_pool = {**DEFAULT_WARM_POOL, **(config.get_object("warmPool") or {})}
+    if warm_pool["poolState"] not in POOL_STATES:
+        raise InstanceLifecycleError(f"warmPool.poolState must be one of {', '.join(POOL_STATES)}")
+    if warm_pool["defaultResult"] not in ("ABANDON", "CONTINUE"):
+        raise InstanceLifecycleError("warmPool.defaultResult must be ABANDON or CONTINUE")
+    return warm_pool
+
+
+def load_instance_refresh_config(config: pulumi.Config) -> dict:
+    refresh = {**DEFAULT_INSTANCE_REFRESH, **(config.get_object("instanceRefresh") or {})}
+    if not 0 <= refresh["minHealthyPercentage"] <= 100:
+        raise InstanceLifecycleError("instanceRefresh.minHealthyPercentage must be between 0 and 100")
+    if not 100 <= refresh["maxHealthyPercentage"] <= 200:
+        raise InstanceLifecycleError("instanceRefresh.maxHealthyPercentage must be between 100 and 200")
+    if refresh["maxHealthyPercentage"] - refresh["minHealthyPercentage"] > 100:
+        raise InstanceLifecycleError("instanceRefresh health percentages can be at most 100 apart")
+    checkpoints = refresh["checkpointPercentages"] or []
+    if checkpoints and (checkpoints != sorted(checkpoints) or checkpoints[-1] != 100):
+        raise InstanceLifecycleError("instanceRefresh.checkpointPercentages must be ascending and end at 100")
+    return refresh
+
+
+def warm_pool_args(warm_pool: dict):
+    if not warm_pool["enabled"]:
+        return None
+    return aws.autoscaling.GroupWarmPoolArgs(
+        pool_state=warm_pool["poolState"],
+        min_size=warm_pool["minSize"],
+        max_group_prepared_capacity=warm_pool["maxGroupPreparedCapacity"],
+        instance_reuse_policy=aws.autoscaling.GroupWarmPoolInstanceReusePolicyArgs(
+            reuse_on_scale_in=warm_pool["reuseOnScaleIn"],
+        ),
+    )
+
+
+def instance_refresh_args(refresh: dict):
+    if not refresh["enabled"]:
+        return None
+    return aws.autoscaling.GroupInstanceRefreshArgs(
+        strategy="Rolling",
+        preferences=aws.autoscaling.GroupInstanceRefreshPreferencesArgs(
+            min_healthy_percentage=refresh["minHealthyPercentage"],
+            max_healthy_percentage=refresh["maxHealthyPercentage"],
+            instance_warmup=str(refresh["instanceWarmup"]),
+            checkpoint_percentages=refresh["checkpointPercentages"] or None,
+            checkpoint_delay=str(refresh["checkpointDelay"]) if refresh["checkpointPercentages"] else None,
+            skip_matching=refresh["skipMatching"],
+            auto_rollback=refresh["autoRollback"],
+        ),
+    )
+
+
+def readiness_script(region: str, group_name: str) -> str:
+    """Per-boot script that completes the launch lifecycle hook once the web app passes /healthz.
+
+    It runs on every boot because instances coming out of a stopped or hibernated warm pool do not
+    run user data again. Instances headed into the warm pool complete the hook straight away; only
+    instances going into service wait for the app. infra/user_data.py installs it.
+    """
+    return f"""#!/bin/bash
+IMDS=http://169.254.169.254/latest
+TOKEN=$(curl -s -X PUT "$IMDS/api/token" -H "X-aws-ec2-metadata-token-ttl-seconds: 600")
+INSTANCE_ID=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" $IMDS/meta-data/instance-id)
+TARGET_STATE=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" $IMDS/meta-data/autoscaling/target-lifecycle-state)
+if [ "$TARGET_STATE" = "InService" ]; then
+    until curl -sf {HEALTH_URL} > /dev/null; do sleep 2; done
+fi
+aws autoscaling complete-lifecycle-action \\
+    --region {region} \\
+    --auto-scaling-group-name {group_name} \\
+    --lifecycle-hook-name {LAUNCH_HOOK_NAME} \\
+    --lifecycle-action-result CONTINUE \\
+    --instance-id "$INSTANCE_ID"
+"""
+
+
+def launch_hook_args(warm_pool: dict):
+    """The readiness hook, declared on the group itself so it is in place before the first launch.
+
+    A separate LifecycleHook resource would only be added once the group exists, after its first
+    instances and the first fill of the warm pool had already launched ungated.
+    """
+    if not warm_pool["enabled"]:
+        return None
+    return [aws.autoscaling.GroupInitialLifecycleHookArgs(
+        name=LAUNCH_HOOK_NAME,
+        lifecycle_transition="autoscaling:EC2_INSTANCE_LAUNCHING",
+        heartbeat_timeout=warm_pool["readinessTimeout"],
+        default_result=warm_pool["defaultResult"],
+    )]
+
+
+def grant_complete_lifecycle_action(config: pulumi.Config, group_name: str, ec2_role: iam.Role) -> iam.RolePolicy:
+    """Let instances complete the launch hook themselves.
+
+    The ARN is built from the group name so the policy can exist before the group does.
+    """
+    region = config.require("region")
+    account_id = config.require("account_id")
+    return aws.iam.RolePolicy('lifecycleHookPolicy',
+        role=ec2_role.id,
+        policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Action": "autoscaling:CompleteLifecycleAction",
+                "Resource": f"arn:aws:autoscaling:{region}:{account_id}:autoScalingGroup:*:"
+                            f"autoScalingGroupName/{group_name}"
+            }]
+        }))
@@ -0,0 +1,160 @@
+import base64
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+import pulumi
+
+from infra.availability_zones import DEFAULT_CACHE_DIR
+
+CACHE_DIR_ENV = "PULUMI_LAMBDA_BUILD_CACHE_DIR"
+DEFAULT_LAMBDA_BUILD = {
+    # Directory holding lambda_function.py; unset keeps the hand-built Archive.zip
+    "source": None,
+    # Pinned requirements for the dependency layer, e.g. lambda/requirements.lock
+    "lockFile": None,
+    "exclude": ["__pycache__", "*.pyc", ".*", "tests"],
+}
+LAYER_EXCLUDE = ["__pycache__", "*.pyc"]
+# Zip timestamps cannot predate 1980; every entry gets this one so rebuilds are byte-identical
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+PIP_PLATFORMS = {
+    "x86_64": "manylinux2014_x86_64",
+    "arm64": "manylinux2014_aarch64",
+}
+# Bump to invalidate every cached artifact when the packaging itself changes
+BUILD_FORMAT = "1"
+
+
+class LambdaBuildError(ValueError):
+    pass
+
+
+class Artifact:
+    """A reproducible zip in the local cache together with the hashes Lambda compares."""
+
+    def __init__(self, path: str, digest: str):
+        self.path = path
+        self.digest = digest
+
+    @property
+    def archive(self) -> pulumi.FileArchive:
+        return pulumi.FileArchive(self.path)
+
+    @property
+    def source_code_hash(self) -> str:
+        """Base64 SHA-256 of the zip bytes, the form Lambda reports as CodeSha256."""
+        with open(self.path, "rb") as f:
+            return base64.b64encode(hashlib.sha256(f.read()).digest()).decode()
+
+
+def cache_dir() -> str:
+    return os.environ.get(CACHE_DIR_ENV, os.path.join(DEFAULT_CACHE_DIR, "lambda-artifacts"))
+
+
+def load_build_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_LAMBDA_BUILD, **(config.get_object("lambdaBuild") or {})}
+    for key in ("source", "lockFile"):
+        if settings[key] and not os.path.exists(settings[key]):
+            raise LambdaBuildError(f"lambdaBuild.{key} {settings[key]} does not exist")
+    if settings["source"] and not os.path.isdir(settings["source"]):
+        raise LambdaBuildError("lambdaBuild.source must be a directory")
+    return settings
+
+
+def collect_files(root: str, exclude: list) -> list:
+    """Relative paths below `root`, sorted, skipping anything whose name matches `exclude`."""
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not any(fnmatch.fnmatch(d, pattern) for pattern in exclude)]
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in exclude):
+                continue
+            files.append(os.path.relpath(os.path.join(directory, filename), root).replace(os.sep, "/"))
+    return sorted(files)
+
+
+def tree_digest(root: str, files: list, *salt: str) -> str:
+    """SHA-256 over the file names and contents plus anything else the build depends on."""
+    digest = hashlib.sha256(BUILD_FORMAT.encode())
+    for value in salt:
+        digest.update(b"\0" + value.encode())
+    for name in files:
+        digest.update(b"\0" + name.encode() + b"\0")
+        with open(os.path.join(root, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def write_reproducible_zip(root: str, files: list, path: str):
+    """Zip `files` in sorted order with fixed timestamps and permissions, then move it into place atomically."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    with zipfile.ZipFile(tmp_path, "w") as archive:
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            info = zipfile.ZipInfo(name, date_time=FIXED_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            mode = 0o755 if os.access(full_path, os.X_OK) else 0o644
+            info.external_attr = (0o100000 | mode) << 16
+            with open(full_path, "rb") as f:
+                archive.writestr(info, f.read(), compresslevel=9)
+    os.replace(tmp_path, path)
+
+
+def cached_artifact(kind: str, digest: str, build) -> Artifact:
+    """Return the cached `<kind>-<digest>.zip`, calling `build(path)` only when it is not there yet."""
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}-{digest}.zip")
+    if not os.path.exists(path):
+        pulumi.log.info(f"building {kind} package {digest[:12]}")
+        build(path)
+    return Artifact(path, digest)
+
+
+def build_function_package(source: str, exclude: list) -> Artifact:
+    """Package the handler sources; unchanged sources map to the same cached zip."""
+    files = collect_files(source, exclude)
+    if not files:
+        raise LambdaBuildError(f"lambdaBuild.source {source} has no files to package")
+    digest = tree_digest(source, files)
+    return cached_artifact("function", digest, lambda path: write_reproducible_zip(source, files, path))
+
+
+def build_dependency_layer(lock_file: str, runtime: str, architecture: str) -> Artifact:
+    """Install the locked requirements for the target runtime and architecture into a layer zip.
+
+    The cache key is the lock file plus the target, so pip only runs when one of them changes.
+    """
+    with open(lock_file, "rb") as f:
+        if not f.read().strip():
+            raise LambdaBuildError(f"lambdaBuild.lockFile {lock_file} is empty")
+    digest = tree_digest(os.path.dirname(os.path.abspath(lock_file)), [os.path.basename(lock_file)],
+                         runtime, architecture)
+
+    def build(path):
+        staging = tempfile.mkdtemp(prefix="lambda-layer-")
+        try:
+            target = os.path.join(staging, "python")
+            # The lock file pins every transitive requirement, so pip must not resolve more
+            subprocess.run([
+                sys.executable, "-m", "pip", "install",
+                "--quiet", "--no-compile", "--no-deps",
+                "--requirement", lock_file,
+                "--target", target,
+                "--platform", PIP_PLATFORMS[architecture],
+                "--implementation", "cp",
+                "--python-version", runtime.replace("python", ""),
+                "--only-binary=:all:",
+            ], check=True)
+            write_reproducible_zip(staging, collect_files(staging, LAYER_EXCLUDE), path)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    return cached_artifact("layer", digest, build)
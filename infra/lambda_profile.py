@@ -0,0 +1,116 @@
+import pulumi
+import pulumi_aws as aws
+
+DEFAULT_LAMBDA_PROFILE = {
+    # Matches the Python the README builds the dependency bundle with
+    "runtime": "python3.11",
+    # arm64 needs the dependencies built for aarch64 as well
+    "architecture": "x86_64",
+    "memorySize": 512,
+    "timeout": 30,
+    "reservedConcurrency": None,
+    # Provisioned concurrency on the `live` alias; 0 invokes $LATEST as before
+    "provisionedConcurrency": 0,
+    # Target utilisation for provisioned concurrency autoscaling, 0 turns it off
+    "utilizationTarget": 0.7,
+    # [{"name": ..., "schedule": "cron(...)", "min": n, "max": n}, ...]
+    "schedules": [],
+    # Zip with a top-level python/ directory holding the heavy dependencies
+    "dependencyLayerArchive": None,
+}
+RUNTIMES = ("python3.9", "python3.10", "python3.11", "python3.12", "python3.13")
+ARCHITECTURES = ("x86_64", "arm64")
+ALIAS_NAME = "live"
+
+
+class LambdaProfileError(ValueError):
+    pass
+
+
+def load_lambda_profile(config: pulumi.Config) -> dict:
+    profile = {**DEFAULT_LAMBDA_PROFILE, **(config.get_object("lambdaProfile") or {})}
+    if profile["runtime"] not in RUNTIMES:
+        raise LambdaProfileError(f"lambdaProfile.runtime must be one of {', '.join(RUNTIMES)}")
+    if profile["architecture"] not in ARCHITECTURES:
+        raise LambdaProfileError(f"lambdaProfile.architecture must be one of {', '.join(ARCHITECTURES)}")
+    if not 128 <= profile["memorySize"] <= 10240:
+        raise LambdaProfileError("lambdaProfile.memorySize must be between 128 and 10240 MB")
+    if not 1 <= profile["timeout"] <= 900:
+        raise LambdaProfileError("lambdaProfile.timeout must be between 1 and 900 seconds")
+    reserved = profile["reservedConcurrency"]
+    if reserved is not None and profile["provisionedConcurrency"] > reserved:
+        raise LambdaProfileError("lambdaProfile.provisionedConcurrency cannot exceed reservedConcurrency")
+    for schedule in profile["schedules"]:
+        if not profile["provisionedConcurrency"]:
+            raise LambdaProfileError("lambdaProfile.schedules need provisionedConcurrency on the alias")
+        if schedule["min"] > schedule["max"]:
+            raise LambdaProfileError(f"lambdaProfile schedule {schedule['name']}: min is above max")
+    return profile
+
+
+def create_dependency_layer(profile: dict, archive, source_code_hash: str = None):
+    """Publish the heavy dependencies as a layer so the function package stays small."""
+    if archive is None:
+        return None
+    return aws.lambda_.LayerVersion('lambdaDependencyLayer',
+        layer_name='submission-dependencies',
+        description='Google client libraries and other heavy dependencies of myLambdaFunction',
+        code=archive,
+        source_code_hash=source_code_hash,
+        compatible_runtimes=[profile["runtime"]],
+        compatible_architectures=[profile["architecture"]])
+
+
+def create_live_alias(profile: dict, lambda_function: aws.lambda_.Function):
+    """Point the `live` alias at the published version and keep it warm with provisioned concurrency.
+
+    A fixed amount is configured directly. With schedules, Application Auto Scaling owns the
+    capacity instead: the schedules move its bounds and a target tracking policy on
+    provisioned concurrency utilisation scales between them.
+    """
+    alias = aws.lambda_.Alias('myLambdaFunctionLiveAlias',
+        name=ALIAS_NAME,
+        function_name=lambda_function.name,
+        function_version=lambda_function.version)
+
+    if not profile["schedules"]:
+        aws.lambda_.ProvisionedConcurrencyConfig('myLambdaFunctionProvisionedConcurrency',
+            function_name=lambda_function.name,
+            qualifier=alias.name,
+            provisioned_concurrent_executions=profile["provisionedConcurrency"])
+        return alias
+
+    scaling_target = aws.appautoscaling.Target('myLambdaFunctionConcurrencyTarget',
+        service_namespace='lambda',
+        scalable_dimension='lambda:function:ProvisionedConcurrency',
+        resource_id=pulumi.Output.concat("function:", lambda_function.name, ":", alias.name),
+        min_capacity=profile["provisionedConcurrency"],
+        max_capacity=max([profile["provisionedConcurrency"]] + [s["max"] for s in profile["schedules"]]))
+
+    for schedule in profile["schedules"]:
+        aws.appautoscaling.ScheduledAction(f"myLambdaFunctionConcurrency-{schedule['name']}",
+            name=f"lambda-concurrency-{schedule['name']}",
+            service_namespace=scaling_target.service_namespace,
+            scalable_dimension=scaling_target.scalable_dimension,
+            resource_id=scaling_target.resource_id,
+            schedule=schedule["schedule"],
+            timezone=schedule.get("timezone", "UTC"),
+            scalable_target_action=aws.appautoscaling.ScheduledActionScalableTargetActionArgs(
+                min_capacity=schedule["min"],
+                max_capacity=schedule["max"],
+            ))
+
+    if profile["utilizationTarget"]:
+        aws.appautoscaling.Policy('myLambdaFunctionConcurrencyTracking',
+            policy_type='TargetTrackingScaling',
+            service_namespace=scaling_target.service_namespace,
+            scalable_dimension=scaling_target.scalable_dimension,
+            resource_id=scaling_target.resource_id,
+            target_tracking_scaling_policy_configuration=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationArgs(
+                target_value=profile["utilizationTarget"],
+                predefined_metric_specification=aws.appautoscaling.PolicyTargetTrackingScalingPolicyConfigurationPredefinedMetricSpecificationArgs(
+                    predefined_metric_type='LambdaProvisionedConcurrencyUtilization',
+                ),
+            ))
+
+    return alias
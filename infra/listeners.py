@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import pulumi
+import pulumi_aws as aws
+
+DEFAULT_LISTENER = {
+    # TLS 1.3 with TLS 1.2 fallback and only forward-secret ciphers
+    "sslPolicy": "ELBSecurityPolicy-TLS13-1-2-2021-06",
+    # Answer plain HTTP on port 80 with a permanent redirect to HTTPS
+    "redirectHttp": True,
+    # Seconds an idle connection stays open; keep the app's keep-alive timeout above this
+    "idleTimeout": 120,
+    # Seconds a client connection may be reused before the ALB closes it
+    "clientKeepAlive": 3600,
+    "http2": True,
+    "desyncMitigationMode": "defensive",
+    "dropInvalidHeaderFields": True,
+    # append, preserve or remove
+    "xffHeaderProcessingMode": "append",
+}
+DESYNC_MITIGATION_MODES = ("monitor", "defensive", "strictest")
+XFF_HEADER_PROCESSING_MODES = ("append", "preserve", "remove")
+HTTPS_PORT = 443
+HTTP_PORT = 80
+
+
+class ListenerConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Listeners:
+    https: aws.lb.Listener
+    http_redirect: Optional[aws.lb.Listener] = None
+
+
+def load_listener_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_LISTENER, **(config.get_object("listener") or {})}
+    if not settings["sslPolicy"].startswith("ELBSecurityPolicy-"):
+        raise ListenerConfigError("listener.sslPolicy must name an ELBSecurityPolicy-* policy")
+    if not 1 <= settings["idleTimeout"] <= 4000:
+        raise ListenerConfigError("listener.idleTimeout must be between 1 and 4000 seconds")
+    if not 60 <= settings["clientKeepAlive"] <= 604800:
+        raise ListenerConfigError("listener.clientKeepAlive must be between 60 and 604800 seconds")
+    if settings["clientKeepAlive"] < settings["idleTimeout"]:
+        raise ListenerConfigError("listener.clientKeepAlive cannot be shorter than listener.idleTimeout")
+    if settings["desyncMitigationMode"] not in DESYNC_MITIGATION_MODES:
+        raise ListenerConfigError(f"listener.desyncMitigationMode must be one of {', '.join(DESYNC_MITIGATION_MODES)}")
+    if settings["xffHeaderProcessingMode"] not in XFF_HEADER_PROCESSING_MODES:
+        raise ListenerConfigError(
+            f"listener.xffHeaderProcessingMode must be one of {', '.join(XFF_HEADER_PROCESSING_MODES)}")
+    return settings
+
+
+def load_balancer_args(settings: dict) -> dict:
+    """Connection and header handling attributes of the application load balancer."""
+    return {
+        "idle_timeout": settings["idleTimeout"],
+        "client_keep_alive": settings["clientKeepAlive"],
+        "enable_http2": settings["http2"],
+        "desync_mitigation_mode": settings["desyncMitigationMode"],
+        "drop_invalid_header_fields": settings["dropInvalidHeaderFields"],
+        "xff_header_processing_mode": settings["xffHeaderProcessingMode"],
+    }
+
+
+def create_listeners(settings: dict, app_lb: aws.lb.LoadBalancer, target_group: aws.lb.TargetGroup,
+                     certificate_arn: str, origin_header: tuple = None) -> Listeners:
+    """Create the HTTPS listener forwarding to the target group and, if enabled, the port 80 redirect.
+
+    With `origin_header` as a (name, secret) pair, only requests carrying that header are forwarded
+    and everything else is refused, so the CDN in front cannot be bypassed.
+    """
+    if origin_header is None:
+        default_action = aws.lb.ListenerDefaultActionArgs(
+                    type="forward",
+                    target_group_arn=target_group.arn
+                )
+    else:
+        default_action = aws.lb.ListenerDefaultActionArgs(
+                    type="fixed-response",
+                    fixed_response=aws.lb.ListenerDefaultActionFixedResponseArgs(
+                        content_type="text/plain",
+                        message_body="Forbidden",
+                        status_code="403",
+                    )
+                )
+
+    # Create a listener
+    listener = aws.lb.Listener("listener",
+        load_balancer_arn=app_lb.arn,
+        port=HTTPS_PORT,
+        protocol="HTTPS",
+        ssl_policy=settings["sslPolicy"],
+        certificate_arn=certificate_arn,
+        default_actions=[default_action],
+    )
+
+    if origin_header is not None:
+        header_name, secret = origin_header
+        aws.lb.ListenerRule("originHeaderRule",
+            listener_arn=listener.arn,
+            priority=1,
+            conditions=[aws.lb.ListenerRuleConditionArgs(
+                http_header=aws.lb.ListenerRuleConditionHttpHeaderArgs(
+                    http_header_name=header_name,
+                    values=[secret],
+                ),
+            )],
+            actions=[aws.lb.ListenerRuleActionArgs(
+                type="forward",
+                target_group_arn=target_group.arn,
+            )])
+
+    if not settings["redirectHttp"]:
+        return Listeners(https=listener)
+
+    redirect_listener = aws.lb.Listener("httpRedirectListener",
+        load_balancer_arn=app_lb.arn,
+        port=HTTP_PORT,
+        protocol="HTTP",
+        default_actions=[aws.lb.ListenerDefaultActionArgs(
+                    type="redirect",
+                    redirect=aws.lb.ListenerDefaultActionRedirectArgs(
+                        protocol="HTTPS",
+                        port=str(HTTPS_PORT),
+                        status_code="HTTP_301",
+                    )
+                )],
+    )
+
+    return Listeners(https=listener, http_redirect=redirect_listener)
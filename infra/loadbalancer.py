@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import ec2
+
+from infra.cdn import ORIGIN_HEADER, create_distribution, load_cdn_config, origin_secret
+from infra.listeners import create_listeners, load_balancer_args, load_listener_config
+from infra.network import Network
+from infra.security import SecurityGroups
+
+DEFAULT_TARGET_GROUP = {
+    "algorithm": "least_outstanding_requests",
+    # Seconds a new target's share of requests ramps up over; 0 turns slow start off
+    "slowStart": 30,
+    # How long in-flight requests may finish on a deregistering target
+    "deregistrationDelay": 30,
+    # "on" lets weighted_random route around anomalous targets
+    "anomalyMitigation": "off",
+    "healthCheck": {
+        "path": "/healthz",
+        "interval": 10,
+        "timeout": 5,
+        "healthyThreshold": 2,
+        "unhealthyThreshold": 3,
+        "matcher": "200",
+    },
+    "stickiness": {
+        "enabled": False,
+        # lb_cookie or app_cookie, which also needs cookieName
+        "type": "lb_cookie",
+        "cookieDuration": 86400,
+        "cookieName": None,
+    },
+}
+ALGORITHMS = ("round_robin", "least_outstanding_requests", "weighted_random")
+# source_ip and the other types are for Network and Gateway Load Balancers only
+STICKINESS_TYPES = ("lb_cookie", "app_cookie")
+
+
+class TargetGroupConfigError(ValueError):
+    pass
+
+
+@dataclass
+class LoadBalancer:
+    app_lb: aws.lb.LoadBalancer
+    listener: aws.lb.Listener
+    dns_record: aws.route53.Record
+    redirect_listener: Optional[aws.lb.Listener] = None
+    distribution: Optional[aws.cloudfront.Distribution] = None
+
+
+def load_target_group_config(config: pulumi.Config) -> dict:
+    overrides = config.get_object("targetGroup") or {}
+    settings = {**DEFAULT_TARGET_GROUP, **overrides}
+    for key in ("healthCheck", "stickiness"):
+        settings[key] = {**DEFAULT_TARGET_GROUP[key], **overrides.get(key, {})}
+
+    health_check = settings["healthCheck"]
+    stickiness = settings["stickiness"]
+    if settings["algorithm"] not in ALGORITHMS:
+        raise TargetGroupConfigError(f"targetGroup.algorithm must be one of {', '.join(ALGORITHMS)}")
+    if settings["slowStart"] and not 30 <= settings["slowStart"] <= 900:
+        raise TargetGroupConfigError("targetGroup.slowStart must be 0 or between 30 and 900 seconds")
+    if settings["slowStart"] and settings["algorithm"] == "weighted_random":
+        raise TargetGroupConfigError("slow start is not supported with the weighted_random algorithm")
+    if settings["anomalyMitigation"] == "on" and settings["algorithm"] != "weighted_random":
+        raise TargetGroupConfigError("targetGroup.anomalyMitigation needs the weighted_random algorithm")
+    if not 0 <= settings["deregistrationDelay"] <= 3600:
+        raise TargetGroupConfigError("targetGroup.deregistrationDelay must be between 0 and 3600 seconds")
+    if not 5 <= health_check["interval"] <= 300:
+        raise TargetGroupConfigError("targetGroup.healthCheck.interval must be between 5 and 300 seconds")
+    if not 2 <= health_check["timeout"] < health_check["interval"]:
+        raise TargetGroupConfigError("targetGroup.healthCheck.timeout must be at least 2 seconds and below the interval")
+    for key in ("healthyThreshold", "unhealthyThreshold"):
+        if not 2 <= health_check[key] <= 10:
+            raise TargetGroupConfigError(f"targetGroup.healthCheck.{key} must be between 2 and 10")
+    # The stickiness block reaches the target group even when disabled, so its type is always checked
+    if stickiness["type"] not in STICKINESS_TYPES:
+        raise TargetGroupConfigError(f"targetGroup.stickiness.type must be one of {', '.join(STICKINESS_TYPES)}")
+    if stickiness["type"] == "app_cookie" and not stickiness["cookieName"]:
+        raise TargetGroupConfigError("app_cookie stickiness needs targetGroup.stickiness.cookieName")
+    if stickiness["enabled"]:
+        if not 1 <= stickiness["cookieDuration"] <= 604800:
+            raise TargetGroupConfigError("targetGroup.stickiness.cookieDuration must be between 1 and 604800 seconds")
+        if settings["algorithm"] == "least_outstanding_requests":
+            # Sticky clients bypass the algorithm, so the least-loaded target rarely gets picked
+            raise TargetGroupConfigError("stickiness defeats least_outstanding_requests; use round_robin with it")
+    return settings
+
+
+def create_target_group(config: pulumi.Config, vpc: ec2.Vpc) -> aws.lb.TargetGroup:
+    """Create the web app target group with the traffic profile from stack config."""
+    settings = load_target_group_config(config)
+    health_check = settings["healthCheck"]
+    stickiness = settings["stickiness"]
+
+    # Create a target group
+    return aws.lb.TargetGroup("targetGroup",
+        port=8080,  # Use your application port here
+        protocol="HTTP",  # or "HTTPS" if you're using SSL/TLS
+        vpc_id=vpc.id,  # Use the VPC ID here
+        target_type="instance",
+        load_balancing_algorithm_type=settings["algorithm"],
+        load_balancing_anomaly_mitigation=settings["anomalyMitigation"] if settings["algorithm"] == "weighted_random" else None,
+        slow_start=settings["slowStart"],
+        deregistration_delay=settings["deregistrationDelay"],
+        health_check=aws.lb.TargetGroupHealthCheckArgs(
+                    enabled=True,
+                    interval=health_check["interval"],
+                    path=health_check["path"],
+                    protocol='HTTP',
+                    port='8080',
+                    healthy_threshold=health_check["healthyThreshold"],
+                    unhealthy_threshold=health_check["unhealthyThreshold"],
+                    timeout=health_check["timeout"],
+                    matcher=health_check["matcher"]
+                ),
+        stickiness=aws.lb.TargetGroupStickinessArgs(
+                    enabled=stickiness["enabled"],
+                    type=stickiness["type"],
+                    cookie_duration=stickiness["cookieDuration"],
+                    cookie_name=stickiness["cookieName"] if stickiness["type"] == "app_cookie" else None,
+                ),
+
+    )
+
+
+def create_load_balancer(config: pulumi.Config, network: Network, security_groups: SecurityGroups,
+                         target_group: aws.lb.TargetGroup) -> LoadBalancer:
+    """Create the application load balancer, its listeners and the Route53 alias."""
+    certificate_arn = config.require("certificate_arn")
+    hosted_zone_id = config.require("hosted-zone-id")
+    domain_name = config.require("domain-name")
+    listener_settings = load_listener_config(config)
+    cdn_settings = load_cdn_config(config)
+    secret = origin_secret(config, cdn_settings)
+    if cdn_settings["enabled"]:
+        # CloudFront redirects viewers to HTTPS itself and only talks to the origin over HTTPS
+        listener_settings["redirectHttp"] = False
+
+    # Application Load Balancer
+    app_lb = aws.lb.LoadBalancer('appLoadBalancer',
+        internal=False,
+        load_balancer_type="application",
+        security_groups=[security_groups.lb.id],
+        subnets=network.public_subnet_ids,
+        enable_deletion_protection=False,
+        **load_balancer_args(listener_settings)
+    )
+
+    listeners = create_listeners(listener_settings, app_lb, target_group, certificate_arn,
+                                 origin_header=(ORIGIN_HEADER, secret) if secret is not None else None)
+
+    distribution = None
+    alias = {
+        'name': app_lb.dns_name,
+        'zone_id': app_lb.zone_id,
+        'evaluate_target_health': True
+    }
+    if cdn_settings["enabled"]:
+        distribution = create_distribution(cdn_settings, domain_name, app_lb, secret).distribution
+        # CloudFront aliases cannot evaluate target health
+        alias = {
+            'name': distribution.domain_name,
+            'zone_id': distribution.hosted_zone_id,
+            'evaluate_target_health': False
+        }
+
+    # DNS Updates with Route53
+    dns_record = aws.route53.Record('dnsRecord',
+        zone_id=hosted_zone_id,  # Your Route53 Zone ID
+        name=domain_name,  # Update with your domain
+        type='A',
+        aliases=[alias])
+
+    return LoadBalancer(app_lb=app_lb, listener=listeners.https, dns_record=dns_record,
+                        redirect_listener=listeners.http_redirect, distribution=distribution)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+
+import pulumi
+from pulumi_aws import ec2
+
+from infra.availability_zones import resolve_availability_zones
+from infra.cidr_plan import DEFAULT_TIERS, plan_subnets
+
+
+@dataclass
+class Network:
+    vpc: ec2.Vpc
+    public_subnets: list
+    private_subnets: list
+    data_subnets: list
+    availability_zones: list
+    public_subnet_ids: list
+    internet_gateway: ec2.InternetGateway
+    public_route_table: ec2.RouteTable
+    private_route_table: ec2.RouteTable
+
+
+def create_network(config: pulumi.Config) -> Network:
+    """Create the VPC, public/private subnets, internet gateway and route tables."""
+    vpc = ec2.Vpc('vpc',
+        cidr_block= config.require("cidrBlock"),
+        # Private hosted zones and private DNS on VPC endpoints need both DNS settings on
+        enable_dns_support=True,
+        enable_dns_hostnames=True,
+        tags={'Name': 'my-vpc'})
+
+    # Plan the subnet addressing up front so every subnet registers without waiting on an Output
+    availability_zones = resolve_availability_zones(config)
+    subnet_plan = plan_subnets(config.require("cidrBlock"), availability_zones,
+                               {**DEFAULT_TIERS, **(config.get_object("subnetTiers") or {})})
+
+    # Create subnets
+    public_subnets = [
+        ec2.Subnet(f'public-subnet-{subnet.availability_zone}',
+            vpc_id=vpc.id,
+            cidr_block=subnet.cidr_block,
+            availability_zone=subnet.availability_zone,
+            map_public_ip_on_launch=True, # makes this a public subnet
+            tags={"Name": f'public-subnet-{subnet.availability_zone}'}
+        ) for subnet in subnet_plan["public"]
+    ]
+
+    private_subnets = [
+        ec2.Subnet(f'private-subnet-{subnet.availability_zone}',
+            vpc_id=vpc.id,
+            cidr_block=subnet.cidr_block,
+            availability_zone=subnet.availability_zone,
+            tags={"Name": f'private-subnet-{subnet.availability_zone}'}
+        ) for subnet in subnet_plan["private"]
+    ]
+
+    data_subnets = [
+        ec2.Subnet(f'data-subnet-{subnet.availability_zone}',
+            vpc_id=vpc.id,
+            cidr_block=subnet.cidr_block,
+            availability_zone=subnet.availability_zone,
+            tags={"Name": f'data-subnet-{subnet.availability_zone}'}
+        ) for subnet in subnet_plan.get("data", [])
+    ]
+
+    # Create an Internet Gateway and attach the Internet Gateway to the VPC.
+    internet_gateway = ec2.InternetGateway("my-internet-gateway",
+        vpc_id=vpc.id
+    )
+
+    # Create a public route table
+    public_route_table = ec2.RouteTable("public-route-table",
+        vpc_id=vpc.id
+    )
+
+    # Attach all public subnets to the public route table
+    for index, subnet in enumerate(public_subnets):
+        ec2.RouteTableAssociation(f"public-subnet-rt-association-{index}",
+            subnet_id=subnet.id,
+            route_table_id=public_route_table.id
+        )
+
+    # Create a private route table
+    private_route_table = ec2.RouteTable("private-route-table",
+        vpc_id=vpc.id
+    )
+
+    # Attach all private subnets to the private route table
+    for index, subnet in enumerate(private_subnets):
+        ec2.RouteTableAssociation(f"private-subnet-rt-association-{index}",
+            subnet_id=subnet.id,
+            route_table_id=private_route_table.id
+        )
+
+    # The data tier has no route out either, so it shares the private route table
+    for index, subnet in enumerate(data_subnets):
+        ec2.RouteTableAssociation(f"data-subnet-rt-association-{index}",
+            subnet_id=subnet.id,
+            route_table_id=private_route_table.id
+        )
+
+    # Create a public route in the public route table
+    ec2.Route("internet-gateway-route",
+        route_table_id=public_route_table.id,
+        destination_cidr_block="0.0.0.0/0",
+        gateway_id=internet_gateway.id
+    )
+
+    # Extract subnet IDs from public_subnets
+    public_subnet_ids = [subnet.id for subnet in public_subnets]
+
+    return Network(
+        vpc=vpc,
+        public_subnets=public_subnets,
+        private_subnets=private_subnets,
+        data_subnets=data_subnets,
+        availability_zones=availability_zones,
+        public_subnet_ids=public_subnet_ids,
+        internet_gateway=internet_gateway,
+        public_route_table=public_route_table,
+        private_route_table=private_route_table,
+    )
@@ -0,0 +1,333 @@
+import json
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+
+from infra.database import load_database_config
+from infra.db_parameters import instance_memory_bytes, sized_parameters
+from infra.lambda_profile import load_lambda_profile
+from infra.user_data import BOOT_METRIC, BOOT_METRIC_NAMESPACE, BOOT_PHASES
+
+DEFAULT_OBSERVABILITY = {
+    "enabled": True,
+    # Email addresses subscribed to the ops topic; each one has to confirm the subscription
+    "alarmEmails": [],
+    # Seconds per datapoint, and how many of the last evaluationPeriods datapoints must breach
+    "period": 60,
+    "evaluationPeriods": 5,
+    "datapointsToAlarm": 3,
+    # Load balancer TargetResponseTime percentiles, in milliseconds
+    "latency": {"p50": 100, "p90": 300, "p99": 1000},
+    # Percent of requests answered with a 5xx by the targets or the load balancer
+    "errorRate": 1,
+    "rds": {
+        # Percent of max_connections
+        "connections": 80,
+        "readLatency": 20,
+        "writeLatency": 50,
+    },
+    "lambda": {
+        "durationP99": 10000,
+        # Seconds an asynchronous SNS event may wait before the function picks it up
+        "eventAge": 60,
+    },
+    "dynamodb": {
+        "operations": ["GetItem", "PutItem", "Query"],
+        "latencyP99": 25,
+    },
+}
+LATENCY_PERCENTILES = ("p50", "p90", "p99")
+DYNAMODB_OPERATIONS = ("GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan", "BatchGetItem",
+                       "BatchWriteItem")
+
+
+class ObservabilityConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Observability:
+    topic: aws.sns.Topic
+    dashboard: aws.cloudwatch.Dashboard
+    alarms: list
+
+
+def load_observability_config(config: pulumi.Config) -> dict:
+    overrides = config.get_object("observability") or {}
+    settings = {**DEFAULT_OBSERVABILITY, **overrides}
+    for nested in ("latency", "rds", "lambda", "dynamodb"):
+        settings[nested] = {**DEFAULT_OBSERVABILITY[nested], **overrides.get(nested, {})}
+
+    latency = [settings["latency"][percentile] for percentile in LATENCY_PERCENTILES]
+    if min(latency) <= 0 or latency != sorted(latency):
+        raise ObservabilityConfigError("observability.latency needs 0 < p50 <= p90 <= p99")
+    if settings["period"] not in (10, 30) and settings["period"] % 60:
+        raise ObservabilityConfigError("observability.period must be 10, 30 or a multiple of 60 seconds")
+    if not 1 <= settings["datapointsToAlarm"] <= settings["evaluationPeriods"]:
+        raise ObservabilityConfigError("observability needs 1 <= datapointsToAlarm <= evaluationPeriods")
+    if not 0 < settings["errorRate"] <= 100:
+        raise ObservabilityConfigError("observability.errorRate must be a percentage above 0")
+    if not 0 < settings["rds"]["connections"] <= 100:
+        raise ObservabilityConfigError("observability.rds.connections must be a percentage above 0")
+    unknown = set(settings["dynamodb"]["operations"]) - set(DYNAMODB_OPERATIONS)
+    if unknown:
+        raise ObservabilityConfigError(f"unknown DynamoDB operations: {', '.join(sorted(unknown))}")
+
+    # An alarm above the function timeout could never fire
+    timeout_ms = load_lambda_profile(config)["timeout"] * 1000
+    if settings["lambda"]["durationP99"] >= timeout_ms:
+        raise ObservabilityConfigError(
+            f"observability.lambda.durationP99 must be below the function timeout of {timeout_ms} ms")
+    return settings
+
+
+def max_connections(config: pulumi.Config) -> int:
+    """max_connections of the database parameter group, which the connections alarm is relative to."""
+    database = load_database_config(config)
+    memory_bytes = instance_memory_bytes(database["instanceClass"], database["memoryGib"])
+    return int(sized_parameters(memory_bytes, database["maxConnections"])["max_connections"])
+
+
+def create_observability(config: pulumi.Config, app_lb: aws.lb.LoadBalancer, target_group: aws.lb.TargetGroup,
+                         rds_instance: aws.rds.Instance, lambda_function: aws.lambda_.Function,
+                         dynamodb_table: aws.dynamodb.Table):
+    """Create the ops topic, SLO alarms and the stack dashboard, or return None when disabled."""
+    settings = load_observability_config(config)
+    if not settings["enabled"]:
+        return None
+
+    topic = aws.sns.Topic('opsAlarmTopic')
+    for index, email in enumerate(settings["alarmEmails"]):
+        aws.sns.TopicSubscription(f'opsAlarmEmail-{index}',
+            topic=topic.arn,
+            protocol="email",
+            endpoint=email)
+
+    lb_dimensions = {"LoadBalancer": app_lb.arn_suffix}
+    target_dimensions = {"LoadBalancer": app_lb.arn_suffix, "TargetGroup": target_group.arn_suffix}
+    rds_dimensions = {"DBInstanceIdentifier": rds_instance.identifier}
+    lambda_dimensions = {"FunctionName": lambda_function.name}
+    table_dimensions = {"TableName": dynamodb_table.name}
+
+    def alarm(name, description, **kwargs):
+        return aws.cloudwatch.MetricAlarm(name,
+            alarm_description=description,
+            comparison_operator="GreaterThanThreshold",
+            evaluation_periods=settings["evaluationPeriods"],
+            datapoints_to_alarm=settings["datapointsToAlarm"],
+            period=None if "metric_queries" in kwargs else settings["period"],
+            # No traffic is not an SLO breach
+            treat_missing_data="notBreaching",
+            alarm_actions=[topic.arn],
+            ok_actions=[topic.arn],
+            **kwargs)
+
+    alarms = []
+    for percentile in LATENCY_PERCENTILES:
+        threshold = settings["latency"][percentile]
+        alarms.append(alarm(f'albLatency{percentile.upper()}Alarm',
+            f"{percentile} target response time above {threshold} ms",
+            namespace="AWS/ApplicationELB",
+            metric_name="TargetResponseTime",
+            extended_statistic=percentile,
+            # TargetResponseTime is reported in seconds
+            threshold=threshold / 1000,
+            dimensions=target_dimensions))
+
+    alarms.append(alarm('alb5xxRateAlarm',
+        f"more than {settings['errorRate']}% of requests answered with 5xx",
+        threshold=settings["errorRate"],
+        metric_queries=[
+            aws.cloudwatch.MetricAlarmMetricQueryArgs(
+                id="errorRate",
+                expression="100 * (FILL(targetErrors, 0) + FILL(lbErrors, 0)) / requests",
+                label="5xx rate (%)",
+                return_data=True,
+            ),
+        ] + [
+            aws.cloudwatch.MetricAlarmMetricQueryArgs(
+                id=query_id,
+                metric=aws.cloudwatch.MetricAlarmMetricQueryMetricArgs(
+                    namespace="AWS/ApplicationELB",
+                    metric_name=metric_name,
+                    dimensions=lb_dimensions,
+                    period=settings["period"],
+                    stat="Sum",
+                ),
+            ) for query_id, metric_name in (("targetErrors", "HTTPCode_Target_5XX_Count"),
+                                             ("lbErrors", "HTTPCode_ELB_5XX_Count"),
+                                             ("requests", "RequestCount"))
+        ]))
+
+    # ALBs have no surge queue; refused connections and unhealthy targets are where overload shows up
+    alarms.append(alarm('albRejectedConnectionsAlarm',
+        "load balancer is refusing connections",
+        namespace="AWS/ApplicationELB",
+        metric_name="RejectedConnectionCount",
+        statistic="Sum",
+        threshold=0,
+        dimensions=lb_dimensions))
+    alarms.append(alarm('targetUnhealthyHostsAlarm',
+        "target group has unhealthy targets",
+        namespace="AWS/ApplicationELB",
+        metric_name="UnHealthyHostCount",
+        statistic="Maximum",
+        threshold=0,
+        dimensions=target_dimensions))
+
+    connections_limit = max_connections(config)
+    alarms.append(alarm('rdsConnectionsAlarm',
+        f"database connections above {settings['rds']['connections']}% of max_connections ({connections_limit})",
+        namespace="AWS/RDS",
+        metric_name="DatabaseConnections",
+        statistic="Maximum",
+        threshold=connections_limit * settings["rds"]["connections"] / 100,
+        dimensions=rds_dimensions))
+    for kind in ("read", "write"):
+        threshold = settings["rds"][f"{kind}Latency"]
+        alarms.append(alarm(f'rds{kind.capitalize()}LatencyAlarm',
+            f"average database {kind} latency above {threshold} ms",
+            namespace="AWS/RDS",
+            metric_name=f"{kind.capitalize()}Latency",
+            statistic="Average",
+            # RDS reports latency in seconds
+            threshold=threshold / 1000,
+            dimensions=rds_dimensions))
+
+    alarms.append(alarm('lambdaDurationAlarm',
+        f"p99 Lambda duration above {settings['lambda']['durationP99']} ms",
+        namespace="AWS/Lambda",
+        metric_name="Duration",
+        extended_statistic="p99",
+        threshold=settings["lambda"]["durationP99"],
+        dimensions=lambda_dimensions))
+    alarms.append(alarm('lambdaThrottlesAlarm',
+        "Lambda invocations are being throttled",
+        namespace="AWS/Lambda",
+        metric_name="Throttles",
+        statistic="Sum",
+        threshold=0,
+        dimensions=lambda_dimensions))
+    alarms.append(alarm('lambdaErrorsAlarm',
+        "Lambda invocations are failing",
+        namespace="AWS/Lambda",
+        metric_name="Errors",
+        statistic="Sum",
+        threshold=0,
+        dimensions=lambda_dimensions))
+    alarms.append(alarm('lambdaEventAgeAlarm',
+        f"asynchronous events wait more than {settings['lambda']['eventAge']} s",
+        namespace="AWS/Lambda",
+        metric_name="AsyncEventAge",
+        statistic="Maximum",
+        threshold=settings["lambda"]["eventAge"] * 1000,
+        dimensions=lambda_dimensions))
+
+    for operation in settings["dynamodb"]["operations"]:
+        alarms.append(alarm(f'dynamodb{operation}LatencyAlarm',
+            f"p99 DynamoDB {operation} latency above {settings['dynamodb']['latencyP99']} ms",
+            namespace="AWS/DynamoDB",
+            metric_name="SuccessfulRequestLatency",
+            extended_statistic="p99",
+            threshold=settings["dynamodb"]["latencyP99"],
+            dimensions={**table_dimensions, "Operation": operation}))
+    for kind in ("Read", "Write"):
+        alarms.append(alarm(f'dynamodb{kind}ThrottlesAlarm',
+            f"DynamoDB {kind.lower()} requests are being throttled",
+            namespace="AWS/DynamoDB",
+            metric_name=f"{kind}ThrottleEvents",
+            statistic="Sum",
+            threshold=0,
+            dimensions=table_dimensions))
+
+    dashboard = aws.cloudwatch.Dashboard('opsDashboard',
+        dashboard_name=f"{pulumi.get_stack()}-overview",
+        dashboard_body=pulumi.Output.all(
+            app_lb.arn_suffix, target_group.arn_suffix, rds_instance.identifier, lambda_function.name,
+            dynamodb_table.name,
+        ).apply(lambda names: json.dumps(dashboard_body(settings, config.require("region"), *names,
+                                                        connections_limit))))
+
+    return Observability(topic=topic, dashboard=dashboard, alarms=alarms)
+
+
+def dashboard_body(settings: dict, region: str, load_balancer: str, target_group: str, db_instance: str,
+                   function_name: str, table_name: str, connections_limit: int) -> dict:
+    """Dashboard widgets, two per row, with the alarm thresholds drawn as horizontal annotations."""
+    lb = ["LoadBalancer", load_balancer]
+    target = lb + ["TargetGroup", target_group]
+    db = ["DBInstanceIdentifier", db_instance]
+    fn = ["FunctionName", function_name]
+    table = ["TableName", table_name]
+
+    def widget(title, metrics, annotations=(), stat="Average"):
+        return {
+            "type": "metric",
+            "width": 12,
+            "height": 6,
+            "properties": {
+                "title": title,
+                "region": region,
+                "stat": stat,
+                "period": settings["period"],
+                "metrics": metrics,
+                "annotations": {"horizontal": [{"label": label, "value": value} for label, value in annotations]},
+            },
+        }
+
+    widgets = [
+        widget("Target response time (s)", [
+            ["AWS/ApplicationELB", "TargetResponseTime", *target, {"stat": percentile, "label": percentile}]
+            for percentile in LATENCY_PERCENTILES
+        ], [(f"{percentile} SLO", settings["latency"][percentile] / 1000) for percentile in LATENCY_PERCENTILES]),
+        widget("Requests and 5xx", [
+            ["AWS/ApplicationELB", "RequestCount", *lb],
+            ["AWS/ApplicationELB", "HTTPCode_Target_5XX_Count", *lb],
+            ["AWS/ApplicationELB", "HTTPCode_ELB_5XX_Count", *lb],
+            ["AWS/ApplicationELB", "RejectedConnectionCount", *lb],
+        ], stat="Sum"),
+        widget("Targets", [
+            ["AWS/ApplicationELB", "HealthyHostCount", *target],
+            ["AWS/ApplicationELB", "UnHealthyHostCount", *target],
+            ["AWS/ApplicationELB", "RequestCountPerTarget", *target, {"stat": "Sum"}],
+        ]),
+        widget("Database connections", [
+            ["AWS/RDS", "DatabaseConnections", *db, {"stat": "Maximum"}],
+        ], [("alarm", connections_limit * settings["rds"]["connections"] / 100)]),
+        widget("Database latency (s)", [
+            ["AWS/RDS", "ReadLatency", *db],
+            ["AWS/RDS", "WriteLatency", *db],
+        ], [("read alarm", settings["rds"]["readLatency"] / 1000),
+            ("write alarm", settings["rds"]["writeLatency"] / 1000)]),
+        widget("Lambda duration (ms)", [
+            ["AWS/Lambda", "Duration", *fn, {"stat": percentile, "label": percentile}]
+            for percentile in LATENCY_PERCENTILES
+        ], [("p99 alarm", settings["lambda"]["durationP99"])]),
+        widget("Lambda invocations", [
+            ["AWS/Lambda", "Invocations", *fn],
+            ["AWS/Lambda", "Errors", *fn],
+            ["AWS/Lambda", "Throttles", *fn],
+        ], stat="Sum"),
+        widget("Lambda event age (ms)", [
+            ["AWS/Lambda", "AsyncEventAge", *fn],
+            ["AWS/Lambda", "IteratorAge", *fn],
+        ], stat="Maximum"),
+        widget("DynamoDB p99 latency (ms)", [
+            ["AWS/DynamoDB", "SuccessfulRequestLatency", *table, "Operation", operation, {"stat": "p99"}]
+            for operation in settings["dynamodb"]["operations"]
+        ], [("p99 alarm", settings["dynamodb"]["latencyP99"])]),
+        widget("DynamoDB capacity and throttles", [
+            ["AWS/DynamoDB", "ConsumedReadCapacityUnits", *table],
+            ["AWS/DynamoDB", "ConsumedWriteCapacityUnits", *table],
+            ["AWS/DynamoDB", "ReadThrottleEvents", *table],
+            ["AWS/DynamoDB", "WriteThrottleEvents", *table],
+        ], stat="Sum"),
+        widget("Instance boot phases (s since boot)", [
+            [BOOT_METRIC_NAMESPACE, BOOT_METRIC, "AutoScalingGroupName", "autoscalingGroup", "Phase", phase]
+            for phase in BOOT_PHASES
+        ], stat="Maximum"),
+    ]
+    for index, item in enumerate(widgets):
+        item["x"], item["y"] = (index % 2) * 12, (index // 2) * 6
+    return {"widgets": widgets}
@@ -0,0 +1,94 @@
+import pulumi
+
+from infra import (cache, cdn, compute, database, dax, db_logs, endpoints, listeners, loadbalancer, network,
+                   observability, security, serverless, storage)
+
+
+def main():
+    """Declare the whole stack: network, data tier, web tier, load balancer and the submission Lambda."""
+    config = pulumi.Config()
+
+    net = network.create_network(config)
+
+    pulumi.export('vpc_id', net.vpc.id)
+    pulumi.export("Private Subnets", net.private_subnets)
+    pulumi.export("Internet Gateway ID", net.internet_gateway.id)
+    pulumi.export("Public route table", net.public_route_table.id)
+
+    # Behind CloudFront, viewers are redirected to HTTPS at the edge and the ALB only takes CloudFront's traffic
+    cdn_settings = cdn.load_cdn_config(config)
+    security_groups = security.create_security_groups(
+        net.vpc,
+        allow_http=listeners.load_listener_config(config)["redirectHttp"] and not cdn_settings["enabled"],
+        origin_prefix_list_id=cdn.origin_prefix_list_id(cdn_settings))
+
+    vpc_endpoints = endpoints.create_endpoints(config, net, security_groups)
+    if vpc_endpoints is not None:
+        pulumi.export('vpc_endpoint_ids', {
+            service: endpoint.id for service, endpoint in {**vpc_endpoints.gateway, **vpc_endpoints.interface}.items()
+        })
+
+    db = database.create_database(config, net, security_groups)
+
+    # Export the DB subnet group name
+    pulumi.export('db_subnet_group_name', db.subnet_group.name)
+
+    # Export the name of DB Instance
+    pulumi.export('db_endpoint', db.instance.id)
+    if db.proxy is not None:
+        pulumi.export('db_proxy_endpoint', db.proxy.endpoint)
+    pulumi.export('db_reader_endpoint', db.read_host)
+    pulumi.export('db_identifier', db.instance.identifier)
+
+    target_group = loadbalancer.create_target_group(config, net.vpc)
+
+    sns_topic = serverless.create_topic()
+
+    data = storage.create_storage(config)
+
+    lb = loadbalancer.create_load_balancer(config, net, security_groups, target_group)
+
+    # Optional services the web app learns about through its environment
+    environment = {}
+
+    redis = cache.create_cache(config, net, security_groups)
+    if redis is not None:
+        environment.update({
+            'REDIS_HOST': redis.endpoint,
+            'REDIS_READ_HOST': redis.reader_endpoint,
+            'REDIS_PORT': cache.REDIS_PORT,
+        })
+        pulumi.export('cache_endpoint', redis.endpoint)
+
+    accelerator = dax.create_dax(config, net, security_groups, data.dynamodb_table)
+    if accelerator is not None:
+        environment['DAX_ENDPOINT'] = accelerator.endpoint
+        pulumi.export('dax_endpoint', accelerator.endpoint)
+
+    web = compute.create_compute(config, net, security_groups, db, data, sns_topic, target_group, lb.app_lb,
+                                 environment)
+
+    pulumi.export('launch_template_id', web.launch_template.id)
+    if accelerator is not None:
+        dax.grant_access(accelerator, web.ec2_role)
+    if lb.distribution is not None:
+        pulumi.export('cdn_domain_name', lb.distribution.domain_name)
+
+    functions = serverless.create_lambda(config, data, sns_topic)
+
+    slow_queries = db_logs.create_slow_query_analysis(config, database.load_database_config(config)["logs"],
+                                                      db.log_groups)
+    if slow_queries is not None:
+        pulumi.export('slow_query_table_name', slow_queries.table.name)
+
+    ops = observability.create_observability(config, lb.app_lb, target_group, db.instance, functions.lambda_function,
+                                             data.dynamodb_table)
+    if ops is not None:
+        pulumi.export('ops_topic_arn', ops.topic.arn)
+        pulumi.export('dashboard_name', ops.dashboard.dashboard_name)
+
+    # Output the ARNs of the created resources
+    pulumi.export('sns_topic_arn', sns_topic.arn)
+    pulumi.export('bucket_name', data.bucket.id)
+    pulumi.export('lambda_function_name', functions.lambda_function.name)
+    pulumi.export('dynamodb_table_name', data.dynamodb_table.name)
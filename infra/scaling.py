@@ -0,0 +1,230 @@
+import pulumi
+import pulumi_aws as aws
+
+from infra.cloudwatch_agent import MEMORY_METRIC, NAMESPACE, REQUEST_LATENCY_METRIC
+
+# Defaults for the `scaling` stack config object. Two target tracking policies are used unless a
+# stack picks its own: the group scales out when either CPU or requests per target is above target,
+# and only scales in once both are below.
+DEFAULT_SCALING = {
+    "minSize": 1,
+    "maxSize": 3,
+    "desiredCapacity": 1,
+    "instanceWarmup": 60,
+    "policies": ["cpu", "requests"],
+    "cpuTarget": 50,
+    "requestsPerTarget": 500,
+    # Used by the memory and latency policies, which need the generated CloudWatch agent config
+    "memoryTarget": 70,
+    # Milliseconds of average request latency reported by the web app over StatsD
+    "latencyTarget": 200,
+    "disableScaleIn": False,
+    "step": {
+        "scaleOutThreshold": 60,
+        "scaleInThreshold": 25,
+        "period": 60,
+        "evaluationPeriods": 1,
+        # Percent of current capacity to add per band of CPU above the scale-out threshold.
+        "steps": [
+            {"lower": 0, "upper": 15, "adjustment": 25},
+            {"lower": 15, "upper": 30, "adjustment": 50},
+            {"lower": 30, "adjustment": 100},
+        ],
+        "scaleInAdjustment": -25,
+    },
+    "predictive": {
+        "metric": "cpu",
+        "target": 50,
+        "mode": "ForecastAndScale",
+        "schedulingBufferTime": 300,
+    },
+}
+POLICY_KINDS = ("cpu", "requests", "memory", "latency", "step", "predictive")
+# Policies that track metrics published by the CloudWatch agent rather than by EC2 or the load balancer
+AGENT_POLICY_KINDS = ("memory", "latency")
+PREDICTIVE_METRICS = {
+    "cpu": "ASGCPUUtilization",
+    "requests": "ALBRequestCount",
+}
+
+
+class ScalingConfigError(ValueError):
+    pass
+
+
+def load_scaling_config(config: pulumi.Config) -> dict:
+    """Merge the stack's `scaling` object over DEFAULT_SCALING and validate it."""
+    overrides = config.get_object("scaling") or {}
+    scaling = {**DEFAULT_SCALING, **overrides}
+    for nested in ("step", "predictive"):
+        scaling[nested] = {**DEFAULT_SCALING[nested], **overrides.get(nested, {})}
+
+    unknown = set(scaling["policies"]) - set(POLICY_KINDS)
+    if unknown:
+        raise ScalingConfigError(f"unknown scaling policies: {', '.join(sorted(unknown))}")
+    if not scaling["minSize"] <= scaling["desiredCapacity"] <= scaling["maxSize"]:
+        raise ScalingConfigError("scaling requires minSize <= desiredCapacity <= maxSize")
+    step = scaling["step"]
+    if "step" in scaling["policies"] and step["scaleInThreshold"] >= step["scaleOutThreshold"]:
+        raise ScalingConfigError("step scaleInThreshold must be below scaleOutThreshold")
+    if scaling["predictive"]["metric"] not in PREDICTIVE_METRICS:
+        raise ScalingConfigError(f"predictive metric must be one of {', '.join(PREDICTIVE_METRICS)}")
+    return scaling
+
+
+def _cpu_target_tracking(scaling, autoscaling_group, request_label):
+    return [aws.autoscaling.Policy('cpuTargetTracking',
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='TargetTrackingScaling',
+        target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+            predefined_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+                predefined_metric_type='ASGAverageCPUUtilization',
+            ),
+            target_value=scaling["cpuTarget"],
+            disable_scale_in=scaling["disableScaleIn"],
+        ))]
+
+
+def _request_target_tracking(scaling, autoscaling_group, request_label):
+    return [aws.autoscaling.Policy('requestCountTargetTracking',
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='TargetTrackingScaling',
+        target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+            predefined_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+                predefined_metric_type='ALBRequestCountPerTarget',
+                resource_label=request_label,
+            ),
+            target_value=scaling["requestsPerTarget"],
+            disable_scale_in=scaling["disableScaleIn"],
+        ))]
+
+
+def _agent_metric_tracking(name, metric_name, target, scaling, autoscaling_group):
+    return [aws.autoscaling.Policy(name,
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='TargetTrackingScaling',
+        target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+            # The agent's AutoScalingGroupName rollup, see infra/cloudwatch_agent.py
+            customized_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationArgs(
+                namespace=NAMESPACE,
+                metric_name=metric_name,
+                statistic='Average',
+                metric_dimensions=[
+                    aws.autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                        name='AutoScalingGroupName',
+                        value=autoscaling_group.name,
+                    ),
+                ],
+            ),
+            target_value=target,
+            disable_scale_in=scaling["disableScaleIn"],
+        ))]
+
+
+def _memory_target_tracking(scaling, autoscaling_group, request_label):
+    return _agent_metric_tracking('memoryTargetTracking', MEMORY_METRIC, scaling["memoryTarget"], scaling,
+                                  autoscaling_group)
+
+
+def _latency_target_tracking(scaling, autoscaling_group, request_label):
+    return _agent_metric_tracking('latencyTargetTracking', REQUEST_LATENCY_METRIC, scaling["latencyTarget"], scaling,
+                                  autoscaling_group)
+
+
+def _step_scaling(scaling, autoscaling_group, request_label):
+    step = scaling["step"]
+
+    # Step bounds are relative to the alarm threshold, so each band adds a larger share of capacity
+    scale_up_policy = aws.autoscaling.Policy('scaleUp',
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='StepScaling',
+        adjustment_type='PercentChangeInCapacity',
+        min_adjustment_magnitude=1,
+        metric_aggregation_type='Average',
+        step_adjustments=[
+            aws.autoscaling.PolicyStepAdjustmentArgs(
+                metric_interval_lower_bound=str(band["lower"]),
+                metric_interval_upper_bound=str(band["upper"]) if band.get("upper") is not None else None,
+                scaling_adjustment=band["adjustment"],
+            ) for band in step["steps"]
+        ])
+
+    scale_down_policy = aws.autoscaling.Policy('scaleDown',
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='StepScaling',
+        adjustment_type='PercentChangeInCapacity',
+        min_adjustment_magnitude=1,
+        metric_aggregation_type='Average',
+        step_adjustments=[
+            aws.autoscaling.PolicyStepAdjustmentArgs(
+                metric_interval_upper_bound="0",
+                scaling_adjustment=step["scaleInAdjustment"],
+            )
+        ])
+
+    # CloudWatch Alarms for Auto Scaling
+    aws.cloudwatch.MetricAlarm('scaleUpAlarm',
+        comparison_operator='GreaterThanThreshold',
+        evaluation_periods=step["evaluationPeriods"],
+        metric_name='CPUUtilization',
+        namespace='AWS/EC2',
+        period=step["period"],
+        statistic='Average',
+        threshold=step["scaleOutThreshold"],
+        alarm_actions=[scale_up_policy.arn],
+        dimensions={'AutoScalingGroupName': autoscaling_group.name})
+
+    aws.cloudwatch.MetricAlarm('scaleDownAlarm',
+        comparison_operator='LessThanThreshold',
+        evaluation_periods=step["evaluationPeriods"],
+        metric_name='CPUUtilization',
+        namespace='AWS/EC2',
+        period=step["period"],
+        statistic='Average',
+        threshold=step["scaleInThreshold"],
+        alarm_actions=[scale_down_policy.arn],
+        dimensions={'AutoScalingGroupName': autoscaling_group.name})
+
+    return [scale_up_policy, scale_down_policy]
+
+
+def _predictive_scaling(scaling, autoscaling_group, request_label):
+    predictive = scaling["predictive"]
+    metric_type = PREDICTIVE_METRICS[predictive["metric"]]
+
+    return [aws.autoscaling.Policy('predictiveScaling',
+        autoscaling_group_name=autoscaling_group.name,
+        policy_type='PredictiveScaling',
+        predictive_scaling_configuration=aws.autoscaling.PolicyPredictiveScalingConfigurationArgs(
+            mode=predictive["mode"],
+            scheduling_buffer_time=str(predictive["schedulingBufferTime"]),
+            metric_specification=aws.autoscaling.PolicyPredictiveScalingConfigurationMetricSpecificationArgs(
+                target_value=predictive["target"],
+                predefined_metric_pair_specification=aws.autoscaling.PolicyPredictiveScalingConfigurationMetricSpecificationPredefinedMetricPairSpecificationArgs(
+                    predefined_metric_type=metric_type,
+                    resource_label=request_label if metric_type == 'ALBRequestCount' else None,
+                ),
+            ),
+        ))]
+
+
+POLICY_BUILDERS = {
+    "cpu": _cpu_target_tracking,
+    "requests": _request_target_tracking,
+    "memory": _memory_target_tracking,
+    "latency": _latency_target_tracking,
+    "step": _step_scaling,
+    "predictive": _predictive_scaling,
+}
+
+
+def create_scaling_policies(scaling: dict, autoscaling_group: aws.autoscaling.Group,
+                            app_lb: aws.lb.LoadBalancer, target_group: aws.lb.TargetGroup) -> list:
+    """Attach the scaling policies the stack selected in `scaling["policies"]` to the group."""
+    # ALBRequestCountPerTarget is keyed by "app/<lb>/<id>/targetgroup/<tg>/<id>"
+    request_label = pulumi.Output.concat(app_lb.arn_suffix, "/", target_group.arn_suffix)
+
+    policies = []
+    for kind in scaling["policies"]:
+        policies.extend(POLICY_BUILDERS[kind](scaling, autoscaling_group, request_label))
+    return policies
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+
+import pulumi_aws as aws
+from pulumi_aws import ec2
+
+
+@dataclass
+class SecurityGroups:
+    lb: ec2.SecurityGroup
+    app: ec2.SecurityGroup
+    db: ec2.SecurityGroup
+
+
+def create_security_groups(vpc: ec2.Vpc, allow_http: bool = False,
+                           origin_prefix_list_id: str = None) -> SecurityGroups:
+    """Create the load balancer, application and database security groups.
+
+    `allow_http` opens port 80 on the load balancer for the HTTP to HTTPS redirect listener.
+    `origin_prefix_list_id` limits HTTPS to that prefix list instead of the whole internet.
+    """
+    https_source = ({'prefix_list_ids': [origin_prefix_list_id]} if origin_prefix_list_id
+                    else {'cidr_blocks': ['0.0.0.0/0']})
+
+    # Security Group for Load Balancer
+    lb_security_group = ec2.SecurityGroup('lbSecurityGroup',
+        vpc_id=vpc.id,
+        description='Load balancer security group',
+        ingress=([
+            {'protocol': 'tcp', 'from_port': 80, 'to_port': 80, 'cidr_blocks': ['0.0.0.0/0']},
+        ] if allow_http else []) + [
+            {'protocol': 'tcp', 'from_port': 443, 'to_port': 443, **https_source}
+        ],
+
+        egress= [
+            ec2.SecurityGroupEgressArgs(
+                protocol="-1",
+                from_port=0,
+                to_port=0,
+                cidr_blocks=['0.0.0.0/0'],
+                # description="Allow outbound HTTPS traffic for CloudWatch Logs"
+            )
+        ]
+        )
+
+    # 1. Create the Application Security Group
+    app_security_group = ec2.SecurityGroup('app-security-group',
+        vpc_id=vpc.id,
+        description='EC2 Security Group for web applications',
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol='tcp',
+                from_port=22,
+                to_port=22,
+                cidr_blocks=['0.0.0.0/0']
+            ),
+             ec2.SecurityGroupIngressArgs(
+                protocol="tcp",
+                from_port=8080,
+                to_port=8080,
+                security_groups=[lb_security_group.id]
+            ),
+            # Add additional ingress rules for other ports as necessary
+        ],
+        # Add an egress rule to allow outbound traffic to the RDS instance
+        egress= [
+            ec2.SecurityGroupEgressArgs(
+                protocol="-1",
+                from_port=0,
+                to_port=0,
+                cidr_blocks=['0.0.0.0/0'],
+                description="Allow outbound HTTPS traffic for CloudWatch Logs"
+            )
+        ],
+            tags={"Name": "app-security-group"}
+    )
+
+    # Create DB Security Group
+    db_security_group = ec2.SecurityGroup('db-security-group',
+        vpc_id=vpc.id,
+        description='Security Group for RDS instances',
+        ingress=[
+            ec2.SecurityGroupIngressArgs(
+                protocol='tcp',
+                from_port=3306,  # For MySQL/MariaDB
+                to_port=3306,
+                security_groups=[app_security_group.id]  # Reference to the application security group
+            )
+        ]
+    )
+
+    aws.ec2.SecurityGroupRule("myEgressRule-db",
+        type="egress",
+        security_group_id=app_security_group.id,
+        protocol="tcp",
+        from_port=3306,
+        to_port=3306,
+        source_security_group_id=db_security_group.id
+    )
+
+    aws.ec2.SecurityGroupRule("myEgressRule-load-balancer",
+        type="egress",
+        security_group_id=lb_security_group.id,
+        protocol="tcp",
+        from_port=8080,
+        to_port=8080,
+        source_security_group_id=app_security_group.id
+    )
+
+    return SecurityGroups(lb=lb_security_group, app=app_security_group, db=db_security_group)
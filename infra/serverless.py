@@ -0,0 +1,245 @@
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import iam
+
+from infra.lambda_build import build_dependency_layer, build_function_package, load_build_config
+from infra.lambda_profile import create_dependency_layer, create_live_alias, load_lambda_profile
+from infra.storage import Storage
+
+
+DEFAULT_QUEUE = {
+    "enabled": False,
+    "batchSize": 10,
+    # Seconds to wait for a batch to fill up
+    "batchingWindow": 5,
+    "maxConcurrency": 10,
+    # At least six times the function timeout, as AWS recommends for SQS event sources
+    "visibilityTimeout": 180,
+    "maxReceiveCount": 5,
+}
+
+
+class QueueConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Serverless:
+    lambda_role: iam.Role
+    lambda_function: aws.lambda_.Function
+    # what event sources invoke: the `live` alias with provisioned concurrency, the function otherwise
+    invoke_target: pulumi.Output
+    queue: Optional[aws.sqs.Queue] = None
+    event_source_mapping: Optional[aws.lambda_.EventSourceMapping] = None
+
+
+def load_queue_config(config: pulumi.Config) -> dict:
+    settings = {**DEFAULT_QUEUE, **(config.get_object("submissionQueue") or {})}
+    if not 1 <= settings["batchSize"] <= 10000:
+        raise QueueConfigError("submissionQueue.batchSize must be between 1 and 10000")
+    if settings["batchSize"] > 10 and settings["batchingWindow"] < 1:
+        raise QueueConfigError("submissionQueue.batchSize above 10 needs a batchingWindow of at least 1 second")
+    if not 0 <= settings["batchingWindow"] <= 300:
+        raise QueueConfigError("submissionQueue.batchingWindow must be between 0 and 300 seconds")
+    if not 2 <= settings["maxConcurrency"] <= 1000:
+        raise QueueConfigError("submissionQueue.maxConcurrency must be between 2 and 1000")
+    return settings
+
+
+def create_topic() -> aws.sns.Topic:
+    """Create the SNS topic the web app publishes submissions to."""
+    # Create an SNS topic
+    return aws.sns.Topic('mySNSTopic')
+
+
+def create_lambda(config: pulumi.Config, storage: Storage, sns_topic: aws.sns.Topic) -> Serverless:
+    """Create the submission-processing Lambda and subscribe it to the SNS topic."""
+    mail_gun_domain = config.require("mail_gun_domain")
+    mail_gun_api_key= config.require_secret("mail_gun_api_key")
+    bucket = storage.bucket
+    dynamodb_table = storage.dynamodb_table
+    queue_settings = load_queue_config(config)
+    profile = load_lambda_profile(config)
+    if queue_settings["enabled"] and queue_settings["visibilityTimeout"] < 6 * profile["timeout"]:
+        raise QueueConfigError("submissionQueue.visibilityTimeout must be at least six times lambdaProfile.timeout")
+
+    # Buffer submissions in SQS so the Lambda drains them in batches instead of once per message
+    queue = create_submission_queue(queue_settings, sns_topic) if queue_settings["enabled"] else None
+
+    # Create a Lambda function
+    lambda_role = iam.Role('lambdaRole', assume_role_policy=json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Action": "sts:AssumeRole",
+            "Principal": {
+                "Service": "lambda.amazonaws.com",
+            },
+            "Effect": "Allow",
+            "Sid": "",
+        }],
+    }))
+
+    aws.iam.RolePolicy('lambdaPolicy',
+        role=lambda_role.id,
+        policy=pulumi.Output.all(bucket.id, sns_topic.arn, config.require('region'), config.require('account_id'),
+                                 dynamodb_table.name, queue.arn if queue else None).apply(
+            lambda args: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Action": ["s3:GetObject"],
+                        "Effect": "Allow",
+                        "Resource": [f"arn:aws:s3:::{args[0]}/*"]
+                    },
+                    {
+                        "Action": ["sns:Publish"],
+                        "Effect": "Allow",
+                        "Resource": [args[1]]
+                    },
+                    {
+                    "Action": ["dynamodb:PutItem"],
+                    "Effect": "Allow",
+                    "Resource": [f"arn:aws:dynamodb:*:*:table/{args[4]}"]
+                    },
+                    {
+                        "Action": [
+                            "logs:CreateLogGroup",
+                            "logs:CreateLogStream",
+                            "logs:PutLogEvents"
+                        ],
+                        "Effect": "Allow",
+                        "Resource": [f"arn:aws:logs:{args[2]}:{args[3]}:*"]
+                    }
+                ] + ([
+                    {
+                        "Action": [
+                            "sqs:ReceiveMessage",
+                            "sqs:DeleteMessage",
+                            "sqs:ChangeMessageVisibility",
+                            "sqs:GetQueueAttributes"
+                        ],
+                        "Effect": "Allow",
+                        "Resource": [args[5]]
+                    }
+                ] if args[5] else []),
+            })
+        )
+    )
+
+    # Reproducible packages built from source keep the same hash, so unchanged code is neither rebuilt nor redeployed
+    build = load_build_config(config)
+    if build["lockFile"]:
+        layer_artifact = build_dependency_layer(build["lockFile"], profile["runtime"], profile["architecture"])
+        dependency_layer = create_dependency_layer(profile, layer_artifact.archive, layer_artifact.source_code_hash)
+    else:
+        layer_archive = profile["dependencyLayerArchive"]
+        dependency_layer = create_dependency_layer(profile, pulumi.FileArchive(layer_archive) if layer_archive else None)
+
+    if build["source"]:
+        function_artifact = build_function_package(build["source"], build["exclude"])
+        code, source_code_hash = function_artifact.archive, function_artifact.source_code_hash
+    else:
+        code, source_code_hash = pulumi.FileArchive("Archive.zip"), None
+    provisioned = profile["provisionedConcurrency"] > 0
+
+    lambda_function = aws.lambda_.Function('myLambdaFunction',
+                                           role=lambda_role.arn,
+                                           runtime=profile["runtime"],
+                                           architectures=[profile["architecture"]],
+                                           memory_size=profile["memorySize"],
+                                           timeout=profile["timeout"],
+                                           reserved_concurrent_executions=profile["reservedConcurrency"],
+                                           layers=[dependency_layer.arn] if dependency_layer else None,
+                                           # Provisioned concurrency needs a published version behind the alias
+                                           publish=provisioned,
+                                           handler="lambda_function.lambda_handler",
+                                           code=code,
+                                           source_code_hash=source_code_hash,
+                                           environment={
+                                               'variables': {
+                                                   'GOOGLE_CREDENTIALS': storage.service_account_key.private_key,
+                                                   'SNS_TOPIC_ARN': sns_topic.arn,
+                                                   'MAILGUN_API_KEY': mail_gun_api_key,
+                                                   'MAILGUN_DOMAIN': mail_gun_domain,
+                                                   'DYNAMODB_TABLE' : dynamodb_table.name,
+                                                   'BUCKET_NAME' : bucket.name
+
+                                                   # Add your Mailgun credentials and other environment variables here
+                                               }
+                                           })
+
+    invoke_target = create_live_alias(profile, lambda_function).arn if provisioned else lambda_function.arn
+
+    if queue is not None:
+        event_source_mapping = aws.lambda_.EventSourceMapping('submissionQueueMapping',
+            event_source_arn=queue.arn,
+            function_name=invoke_target,
+            batch_size=queue_settings["batchSize"],
+            maximum_batching_window_in_seconds=queue_settings["batchingWindow"],
+            scaling_config=aws.lambda_.EventSourceMappingScalingConfigArgs(
+                maximum_concurrency=queue_settings["maxConcurrency"],
+            ),
+            # Only the failed messages of a batch go back to the queue
+            function_response_types=["ReportBatchItemFailures"])
+
+        return Serverless(lambda_role=lambda_role, lambda_function=lambda_function, invoke_target=invoke_target,
+                          queue=queue, event_source_mapping=event_source_mapping)
+
+    # Subscribe the Lambda function to the SNS topic
+    aws.sns.TopicSubscription('mySNSTopicSubscription',
+                              topic=sns_topic.arn,
+                              protocol="lambda",
+                              endpoint=invoke_target,
+                              )
+
+    # IAM policy to allow SNS to invoke the Lambda function
+    aws.lambda_.Permission('snsInvokeLambdaPermission',
+                           action='lambda:InvokeFunction',
+                           function=invoke_target,
+                           principal='sns.amazonaws.com',
+                           source_arn=sns_topic.arn)
+
+    return Serverless(lambda_role=lambda_role, lambda_function=lambda_function, invoke_target=invoke_target)
+
+
+def create_submission_queue(queue_settings: dict, sns_topic: aws.sns.Topic) -> aws.sqs.Queue:
+    """Create the submission queue with its dead-letter queue and subscribe it to the SNS topic."""
+    dead_letter_queue = aws.sqs.Queue('submissionDeadLetterQueue',
+        message_retention_seconds=1209600,
+        sqs_managed_sse_enabled=True)
+
+    queue = aws.sqs.Queue('submissionQueue',
+        visibility_timeout_seconds=queue_settings["visibilityTimeout"],
+        receive_wait_time_seconds=20,
+        sqs_managed_sse_enabled=True,
+        redrive_policy=dead_letter_queue.arn.apply(lambda arn: json.dumps({
+            "deadLetterTargetArn": arn,
+            "maxReceiveCount": queue_settings["maxReceiveCount"],
+        })))
+
+    # Allow the SNS topic, and only that topic, to deliver to the queue
+    aws.sqs.QueuePolicy('submissionQueuePolicy',
+        queue_url=queue.url,
+        policy=pulumi.Output.all(queue.arn, sns_topic.arn).apply(lambda args: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Principal": {"Service": "sns.amazonaws.com"},
+                "Action": "sqs:SendMessage",
+                "Resource": args[0],
+                "Condition": {"ArnEquals": {"aws:SourceArn": args[1]}}
+            }]
+        })))
+
+    # Subscribe the queue to the SNS topic
+    aws.sns.TopicSubscription('mySNSTopicSubscription',
+                              topic=sns_topic.arn,
+                              protocol="sqs",
+                              endpoint=queue.arn,
+                              )
+
+    return queue
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+import pulumi_gcp as gcp
+
+from infra.dynamodb_schema import create_table_autoscaling, load_table_schema, table_args, table_options
+
+
+@dataclass
+class Storage:
+    bucket: gcp.storage.Bucket
+    service_account: gcp.serviceaccount.Account
+    service_account_key: gcp.serviceaccount.Key
+    dynamodb_table: aws.dynamodb.Table
+
+
+def create_storage(config: pulumi.Config) -> Storage:
+    """Create the GCS bucket with its service account, and the DynamoDB table from its configured schema."""
+    # Create a Google Cloud Storage Bucket
+    bucket = gcp.storage.Bucket('csye-prakruthi-cloudwebapp',
+                                location='US')
+
+    # Create a Google Service Account with a specified account_id
+    service_account = gcp.serviceaccount.Account('myServiceAccount',
+                                                 account_id='csye6225-service-id')
+
+    # Create Google Service Account Keys
+    service_account_key = gcp.serviceaccount.Key('myServiceAccountKey',
+                                                 service_account_id=service_account.id)
+
+    # Use apply to transform the service account email Output[T] into a string
+    service_account_email = service_account.email.apply(lambda email: f"serviceAccount:{email}")
+
+    # Assign the necessary role to the service account for the bucket
+    gcp.storage.BucketIAMBinding('myBucketIamBinding',
+                                 bucket=bucket.name,
+                                 role='roles/storage.objectCreator',
+                                 members=[service_account_email])
+
+    # Create a DynamoDB instance
+    schema = load_table_schema(config)
+    dynamodb_table = aws.dynamodb.Table('myDynamoDBTable',
+                                        **table_args(schema),
+                                        opts=table_options(schema))
+
+    create_table_autoscaling(schema, dynamodb_table)
+
+    return Storage(
+        bucket=bucket,
+        service_account=service_account,
+        service_account_key=service_account_key,
+        dynamodb_table=dynamodb_table,
+    )
@@ -0,0 +1,13 @@
+#!/bin/bash
+# Usage: boot-phase <phase>
+# Publishes the seconds since the kernel booted as {{ metric_namespace }} {{ metric_name }} for this phase.
+PHASE="$1"
+SECONDS_SINCE_BOOT=$(cut -d' ' -f1 /proc/uptime)
+echo "$(date -Is) $PHASE ${SECONDS_SINCE_BOOT}s" >> /var/log/webapp-boot-phases.log
+aws cloudwatch put-metric-data \
+    --region {{ region }} \
+    --namespace {{ metric_namespace }} \
+    --metric-name {{ metric_name }} \
+    --unit Seconds \
+    --value "$SECONDS_SINCE_BOOT" \
+    --dimensions "AutoScalingGroupName={{ group_name }},Phase=$PHASE" || true
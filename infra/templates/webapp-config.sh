@@ -0,0 +1,68 @@
+#!/bin/bash
+# Fetches the web app configuration and secrets in one batched call and writes the environment files.
+set -euo pipefail
+/opt/webapp/bin/boot-phase started
+
+# Parameter Store resolves /aws/reference/secretsmanager/ names, so one GetParameters call returns both
+for attempt in 1 2 3 4 5 6; do
+    if PARAMETERS=$(aws ssm get-parameters \
+            --region {{ region }} \
+            --with-decryption \
+            --names {{ config_parameter }} /aws/reference/secretsmanager/{{ secret_name }} \
+            --output json); then
+        break
+    fi
+    if [ "$attempt" -eq 6 ]; then
+        echo "could not fetch the web app configuration" >&2
+        exit 1
+    fi
+    sleep $((attempt * 2))
+done
+/opt/webapp/bin/boot-phase config-fetched
+
+mkdir -p /opt/webapp
+# Passed in the environment rather than argv, which any user can read from /proc
+PARAMETERS="$PARAMETERS" python3 - <<'PYTHON'
+import json
+import os
+import sys
+
+response = json.loads(os.environ["PARAMETERS"])
+if response["InvalidParameters"]:
+    sys.exit("missing parameters: " + ", ".join(response["InvalidParameters"]))
+values = {parameter["Name"]: parameter["Value"] for parameter in response["Parameters"]}
+# Unset optional values arrive as null; leave them out rather than writing KEY=None
+environment = {key: value for key, value in json.loads(values["{{ config_parameter }}"]).items()
+               if value is not None}
+secrets = json.loads(values["/aws/reference/secretsmanager/{{ secret_name }}"])
+
+# Secrets only go to the app's own .env, readable by the owner of /opt/webapp
+app_dir = os.stat("/opt/webapp")
+with open("/opt/webapp/.env.tmp", "w") as f:
+    os.fchmod(f.fileno(), 0o600)
+    os.fchown(f.fileno(), app_dir.st_uid, app_dir.st_gid)
+    f.writelines(f"{key}={value}\n" for key, value in {**environment, **secrets}.items())
+os.replace("/opt/webapp/.env.tmp", "/opt/webapp/.env")
+
+# Replace earlier values in /etc/environment instead of appending on every boot, and drop any
+# secret an older bootstrap left there
+with open("/etc/environment") as f:
+    kept = [line for line in f if line.split("=", 1)[0] not in {**environment, **secrets}]
+with open("/etc/environment", "w") as f:
+    f.writelines(kept + [f"{key}={value}\n" for key, value in environment.items()])
+PYTHON
+echo 'Script executed successfully' > /opt/webapp/user-data-success.log
+/opt/webapp/bin/boot-phase environment-written
+
+/opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl \
+    -a fetch-config \
+    -m ec2 \
+    -c {{ agent_config_source }} \
+    -s
+/opt/webapp/bin/boot-phase agent-started
+
+# Time to healthy, measured in the background so the remaining boot scripts are not held up
+nohup bash -c 'for attempt in $(seq {{ health_attempts }}); do
+    if curl -sf {{ health_url }} > /dev/null; then exec /opt/webapp/bin/boot-phase healthy; fi
+    sleep 2
+done' > /dev/null 2>&1 &
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+
+import pulumi
+import pulumi_aws as aws
+from pulumi_aws import iam
+
+from infra.database import Database
+from infra.instance_lifecycle import HEALTH_URL
+from infra.storage import Storage
+
+# Bump whenever a template changes so instances can be told apart by what booted them
+TEMPLATE_VERSION = 3
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+BOOT_METRIC_NAMESPACE = "WebApp/Boot"
+BOOT_METRIC = "BootPhaseSeconds"
+# Phases templates/webapp-config.sh reports, in boot order
+BOOT_PHASES = ("started", "config-fetched", "environment-written", "agent-started", "healthy")
+# How long, in 2 second polls, a booting instance waits for the app before giving up on the healthy phase
+HEALTH_ATTEMPTS = 450
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+PER_BOOT_DIR = "/var/lib/cloud/scripts/per-boot"
+
+
+class UserDataTemplateError(ValueError):
+    pass
+
+
+@dataclass
+class BootConfig:
+    # JSON object of the non-secret environment, written to .env and /etc/environment
+    parameter: aws.ssm.Parameter
+    # JSON object of secrets, written to .env only
+    secret: aws.secretsmanager.Secret
+
+
+def render(template: str, values: dict) -> str:
+    """Replace every {{ name }} in `template` with `values[name]`.
+
+    A placeholder alone on its line takes multi-line values with the line's indentation, and an
+    empty value removes the line. Unknown placeholders are an error, so a typo cannot ship a
+    broken script.
+    """
+    missing = sorted(set(PLACEHOLDER.findall(template)) - set(values))
+    if missing:
+        raise UserDataTemplateError(f"no value for {', '.join(missing)}")
+
+    lines = []
+    for line in template.splitlines():
+        match = re.fullmatch(r"(\s*)\{\{\s*(\w+)\s*\}\}\s*", line)
+        if match:
+            indent, value = match.group(1), str(values[match.group(2)])
+            lines.extend(indent + value_line if value_line else "" for value_line in value.splitlines())
+        else:
+            lines.append(PLACEHOLDER.sub(lambda m: str(values[m.group(1)]), line))
+    return "\n".join(lines) + "\n"
+
+
+def render_template(name: str, values: dict) -> str:
+    with open(os.path.join(TEMPLATE_DIR, name)) as f:
+        return render(f.read(), values)
+
+
+def render_user_data(values: dict, per_boot_scripts: dict = None) -> str:
+    """Render the cloud-config user data.
+
+    `values` needs region, group_name, config_parameter, secret_name and agent_config_source.
+    `per_boot_scripts` maps file names to extra scripts to run on every boot after the config script.
+    """
+    values = {
+        "version": TEMPLATE_VERSION,
+        "metric_namespace": BOOT_METRIC_NAMESPACE,
+        "metric_name": BOOT_METRIC,
+        "health_url": HEALTH_URL,
+        "health_attempts": HEALTH_ATTEMPTS,
+        **values,
+    }
+    per_boot_files = "".join(
+        f'- path: {PER_BOOT_DIR}/{name}\n  permissions: "0755"\n  content: |\n'
+        + "".join(f"    {line}\n" if line else "\n" for line in script.splitlines())
+        for name, script in sorted((per_boot_scripts or {}).items())
+    )
+    return render_template("cloud-config.yaml", {
+        **values,
+        "boot_phase_script": render_template("boot-phase.sh", values),
+        "config_script": render_template("webapp-config.sh", values),
+        "per_boot_files": per_boot_files,
+    })
+
+
+def create_boot_config(config: pulumi.Config, database: Database, sns_topic: aws.sns.Topic, storage: Storage,
+                       environment: dict = None) -> BootConfig:
+    """Store the web app environment in Parameter Store and its secrets in Secrets Manager.
+
+    `environment` adds variables for optional services, such as the cache endpoint.
+    """
+    stack = pulumi.get_stack()
+    parameter = aws.ssm.Parameter('webappEnvironment',
+        name=f"/webapp/{stack}/environment",
+        description="Environment of the web app instances, read at every boot",
+        type="String",
+        value=pulumi.Output.all(database.host, database.read_host, sns_topic.arn, storage.bucket.name,
+                                storage.dynamodb_table.name, environment or {}).apply(
+            lambda args: json.dumps({
+                "DB_HOST": args[0],
+                "DB_READ_HOST": args[1],
+                "DB_PORT": 3306,
+                "DB_NAME": config.require("db_name"),
+                "DB_USERNAME": config.require("username"),
+                "snsTopicArn": args[2],
+                "BUCKET_NAME": args[3],
+                "DYNAMODB_TABLE": args[4],
+                "awsRegion": config.require("region"),
+                **args[5],
+            }, indent=2)))
+
+    secret = aws.secretsmanager.Secret('webappSecrets',
+        description='Secrets of the web app instances, read at every boot')
+    aws.secretsmanager.SecretVersion('webappSecrets-version',
+        secret_id=secret.id,
+        secret_string=config.require_secret("dbPassword").apply(lambda password: json.dumps({
+            "DB_PASSWORD": password,
+        })))
+
+    return BootConfig(parameter=parameter, secret=secret)
+
+
+def grant_boot_config(config: pulumi.Config, boot_config: BootConfig, role: iam.Role):
+    """Allow the instances to fetch their environment and secrets with one GetParameters call."""
+    region = config.require("region")
+    account_id = config.require("account_id")
+    iam.RolePolicy('bootConfigPolicy',
+        role=role.id,
+        policy=pulumi.Output.all(boot_config.parameter.arn, boot_config.secret.name, boot_config.secret.arn).apply(
+            lambda args: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Action": "ssm:GetParameters",
+                        "Resource": [
+                            args[0],
+                            f"arn:aws:ssm:{region}:{account_id}:parameter/aws/reference/secretsmanager/{args[1]}",
+                        ],
+                    },
+                    {
+                        "Effect": "Allow",
+                        "Action": "secretsmanager:GetSecretValue",
+                        "Resource": args[2],
+                    },
+                ],
+            })))
+
+
+def create_user_data(config: pulumi.Config, boot_config: BootConfig, group_name: str, agent_config_source,
+                     per_boot_scripts: dict = None) -> pulumi.Output:
+    return pulumi.Output.all(boot_config.parameter.name, boot_config.secret.name, agent_config_source).apply(
+        lambda args: render_user_data({
+            "region": config.require("region"),
+            "group_name": group_name,
+            "config_parameter": args[0],
+            "secret_name": args[1],
+            "agent_config_source": args[2],
+        }, per_boot_scripts))
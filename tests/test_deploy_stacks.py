@@ -0,0 +1,188 @@
+"""tools.deploy_stacks with the Pulumi CLI replaced by fake workspaces.
+
+test_up_with_file_backend runs the real CLI against a local file:// backend and is skipped without it.
+"""
+import json
+import shutil
+import sys
+import threading
+import time
+
+import pytest
+from pulumi import automation as auto
+from pulumi.automation import events
+
+from tools import deploy_stacks
+
+URN = "urn:pulumi:dev::aws-infrastructure-setup::{type}::{name}"
+
+
+def step(name: str, op: auto.OpType = auto.OpType.CREATE, type_: str = "aws:ec2/vpc:Vpc"):
+    return events.StepEventMetadata(op=op, urn=URN.format(type=type_, name=name), type=type_, provider="")
+
+
+def pre(metadata):
+    return auto.EngineEvent(sequence=0, timestamp=0, resource_pre_event=events.ResourcePreEvent(metadata))
+
+
+def outputs(metadata):
+    return auto.EngineEvent(sequence=0, timestamp=0, res_outputs_event=events.ResOutputsEvent(metadata))
+
+
+def failed(metadata):
+    return auto.EngineEvent(sequence=0, timestamp=0,
+                            res_op_failed_event=events.ResOpFailedEvent(metadata, status=1, steps=1))
+
+
+class FakeStack:
+    """Stands in for auto.Stack: replays a create and a same step and records what it was asked to do."""
+
+    def __init__(self, name: str, opts: auto.LocalWorkspaceOptions, delay: float = 0.05):
+        self.name = name
+        self.env_vars = opts.env_vars
+        self.delay = delay
+        self.calls = []
+
+    def replay(self, on_event):
+        vpc, role = step("vpc"), step("role", auto.OpType.SAME, "aws:iam/role:Role")
+        on_event(pre(vpc))
+        on_event(pre(role))
+        time.sleep(self.delay)
+        on_event(outputs(role))
+        on_event(outputs(vpc))
+
+    def preview(self, parallel=None, on_event=None, color=None):
+        self.calls.append(("preview", parallel))
+        self.replay(on_event)
+        return auto.PreviewResult(stdout="", stderr="", change_summary={auto.OpType.CREATE: 1, auto.OpType.SAME: 1})
+
+    def up(self, parallel=None, on_event=None, color=None):
+        self.calls.append(("up", parallel))
+        self.replay(on_event)
+
+        class Summary:
+            resource_changes = {"create": 1, "same": 1}
+
+        class Result:
+            summary = Summary()
+
+        return Result()
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project directory with two stacks, a file:// backend, and select_stack returning FakeStacks."""
+    (tmp_path / "Pulumi.yaml").write_text("name: aws-infrastructure-setup\nruntime: python\n")
+    (tmp_path / "Pulumi.dev.yaml").write_text("config:\n  aws:profile: dev\n  aws-infrastructure-setup:db_name: x\n")
+    (tmp_path / "Pulumi.demo.yaml").write_text("config:\n  aws:profile: 'demo'\n")
+    backend = tmp_path / "state"
+    backend.mkdir()
+
+    selected = {}
+    select_threads = set()
+
+    def select_stack(stack_name, work_dir=None, opts=None):
+        select_threads.add(threading.current_thread().name)
+        selected[stack_name] = FakeStack(stack_name, opts)
+        return selected[stack_name]
+
+    monkeypatch.setattr(deploy_stacks, "PROJECT_DIR", str(tmp_path))
+    monkeypatch.setattr(deploy_stacks.auto, "select_stack", select_stack)
+    return {"dir": tmp_path, "backend": f"file://{backend}", "selected": selected, "select_threads": select_threads}
+
+
+def test_discover_stacks(project):
+    (project["dir"] / "Pulumi.yaml.bak").write_text("")
+    assert deploy_stacks.discover_stacks(str(project["dir"])) == ["demo", "dev"]
+
+
+def test_stack_profile(project):
+    assert deploy_stacks.stack_profile("dev", str(project["dir"])) == "dev"
+    assert deploy_stacks.stack_profile("demo", str(project["dir"])) == "demo"
+    (project["dir"] / "Pulumi.bare.yaml").write_text("config:\n  aws-infrastructure-setup:db_name: x\n")
+    assert deploy_stacks.stack_profile("bare", str(project["dir"])) is None
+
+
+def test_event_recorder_times_steps():
+    recorder = deploy_stacks.EventRecorder("dev", quiet=True)
+    vpc, subnet = step("vpc"), step("subnet", auto.OpType.CREATE, "aws:ec2/subnet:Subnet")
+    recorder(pre(vpc))
+    recorder(pre(subnet))
+    time.sleep(0.02)
+    recorder(outputs(vpc))
+    recorder(failed(subnet))
+
+    resources = {resource["name"]: resource for resource in recorder.resources.values()}
+    assert resources["vpc"]["status"] == "succeeded"
+    assert resources["vpc"]["op"] == "create"
+    assert resources["vpc"]["seconds"] >= 0.02
+    assert resources["subnet"]["status"] == "failed"
+    assert resources["subnet"]["type"] == "aws:ec2/subnet:Subnet"
+    assert recorder.started == {}
+
+
+def test_run_stacks_report(project):
+    report = deploy_stacks.run_stacks(["dev", "demo"], "preview", concurrency=2, parallel=8,
+                                      backend_url=project["backend"], profiles={"demo": "other"})
+
+    assert [stack["stack"] for stack in report["stacks"]] == ["dev", "demo"]
+    for stack in report["stacks"]:
+        assert stack["status"] == "succeeded"
+        assert stack["changes"] == {"create": 1, "same": 1}
+        assert {resource["name"] for resource in stack["resources"]} == {"vpc", "role"}
+    assert report["stacks"][0]["profile"] == "dev"
+    assert report["stacks"][1]["profile"] == "other"
+    assert report["sequential_seconds"] == pytest.approx(sum(stack["seconds"] for stack in report["stacks"]))
+    # Both stacks ran at once, so the wall clock is below the sum
+    assert report["seconds"] < report["sequential_seconds"]
+    json.loads(json.dumps(report))
+
+    for name, profile in (("dev", "dev"), ("demo", "other")):
+        fake = project["selected"][name]
+        assert fake.env_vars == {"AWS_PROFILE": profile, "PULUMI_BACKEND_URL": project["backend"]}
+        assert fake.calls == [("preview", 8)]
+
+
+def test_run_stacks_selects_serially(project):
+    deploy_stacks.run_stacks(["dev", "demo"], "up", concurrency=2, backend_url=project["backend"])
+    assert project["select_threads"] == {threading.main_thread().name}
+    assert project["selected"]["dev"].calls == [("up", None)]
+
+
+def test_run_stacks_reports_selection_failure(project, monkeypatch):
+    select_stack = deploy_stacks.auto.select_stack
+
+    def failing_select(stack_name, work_dir=None, opts=None):
+        if stack_name == "demo":
+            raise auto.errors.CommandError(auto.CommandResult(stdout="", stderr="no stack named 'demo'", code=255))
+        return select_stack(stack_name, work_dir, opts)
+
+    monkeypatch.setattr(deploy_stacks.auto, "select_stack", failing_select)
+    report = deploy_stacks.run_stacks(["dev", "demo"], "preview", backend_url=project["backend"])
+
+    assert [stack["status"] for stack in report["stacks"]] == ["succeeded", "failed"]
+    assert "no stack named 'demo'" in report["stacks"][1]["error"]
+
+
+@pytest.mark.skipif(shutil.which("pulumi") is None, reason="needs the pulumi CLI")
+def test_up_with_file_backend(tmp_path, monkeypatch):
+    project_dir = tmp_path / "project"
+    project_dir.mkdir()
+    (project_dir / "Pulumi.yaml").write_text("name: aws-infrastructure-setup\nruntime: python\n")
+    (project_dir / "Pulumi.dev.yaml").write_text("config: {}\n")
+    (project_dir / "__main__.py").write_text("import pulumi\n\npulumi.export('greeting', 'hello')\n")
+    backend = tmp_path / "state"
+    backend.mkdir()
+    backend_url = f"file://{backend}"
+    monkeypatch.setenv("PULUMI_CONFIG_PASSPHRASE", "test")
+    # The program runs with this interpreter, which has the pulumi package the tests import
+    monkeypatch.setenv("PULUMI_PYTHON_CMD", sys.executable)
+    monkeypatch.setattr(deploy_stacks, "PROJECT_DIR", str(project_dir))
+    auto.create_stack("dev", work_dir=str(project_dir),
+                      opts=auto.LocalWorkspaceOptions(env_vars={"PULUMI_BACKEND_URL": backend_url}))
+
+    report = deploy_stacks.run_stacks(["dev"], "up", backend_url=backend_url, quiet=True)
+
+    assert report["stacks"][0]["status"] == "succeeded", report["stacks"][0].get("error")
+    assert report["stacks"][0]["changes"] == {"create": 1}
+    assert list(backend.glob(".pulumi/stacks/**/dev.json"))
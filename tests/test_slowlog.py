@@ -0,0 +1,60 @@
+"""functions/slow_query/slowlog.py against the hand-written fingerprints and the sample slow logs."""
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions", "slow_query")
+SAMPLES = os.path.join(SOURCE, "samples")
+
+sys.path.insert(0, SOURCE)
+import slowlog  # noqa: E402
+
+
+def load_json(name: str):
+    with open(os.path.join(SAMPLES, name)) as f:
+        return json.load(f)
+
+
+def sample_logs() -> list:
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(SAMPLES, "*.log")))
+
+
+@pytest.mark.parametrize("case", load_json("fingerprints.json"), ids=lambda case: case["statement"][:40])
+def test_fingerprint(case):
+    assert slowlog.fingerprint(case["statement"]) == case["fingerprint"]
+
+
+def test_fingerprint_id_is_stable():
+    entry = slowlog.SlowQuery(statement="SELECT * FROM t WHERE id = 42", query_time=1.0)
+    assert entry.fingerprint == slowlog.fingerprint("select *  from t where id=7")
+    assert entry.fingerprint_id == slowlog.fingerprint_id(entry.fingerprint)
+    assert len(entry.fingerprint_id) == 16
+
+
+def test_expected_covers_every_sample():
+    assert sorted(load_json("expected.json")) == sample_logs()
+
+
+@pytest.mark.parametrize("name", sample_logs())
+def test_sample_log(name):
+    with open(os.path.join(SAMPLES, name)) as f:
+        entries = slowlog.parse(f.read())
+    stats = slowlog.aggregate(entries)
+    expected = {row["fingerprintId"]: row for row in load_json("expected.json")[name]}
+
+    assert sorted(stats) == sorted(expected)
+    assert sum(item.count for item in stats.values()) == len(entries)
+    for key, item in stats.items():
+        row = expected[key]
+        assert key == slowlog.fingerprint_id(item.fingerprint)
+        assert item.fingerprint == row["fingerprint"]
+        assert item.count == row["count"]
+        assert item.total_time == pytest.approx(row["totalTime"], abs=1e-6)
+        assert item.max_time == pytest.approx(row["maxTime"], abs=1e-6)
+        assert item.total_lock_time == pytest.approx(row["totalLockTime"], abs=1e-6)
+        assert item.total_rows_examined == row["rowsExamined"]
+        assert sorted(item.databases) == row["databases"]
+        assert item.last_seen == row["lastSeen"]
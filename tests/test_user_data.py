@@ -0,0 +1,74 @@
+"""infra.user_data template rendering, checked against the shipped templates without deploying anything."""
+import pytest
+import yaml
+
+from infra import user_data
+
+VALUES = {
+    "region": "us-east-1",
+    "group_name": "webapp-asg",
+    "config_parameter": "/webapp/dev/environment",
+    "secret_name": "webappSecrets-1234",
+    "agent_config_source": "ssm:/webapp/dev/cloudwatch-agent",
+}
+
+
+def test_render_substitutes_inline_placeholders():
+    assert user_data.render("echo {{ a }}-{{b}}\n", {"a": 1, "b": "two"}) == "echo 1-two\n"
+
+
+def test_render_indents_multiline_values():
+    template = "content: |\n  {{ script }}\nend\n"
+    assert user_data.render(template, {"script": "#!/bin/sh\n\necho hi"}) == "content: |\n  #!/bin/sh\n\n  echo hi\nend\n"
+
+
+def test_render_drops_line_of_empty_value():
+    assert user_data.render("a\n  {{ extra }}\nb\n", {"extra": ""}) == "a\nb\n"
+
+
+def test_render_rejects_missing_values():
+    with pytest.raises(user_data.UserDataTemplateError, match="no value for other, typo"):
+        user_data.render("{{ known }} {{ typo }}\n{{ other }}\n", {"known": 1})
+
+
+def test_render_ignores_unused_values():
+    assert user_data.render("{{ a }}\n", {"a": 1, "unused": 2}) == "1\n"
+
+
+def test_render_user_data_needs_every_value():
+    values = dict(VALUES)
+    del values["secret_name"]
+    with pytest.raises(user_data.UserDataTemplateError, match="secret_name"):
+        user_data.render_user_data(values)
+
+
+def test_render_user_data_is_cloud_config():
+    rendered = user_data.render_user_data(VALUES)
+
+    assert rendered.startswith("#cloud-config\n")
+    assert f"template version {user_data.TEMPLATE_VERSION}," in rendered.splitlines()[1]
+    files = {entry["path"]: entry for entry in yaml.safe_load(rendered)["write_files"]}
+    assert list(files) == ["/opt/webapp/bin/boot-phase", f"{user_data.PER_BOOT_DIR}/10-webapp-config.sh"]
+    config_script = files[f"{user_data.PER_BOOT_DIR}/10-webapp-config.sh"]
+    assert config_script["permissions"] == "0755"
+    assert config_script["content"].startswith("#!")
+    scripts = files["/opt/webapp/bin/boot-phase"]["content"] + config_script["content"]
+    for value in VALUES.values():
+        assert value in scripts
+    assert not user_data.PLACEHOLDER.search(rendered)
+
+
+def test_render_user_data_per_boot_scripts():
+    scripts = {
+        "30-second.sh": "#!/bin/bash\necho second\n",
+        "20-first.sh": "#!/bin/bash\n\necho first\n",
+    }
+    files = yaml.safe_load(user_data.render_user_data(VALUES, scripts))["write_files"]
+
+    assert [entry["path"] for entry in files[2:]] == [
+        f"{user_data.PER_BOOT_DIR}/20-first.sh",
+        f"{user_data.PER_BOOT_DIR}/30-second.sh",
+    ]
+    for entry in files[2:]:
+        assert entry["permissions"] == "0755"
+        assert entry["content"] == scripts[entry["path"].rsplit("/", 1)[1]]
@@ -0,0 +1,265 @@
+"""Offline critical-path analysis of the Pulumi resource graph.
+
+Evaluates infra.program.main() against Pulumi mocks, rebuilds the dependency DAG
+from the registrations, and weighs every resource with a typical create time for
+its type. Reports the critical path of a fresh `pulumi up`, the highest number of
+resources that can ever be created at once (so the largest `--parallel` that still
+helps), the estimated duration at a few `--parallel` settings, and explicit
+`depends_on` edges that are redundant or that lengthen the critical path.
+
+    python -m tools.critical_path --stack dev
+    python -m tools.critical_path --config 'aws-infrastructure-setup:dax={"enabled": true}'
+    python -m tools.critical_path --durations my-durations.json --json
+"""
+import argparse
+import heapq
+import json
+import sys
+
+from tools.mocks import run_program
+
+# Typical create times in seconds on a fresh stack. Types not listed use DEFAULT_DURATION.
+DEFAULT_DURATIONS = {
+    "aws:rds/instance:Instance": 600,
+    "aws:rds/proxy:Proxy": 420,
+    "aws:rds/proxyDefaultTargetGroup:ProxyDefaultTargetGroup": 10,
+    "aws:rds/proxyTarget:ProxyTarget": 120,
+    "aws:elasticache/replicationGroup:ReplicationGroup": 720,
+    "aws:dax/cluster:Cluster": 600,
+    "aws:cloudfront/distribution:Distribution": 360,
+    "aws:lb/loadBalancer:LoadBalancer": 180,
+    "aws:autoscaling/group:Group": 150,
+    "aws:ec2/vpcEndpoint:VpcEndpoint": 90,
+    "aws:ec2/vpc:Vpc": 15,
+    "aws:ec2/internetGateway:InternetGateway": 10,
+    "aws:ec2/securityGroup:SecurityGroup": 5,
+    "aws:lambda/function:Function": 30,
+    "aws:lambda/layerVersion:LayerVersion": 20,
+    "aws:lambda/provisionedConcurrencyConfig:ProvisionedConcurrencyConfig": 180,
+    "aws:dynamodb/table:Table": 30,
+    "aws:iam/role:Role": 3,
+    "aws:iam/instanceProfile:InstanceProfile": 10,
+    "aws:route53/record:Record": 45,
+    "aws:route53/zone:Zone": 45,
+    "aws:sqs/queue:Queue": 30,
+    "gcp:serviceaccount/key:Key": 5,
+}
+DEFAULT_DURATION = 5
+PARALLEL_LEVELS = (1, 2, 4, 8, 16, 32)
+
+
+def build_graph(mocks) -> dict:
+    """name -> {"type", "dependencies", "implicit", "inputs", "explicit"} for every registered resource."""
+    graph = {}
+    for name, node in mocks.dependencies.items():
+        graph[name] = {
+            "type": node["type"],
+            "dependencies": set(node["dependencies"]),
+            "implicit": set(node["implicit"]),
+            "inputs": node["inputs"],
+            "explicit": set(node["explicit"]),
+        }
+    return graph
+
+
+def topological_order(graph: dict) -> list:
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"dependency cycle through {name}")
+        state[name] = "visiting"
+        for dependency in sorted(graph[name]["dependencies"]):
+            visit(dependency)
+        state[name] = "done"
+        order.append(name)
+
+    for name in sorted(graph):
+        visit(name)
+    return order
+
+
+def earliest_finish(graph: dict, durations: dict, order: list) -> dict:
+    """Finish time of every resource with unlimited parallelism."""
+    finish = {}
+    for name in order:
+        start = max((finish[dependency] for dependency in graph[name]["dependencies"]), default=0)
+        finish[name] = start + durations[name]
+    return finish
+
+
+def critical_path(graph: dict, durations: dict, order: list) -> list:
+    finish = earliest_finish(graph, durations, order)
+    name = max(finish, key=lambda n: (finish[n], n))
+    path = [name]
+    while graph[name]["dependencies"]:
+        name = max(graph[name]["dependencies"], key=lambda n: (finish[n], n))
+        path.append(name)
+    return list(reversed(path))
+
+
+def peak_concurrency(graph: dict, durations: dict, order: list) -> int:
+    """Most resources in flight at once when every resource starts as early as it can."""
+    finish = earliest_finish(graph, durations, order)
+    events = []
+    for name in order:
+        events.append((finish[name] - durations[name], 1))
+        events.append((finish[name], -1))
+    running = peak = 0
+    # Finishes sort before starts at the same instant
+    for _, delta in sorted(events):
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+
+def simulate(graph: dict, durations: dict, order: list, parallel: int) -> float:
+    """Estimated duration with at most `parallel` operations in flight.
+
+    Like the Pulumi engine, ready resources start in registration order whenever a slot is free.
+    """
+    position = {name: index for index, name in enumerate(order)}
+    remaining = {name: len(graph[name]["dependencies"]) for name in graph}
+    dependents = {name: [] for name in graph}
+    for name, node in graph.items():
+        for dependency in node["dependencies"]:
+            dependents[dependency].append(name)
+
+    ready = [(position[name], name) for name in graph if not remaining[name]]
+    heapq.heapify(ready)
+    running, now = [], 0.0
+    while ready or running:
+        while ready and len(running) < parallel:
+            _, name = heapq.heappop(ready)
+            heapq.heappush(running, (now + durations[name], name))
+        now, name = heapq.heappop(running)
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if not remaining[dependent]:
+                heapq.heappush(ready, (position[dependent], dependent))
+    return now
+
+
+def explicit_dependency_findings(graph: dict, durations: dict, order: list) -> list:
+    """Classify every explicit depends_on edge.
+
+    Redundant: the dependency is already reached through Output inputs, so removing depends_on changes
+    nothing. Otherwise the edge only orders creation, and `saves_seconds` is how much shorter the whole
+    deployment gets without it.
+    """
+    total = max(earliest_finish(graph, durations, order).values(), default=0)
+    findings = []
+    for name in order:
+        for dependency in sorted(graph[name]["explicit"]):
+            without = {key: dict(node) for key, node in graph.items()}
+            if dependency not in graph[name]["implicit"]:
+                without[name]["dependencies"] = graph[name]["dependencies"] - {dependency}
+            redundant = dependency in ancestors(without, name)
+            saves = total - max(earliest_finish(without, durations, order).values())
+            findings.append({
+                "resource": name,
+                "depends_on": dependency,
+                "redundant": redundant,
+                "implied_by": sorted(implied_by(without, name, dependency)) if redundant else [],
+                "saves_seconds": round(saves, 1),
+            })
+    return findings
+
+
+def implied_by(graph: dict, name: str, dependency: str) -> set:
+    """Input properties of `name` whose Outputs already wait for `dependency`."""
+    return {key for key, sources in graph[name]["inputs"].items()
+            if any(source == dependency or dependency in ancestors(graph, source) for source in sources)}
+
+
+def ancestors(graph: dict, name: str) -> set:
+    seen, stack = set(), list(graph[name]["dependencies"])
+    while stack:
+        current = stack.pop()
+        if current not in seen:
+            seen.add(current)
+            stack.extend(graph[current]["dependencies"])
+    return seen
+
+
+def analyze(stack: str, config: dict = None, duration_overrides: dict = None) -> dict:
+    mocks = run_program(stack, config=config)
+    graph = build_graph(mocks)
+    by_type = {**DEFAULT_DURATIONS, **(duration_overrides or {})}
+    durations = {name: by_type.get(node["type"], DEFAULT_DURATION) for name, node in graph.items()}
+    order = topological_order(graph)
+
+    finish = earliest_finish(graph, durations, order)
+    path = critical_path(graph, durations, order)
+    peak = peak_concurrency(graph, durations, order)
+    return {
+        "stack": stack,
+        "resources": len(graph),
+        "edges": sum(len(node["dependencies"]) for node in graph.values()),
+        "critical_path_seconds": max(finish.values(), default=0),
+        "critical_path": [
+            {"resource": name, "type": graph[name]["type"], "seconds": durations[name], "finishes_at": finish[name]}
+            for name in path
+        ],
+        "max_useful_parallel": peak,
+        "estimated_seconds_by_parallel": {
+            str(parallel): simulate(graph, durations, order, parallel)
+            for parallel in sorted(set(PARALLEL_LEVELS) | {peak})
+        },
+        "explicit_dependencies": explicit_dependency_findings(graph, durations, order),
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"stack {report['stack']}: {report['resources']} resources, {report['edges']} dependency edges",
+        f"critical path: {report['critical_path_seconds']:.0f}s",
+    ]
+    for step in report["critical_path"]:
+        lines.append(f"  {step['finishes_at']:>6.0f}s  +{step['seconds']:<4}  {step['resource']}  ({step['type']})")
+    lines.append(f"max useful --parallel: {report['max_useful_parallel']}")
+    for parallel, seconds in report["estimated_seconds_by_parallel"].items():
+        lines.append(f"  --parallel {parallel:>3}: ~{seconds:.0f}s")
+    if not report["explicit_dependencies"]:
+        lines.append("explicit depends_on: none")
+    for finding in report["explicit_dependencies"]:
+        if finding["redundant"]:
+            verdict = f"redundant, already implied by input {', '.join(finding['implied_by'])}"
+        else:
+            verdict = "ordering only, not implied by any input"
+        lines.append(f"explicit depends_on: {finding['resource']} -> {finding['depends_on']}: {verdict}; "
+                     f"removing it saves {finding['saves_seconds']:.0f}s")
+    return "\n".join(lines)
+
+
+def parse_config(values: list) -> dict:
+    config = {}
+    for value in values or []:
+        key, _, raw = value.partition("=")
+        config[key] = raw
+    return config
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stack", default="dev")
+    parser.add_argument("--config", action="append", metavar="KEY=VALUE",
+                        help="extra stack config, e.g. aws-infrastructure-setup:cache={\"enabled\": true}")
+    parser.add_argument("--durations", help="JSON file mapping resource type tokens to seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = None
+    if args.durations:
+        with open(args.durations) as f:
+            overrides = json.load(f)
+
+    report = analyze(args.stack, parse_config(args.config), overrides)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
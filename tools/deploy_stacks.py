@@ -0,0 +1,223 @@
+"""Preview or update several stacks at once through the Pulumi Automation API.
+
+Every stack with a Pulumi.<stack>.yaml next to Pulumi.yaml is a candidate. At most `--concurrency` stacks run at
+the same time, each one with the AWS profile from its own `aws:profile` setting. Engine events are streamed to
+stdout prefixed with the stack name, and the wall-clock time of every resource operation and of every stack is
+written as JSON.
+
+    python -m tools.deploy_stacks preview
+    python -m tools.deploy_stacks up --stacks dev demo --concurrency 2 --yes --output deploy-timings.json
+    python -m tools.deploy_stacks preview --backend-url file://~/.pulumi-local
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pulumi import automation as auto
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ("preview", "up")
+DEFAULT_CONCURRENCY = 2
+PROFILE_LINE = re.compile(r"^\s+aws:profile:\s*(\S+)\s*$")
+
+_print_lock = threading.Lock()
+
+
+def emit(stack: str, message: str):
+    with _print_lock:
+        print(f"[{stack}] {message}", flush=True)
+
+
+def discover_stacks(project_dir: str = PROJECT_DIR) -> list:
+    names = []
+    for entry in os.listdir(project_dir):
+        match = re.fullmatch(r"Pulumi\.(.+)\.yaml", entry)
+        if match:
+            names.append(match.group(1))
+    return sorted(names)
+
+
+def stack_profile(stack: str, project_dir: str = PROJECT_DIR):
+    """The `aws:profile` value of the stack's settings file, or None if it sets none."""
+    path = os.path.join(project_dir, f"Pulumi.{stack}.yaml")
+    with open(path) as f:
+        for line in f:
+            match = PROFILE_LINE.match(line)
+            if match:
+                return match.group(1).strip("'\"")
+    return None
+
+
+def resource_name(urn: str) -> str:
+    return urn.rsplit("::", 1)[-1]
+
+
+class EventRecorder:
+    """on_event callback that streams engine events and times every resource step."""
+
+    def __init__(self, stack: str, quiet: bool = False):
+        self.stack = stack
+        self.quiet = quiet
+        self.started = {}
+        self.resources = {}
+
+    def __call__(self, event: auto.EngineEvent):
+        now = time.monotonic()
+        if event.resource_pre_event:
+            step = event.resource_pre_event.metadata
+            self.started[step.urn] = now
+            if step.op != auto.OpType.SAME and not self.quiet:
+                emit(self.stack, f"{step.op.value:>8} {resource_name(step.urn)} ({step.type})")
+        elif event.res_outputs_event:
+            self.finish(event.res_outputs_event.metadata, now, "succeeded")
+        elif event.res_op_failed_event:
+            self.finish(event.res_op_failed_event.metadata, now, "failed")
+        elif event.diagnostic_event:
+            diagnostic = event.diagnostic_event
+            if diagnostic.severity in ("warning", "error") and not diagnostic.ephemeral:
+                emit(self.stack, f"{diagnostic.severity}: {diagnostic.message.strip()}")
+
+    def finish(self, step, now: float, status: str):
+        seconds = now - self.started.pop(step.urn, now)
+        self.resources[step.urn] = {
+            "name": resource_name(step.urn),
+            "type": step.type,
+            "op": step.op.value,
+            "status": status,
+            "seconds": round(seconds, 3),
+        }
+        if step.op != auto.OpType.SAME and not self.quiet:
+            emit(self.stack, f"{status:>8} {resource_name(step.urn)} {step.op.value} in {seconds:.1f}s")
+
+
+def select_stack(stack: str, backend_url: str = None, profile: str = None) -> auto.Stack:
+    """A workspace of its own for `stack`, with the AWS profile and backend in its environment."""
+    env_vars = {}
+    if profile:
+        env_vars["AWS_PROFILE"] = profile
+    if backend_url:
+        env_vars["PULUMI_BACKEND_URL"] = backend_url
+    return auto.select_stack(stack, work_dir=PROJECT_DIR, opts=auto.LocalWorkspaceOptions(env_vars=env_vars))
+
+
+def run_stack(stack: str, operation: str, workspace_stack: auto.Stack, parallel: int = None, profile: str = None,
+              quiet: bool = False) -> dict:
+    recorder = EventRecorder(stack, quiet)
+    start = time.monotonic()
+    report = {"stack": stack, "operation": operation, "profile": profile}
+    try:
+        emit(stack, f"{operation} started")
+        if operation == "up":
+            result = workspace_stack.up(parallel=parallel, on_event=recorder, color="never")
+            changes = result.summary.resource_changes or {}
+        else:
+            result = workspace_stack.preview(parallel=parallel, on_event=recorder, color="never")
+            changes = result.change_summary
+        # Preview summaries are keyed by OpType, update summaries by plain strings
+        report.update(status="succeeded", changes={getattr(op, "value", op): count for op, count in changes.items()})
+    except auto.errors.CommandError as error:
+        report.update(status="failed", error=str(error).strip())
+    report["seconds"] = round(time.monotonic() - start, 3)
+    report["resources"] = sorted(recorder.resources.values(), key=lambda r: r["seconds"], reverse=True)
+    emit(stack, f"{operation} {report['status']} in {report['seconds']:.1f}s")
+    return report
+
+
+def run_stacks(stacks: list, operation: str, concurrency: int = DEFAULT_CONCURRENCY, parallel: int = None,
+               backend_url: str = None, profiles: dict = None, quiet: bool = False) -> dict:
+    """Run `operation` on every stack with at most `concurrency` of them in flight."""
+    profiles = {stack: (profiles or {}).get(stack) or stack_profile(stack, PROJECT_DIR) for stack in stacks}
+    start = time.monotonic()
+
+    # Selecting runs `pulumi stack select`, which writes the project's shared workspace settings, so it
+    # happens one stack at a time; only the operations themselves run concurrently
+    reports, selected = {}, {}
+    for stack in stacks:
+        try:
+            selected[stack] = select_stack(stack, backend_url, profiles[stack])
+        except auto.errors.CommandError as error:
+            emit(stack, f"{operation} failed: could not select the stack")
+            reports[stack] = {"stack": stack, "operation": operation, "profile": profiles[stack],
+                              "status": "failed", "error": str(error).strip(), "seconds": 0.0, "resources": []}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            stack: pool.submit(run_stack, stack, operation, workspace_stack, parallel, profiles[stack], quiet)
+            for stack, workspace_stack in selected.items()
+        }
+        reports.update({stack: future.result() for stack, future in futures.items()})
+    reports = [reports[stack] for stack in stacks]
+    return {
+        "operation": operation,
+        "concurrency": concurrency,
+        "parallel": parallel,
+        "seconds": round(time.monotonic() - start, 3),
+        # Time the same stacks would have taken one after the other
+        "sequential_seconds": round(sum(report["seconds"] for report in reports), 3),
+        "stacks": reports,
+    }
+
+
+def format_summary(report: dict) -> str:
+    lines = [f"{report['operation']} of {len(report['stacks'])} stacks: {report['seconds']:.1f}s wall clock, "
+             f"{report['sequential_seconds']:.1f}s one after the other"]
+    for stack in report["stacks"]:
+        changes = ", ".join(f"{op} {count}" for op, count in sorted(stack.get("changes", {}).items()))
+        lines.append(f"  {stack['stack']:<12} {stack['status']:<9} {stack['seconds']:>7.1f}s  {changes}")
+        for resource in stack["resources"][:5]:
+            if resource["op"] != "same":
+                lines.append(f"      {resource['seconds']:>7.1f}s  {resource['op']:<8} {resource['name']}")
+    return "\n".join(lines)
+
+
+def parse_profiles(values: list) -> dict:
+    profiles = {}
+    for value in values or []:
+        stack, _, profile = value.partition("=")
+        profiles[stack] = profile
+    return profiles
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--stacks", nargs="+", help="stacks to run, by default every Pulumi.<stack>.yaml")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="stacks in flight at once")
+    parser.add_argument("--parallel", type=int, help="resource operations in flight per stack (pulumi --parallel)")
+    parser.add_argument("--backend-url", help="state backend, e.g. file://~/.pulumi-local; defaults to pulumi login")
+    parser.add_argument("--profile", action="append", metavar="STACK=PROFILE",
+                        help="AWS profile for a stack instead of its aws:profile setting")
+    parser.add_argument("--output", help="write the timing report as JSON to this file")
+    parser.add_argument("--quiet", action="store_true", help="only print start, finish and diagnostics")
+    parser.add_argument("--yes", action="store_true", help="required for up")
+    args = parser.parse_args(argv)
+
+    stacks = args.stacks or discover_stacks()
+    unknown = sorted(set(stacks) - set(discover_stacks()))
+    if unknown:
+        parser.error(f"no Pulumi.<stack>.yaml for {', '.join(unknown)}")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if shutil.which("pulumi") is None:
+        parser.error("the Automation API drives the pulumi CLI; install it and put it on PATH")
+    if args.operation == "up" and not args.yes:
+        parser.error(f"up changes {', '.join(stacks)}; pass --yes to confirm")
+
+    report = run_stacks(stacks, args.operation, args.concurrency, args.parallel, args.backend_url,
+                        parse_profiles(args.profile), args.quiet)
+    print(format_summary(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(stack["status"] == "succeeded" for stack in report["stacks"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+"""Open-model load test of the web app, checked against the stack's SLO thresholds.
+
+Requests arrive as a Poisson process at the profile's rate whether or not earlier ones have
+finished, so a slow target builds up requests in flight instead of quietly lowering the load.
+`ramp` raises the rate linearly from zero to `--rate` over `--duration`; `soak` ramps up over
+`--ramp` seconds and then holds `--rate` for `--duration`. Routes are picked by weight from the
+stack's `loadTest.routes`.
+
+The target is the stack's `domain-name`, which the `dnsRecord` alias points at the load balancer,
+or `--url`. `--local` starts a stand-in server in the same process instead, with a configurable
+latency and error rate, to try the harness and the SLO checks offline.
+
+Throughput, p50/p90/p99/p99.9 latency and the error rate are checked against the `observability`
+thresholds of the stack (and `loadTest.p999` and `loadTest.minThroughput`). The run exits non-zero
+when a check fails. `--output` writes the whole result as JSON; `--compare` prints the change
+against an earlier result.
+
+    python -m tools.load_test --stack dev --profile soak --rate 50 --duration 600 --output soak.json
+    python -m tools.load_test --url https://dev.example.com --profile ramp --rate 200 --duration 300
+    python -m tools.load_test --local --local-latency 40 --local-error-rate 0.5 --rate 100 --duration 30
+    python -m tools.load_test --stack dev --header 'Authorization: Basic ...' --compare soak.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import ssl
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import yaml
+
+from infra.observability import DEFAULT_OBSERVABILITY
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_NAME = "aws-infrastructure-setup"
+PROFILES = ("ramp", "soak")
+DEFAULT_LOAD_TEST = {
+    # Paths and their relative share of the requests
+    "routes": [
+        {"path": "/healthz", "weight": 1},
+        {"path": "/v1/assignments", "weight": 4},
+    ],
+    # Client-side p99.9 latency in milliseconds
+    "p999": 2500,
+    # Completed requests per second as a fraction of the offered rate
+    "minThroughput": 0.95,
+}
+# Percentiles reported and checked, as (name, fraction)
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p99.9", 0.999))
+# Seconds per timeline bucket
+TIMELINE_INTERVAL = 10
+
+
+def stack_config(stack: str, project_dir: str = PROJECT_DIR) -> dict:
+    """The project's settings from Pulumi.<stack>.yaml, without the project prefix."""
+    with open(os.path.join(project_dir, f"Pulumi.{stack}.yaml")) as f:
+        settings = (yaml.safe_load(f) or {}).get("config", {})
+    prefix = f"{PROJECT_NAME}:"
+    return {key[len(prefix):]: value for key, value in settings.items() if key.startswith(prefix)}
+
+
+def load_slo(settings: dict) -> dict:
+    """Thresholds from the stack's `observability` and `loadTest` objects over their defaults."""
+    observability = settings.get("observability") or {}
+    load_test = {**DEFAULT_LOAD_TEST, **(settings.get("loadTest") or {})}
+    latency = {**DEFAULT_OBSERVABILITY["latency"], **observability.get("latency", {})}
+    return {
+        "latencyMs": {**latency, "p99.9": load_test["p999"]},
+        "errorRate": observability.get("errorRate", DEFAULT_OBSERVABILITY["errorRate"]),
+        "minThroughput": load_test["minThroughput"],
+        "routes": load_test["routes"],
+    }
+
+
+def rate_at(profile: str, rate: float, ramp: float, elapsed: float) -> float:
+    if profile == "ramp":
+        return rate * elapsed / ramp
+    return rate * min(1.0, elapsed / ramp) if ramp else rate
+
+
+def arrivals(profile: str, rate: float, duration: float, ramp: float, rng: random.Random) -> list:
+    """Arrival offsets in seconds of a Poisson process following the profile's rate.
+
+    Candidates come at the peak rate and are thinned to the rate at their time, which follows a
+    changing rate exactly.
+    """
+    total = duration if profile == "ramp" else ramp + duration
+    ramp = duration if profile == "ramp" else ramp
+    times, elapsed = [], 0.0
+    while True:
+        elapsed += rng.expovariate(rate)
+        if elapsed >= total:
+            return times
+        if rng.random() * rate < rate_at(profile, rate, ramp, elapsed):
+            times.append(elapsed)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, opened on demand."""
+
+    def __init__(self, url: str, headers: dict):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.tls = parts.scheme == "https"
+        self.port = parts.port or (443 if self.tls else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.ssl_context = ssl.create_default_context() if self.tls else None
+        host_header = parts.netloc.rsplit("@", 1)[-1]
+        self.header_block = "".join(f"{name}: {value}\r\n" for name, value in
+                                    {"Host": host_header, "User-Agent": "webapp-load-test", **headers}.items())
+        self.idle = []
+        self.opened = 0
+
+    async def connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context,
+                                             server_hostname=self.host if self.tls else None)
+
+    async def get(self, path: str) -> int:
+        """GET `path` and return the status code."""
+        if self.idle:
+            try:
+                return await self.send(self.idle.pop(), path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed the idle connection in the meantime; retry on a new one
+                pass
+        return await self.send(await self.connect(), path)
+
+    async def send(self, connection, path: str) -> int:
+        try:
+            status, keep_alive = await self.exchange(connection, path)
+        except BaseException:
+            connection[1].close()
+            raise
+        if keep_alive:
+            self.idle.append(connection)
+        else:
+            connection[1].close()
+        return status
+
+    async def exchange(self, connection, path: str) -> tuple:
+        reader, writer = connection
+        writer.write(f"GET {self.base_path}{path} HTTP/1.1\r\n{self.header_block}\r\n".encode())
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        version, status = status_line.decode("latin-1").split()[:2]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+        else:
+            await reader.read()
+            keep_alive = False
+        return int(status), keep_alive
+
+    async def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for _, writer in self.idle), return_exceptions=True)
+        self.idle = []
+
+
+async def fire(pool: ConnectionPool, path: str, offset: float, timeout: float, results: list):
+    started = time.perf_counter()
+    try:
+        status = await asyncio.wait_for(pool.get(path), timeout)
+        error = None
+    except asyncio.TimeoutError:
+        status, error = None, "timeout"
+    except (OSError, ValueError, asyncio.IncompleteReadError) as exc:
+        status, error = None, type(exc).__name__
+    results.append({"path": path, "offset": offset, "status": status, "error": error,
+                    "ms": (time.perf_counter() - started) * 1000})
+
+
+async def generate(url: str, schedule: list, routes: list, headers: dict, timeout: float, max_in_flight: int,
+                   rng: random.Random) -> dict:
+    """Send one request per scheduled offset; returns the raw results and the counts around them."""
+    pool = ConnectionPool(url, headers)
+    paths = [route["path"] for route in routes]
+    weights = [route["weight"] for route in routes]
+    results, tasks, dropped = [], set(), Counter()
+    start = time.perf_counter()
+    for offset in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        path = rng.choices(paths, weights)[0]
+        # An open model never waits for capacity; past the cap a request counts as failed instead
+        if len(tasks) >= max_in_flight:
+            dropped[path] += 1
+            results.append({"path": path, "offset": offset, "status": None, "error": "dropped", "ms": None})
+            continue
+        task = asyncio.ensure_future(fire(pool, path, offset, timeout, results))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    return {"results": results, "seconds": elapsed, "connections": pool.opened}
+
+
+def percentile(values: list, fraction: float):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarise(results: list) -> dict:
+    latencies = sorted(result["ms"] for result in results if result["status"] is not None)
+    errors = sum(1 for result in results if is_error(result))
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "errorRate": round(100 * errors / len(results), 3) if results else 0,
+        "latencyMs": {
+            **{name: round_ms(percentile(latencies, fraction)) for name, fraction in PERCENTILES},
+            "mean": round_ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": round_ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def is_error(result: dict) -> bool:
+    """5xx answers and requests that got no answer, like the load balancer's error rate alarm counts."""
+    return result["status"] is None or result["status"] >= 500
+
+
+def round_ms(value):
+    return None if value is None else round(value, 2)
+
+
+def build_report(run: dict, schedule_seconds: float, slo: dict) -> dict:
+    results = run["results"]
+    report = summarise(results)
+    completed = sum(1 for result in results if result["status"] is not None)
+    report.update({
+        "offeredRate": round(len(results) / schedule_seconds, 3),
+        "throughput": round(completed / run["seconds"], 3),
+        "seconds": round(run["seconds"], 3),
+        "connections": run["connections"],
+        "statusCodes": dict(sorted(Counter(str(result["status"] or result["error"]) for result in results).items())),
+        "routes": {path: summarise([result for result in results if result["path"] == path])
+                   for path in sorted({result["path"] for result in results})},
+        "timeline": timeline(results),
+    })
+    report["slo"] = check_slo(report, slo)
+    return report
+
+
+def timeline(results: list) -> list:
+    """Per TIMELINE_INTERVAL seconds of arrival time, to see a soak degrade."""
+    buckets = {}
+    for result in results:
+        buckets.setdefault(int(result["offset"] // TIMELINE_INTERVAL), []).append(result)
+    return [{"second": index * TIMELINE_INTERVAL, **summarise(bucket)} for index, bucket in sorted(buckets.items())]
+
+
+def check_slo(report: dict, slo: dict) -> dict:
+    checks = [
+        {"name": f"latency {name}", "threshold": slo["latencyMs"][name], "actual": report["latencyMs"][name]}
+        for name, _ in PERCENTILES if name in slo["latencyMs"]
+    ]
+    checks.append({"name": "error rate", "threshold": slo["errorRate"], "actual": report["errorRate"]})
+    for check in checks:
+        check["passed"] = check["actual"] is not None and check["actual"] <= check["threshold"]
+    minimum = round(slo["minThroughput"] * report["offeredRate"], 3)
+    checks.append({"name": "throughput", "threshold": minimum, "actual": report["throughput"],
+                   "passed": report["throughput"] >= minimum})
+    return {"passed": all(check["passed"] for check in checks), "checks": checks}
+
+
+def compare(report: dict, previous: dict) -> str:
+    """Headline numbers of `report` next to those of an earlier result."""
+    rows = [("throughput", report["throughput"], previous.get("throughput")),
+            ("error rate", report["errorRate"], previous.get("errorRate"))]
+    rows += [(f"latency {name}", report["latencyMs"][name], previous.get("latencyMs", {}).get(name))
+             for name, _ in PERCENTILES]
+    lines = [f"{'':<14} {'previous':>10} {'now':>10} {'change':>9}"]
+    for name, now, before in rows:
+        change = f"{100 * (now - before) / before:+.1f}%" if now is not None and before else "n/a"
+        lines.append(f"{name:<14} {before if before is not None else '-':>10} {now if now is not None else '-':>10} "
+                     f"{change:>9}")
+    return "\n".join(lines)
+
+
+def format_summary(report: dict) -> str:
+    lines = [f"{report['target']}: {report['requests']} requests at {report['offeredRate']}/s offered, "
+             f"{report['throughput']}/s completed over {report['connections']} connections"]
+    lines.append(f"  status codes: {', '.join(f'{code} x{count}' for code, count in report['statusCodes'].items())}")
+    for path, route in report["routes"].items():
+        latency = route["latencyMs"]
+        lines.append(f"  {path}: {route['requests']} requests, {route['errorRate']}% errors, "
+                     f"p50 {latency['p50']} ms, p99 {latency['p99']} ms")
+    for check in report["slo"]["checks"]:
+        lines.append(f"  {'ok  ' if check['passed'] else 'FAIL'} {check['name']}: {check['actual']} "
+                     f"(limit {check['threshold']})")
+    lines.append("SLO " + ("met" if report["slo"]["passed"] else "missed"))
+    return "\n".join(lines)
+
+
+async def start_stand_in(latency_ms: float, error_rate: float, seed: int):
+    """A local server answering /healthz at once and every other path after a log-normal delay.
+
+    `error_rate` percent of those other requests get a 503. Returns the server and its base URL.
+    """
+    rng = random.Random(seed)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+
+                path = request_line.decode("latin-1").split()[1]
+                status, body = 200, b'{"status": "ok"}'
+                if path != "/healthz":
+                    await asyncio.sleep(latency_ms * rng.lognormvariate(0, 0.5) / 1000)
+                    if rng.random() * 100 < error_rate:
+                        status, body = 503, b'{"status": "unavailable"}'
+                reason = "OK" if status == 200 else "Service Unavailable"
+                writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run(args, slo: dict) -> dict:
+    rng = random.Random(args.seed)
+    schedule = arrivals(args.profile, args.rate, args.duration, args.ramp, rng)
+    schedule_seconds = args.duration if args.profile == "ramp" else args.ramp + args.duration
+
+    server, url = None, args.url
+    if args.local:
+        server, url = await start_stand_in(args.local_latency, args.local_error_rate, args.seed)
+    try:
+        headers = dict(header.split(":", 1) for header in args.header or [])
+        result = await generate(url, schedule, slo["routes"], {k.strip(): v.strip() for k, v in headers.items()},
+                                args.timeout, args.max_in_flight, rng)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    report = {
+        "target": "local stand-in" if args.local else url,
+        "stack": args.stack,
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "profile": {"name": args.profile, "rate": args.rate, "duration": args.duration, "ramp": args.ramp,
+                    "seed": args.seed},
+    }
+    report.update(build_report(result, schedule_seconds, slo))
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stack", default="dev", help="stack whose domain-name and SLO thresholds to use")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL instead of https://<domain-name>")
+    target.add_argument("--local", action="store_true", help="run against a local stand-in server")
+    parser.add_argument("--profile", choices=PROFILES, default="soak")
+    parser.add_argument("--rate", type=float, default=20, help="peak arrival rate in requests per second")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="seconds of the ramp, or of the steady phase of a soak")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds a soak takes to reach --rate")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds before a request counts as failed")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="requests in flight before new arrivals are dropped and counted as errors")
+    parser.add_argument("--header", action="append", metavar="'NAME: VALUE'", help="extra request header")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the arrival times and route choice")
+    parser.add_argument("--local-latency", type=float, default=20, help="median stand-in latency in milliseconds")
+    parser.add_argument("--local-error-rate", type=float, default=0, help="percent of stand-in requests to fail")
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    parser.add_argument("--compare", help="earlier JSON result to compare with")
+    args = parser.parse_args(argv)
+
+    if args.rate <= 0 or args.duration <= 0 or args.ramp < 0:
+        parser.error("--rate and --duration must be positive and --ramp not negative")
+    if not os.path.exists(os.path.join(PROJECT_DIR, f"Pulumi.{args.stack}.yaml")):
+        parser.error(f"no Pulumi.{args.stack}.yaml")
+    settings = stack_config(args.stack)
+    slo = load_slo(settings)
+    if not args.url and not args.local:
+        args.url = f"https://{settings['domain-name']}"
+    if args.header and any(":" not in header for header in args.header):
+        parser.error("--header takes 'NAME: VALUE'")
+
+    report = asyncio.run(run(args, slo))
+    print(format_summary(report))
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["slo"]["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
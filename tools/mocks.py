@@ -0,0 +1,196 @@
+"""Offline Pulumi mocks for evaluating the program without AWS or GCP credentials."""
+import atexit
+import json
+import os
+import tempfile
+from collections import Counter
+
+import pulumi
+import yaml
+from pulumi.runtime.mocks import MockMonitor
+
+from infra.availability_zones import CACHE_DIR_ENV
+from infra.lambda_build import CACHE_DIR_ENV as BUILD_CACHE_DIR_ENV
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_NAME = "aws-infrastructure-setup"
+
+# Extra outputs the program reads from resources beyond their inputs.
+RESOURCE_OUTPUTS = {
+    "aws:rds/instance:Instance": lambda name: {
+        "endpoint": f"{name}.mock.us-east-1.rds.amazonaws.com:3306",
+        "address": f"{name}.mock.us-east-1.rds.amazonaws.com",
+        "identifier": name,
+    },
+    "aws:rds/proxy:Proxy": lambda name: {
+        "endpoint": f"{name}.proxy-mock.us-east-1.rds.amazonaws.com",
+    },
+    "aws:route53/zone:Zone": lambda name: {
+        "zoneId": f"Z{name.upper().replace('-', '')}",
+    },
+    "aws:elasticache/replicationGroup:ReplicationGroup": lambda name: {
+        "primaryEndpointAddress": f"master.{name}.mock.use1.cache.amazonaws.com",
+        "readerEndpointAddress": f"replica.{name}.mock.use1.cache.amazonaws.com",
+        "configurationEndpointAddress": f"clustercfg.{name}.mock.use1.cache.amazonaws.com",
+    },
+    "aws:dax/cluster:Cluster": lambda name: {
+        "clusterAddress": f"{name}.mock.dax-clusters.us-east-1.amazonaws.com",
+    },
+    "aws:lb/loadBalancer:LoadBalancer": lambda name: {
+        "dnsName": f"{name}.us-east-1.elb.amazonaws.com",
+        "zoneId": "Z35SXDOTRQ7X7K",
+        "arnSuffix": f"app/{name}/50dc6c495c0c9188",
+    },
+    "aws:lb/targetGroup:TargetGroup": lambda name: {
+        "arnSuffix": f"targetgroup/{name}/73e2d6bc24d8a067",
+    },
+    "aws:ec2/launchTemplate:LaunchTemplate": lambda name: {
+        "latestVersion": 1,
+    },
+    "aws:lambda/function:Function": lambda name: {
+        "version": "1",
+    },
+    "aws:cloudfront/distribution:Distribution": lambda name: {
+        "domainName": f"{name}.cloudfront.net",
+        "hostedZoneId": "Z2FDTNDATAQYW2",
+    },
+    "gcp:serviceaccount/account:Account": lambda name: {
+        "email": f"{name}@mock.iam.gserviceaccount.com",
+    },
+    "gcp:serviceaccount/key:Key": lambda name: {
+        "privateKey": "bW9jaw==",
+    },
+}
+
+CALL_RESULTS = {
+    "aws:index/getAvailabilityZones:getAvailabilityZones": lambda args: {
+        "names": ["us-east-1a", "us-east-1b", "us-east-1c", "us-east-1d"],
+        "zoneIds": ["use1-az1", "use1-az2", "use1-az4", "use1-az6"],
+    },
+    "aws:ec2/getAmi:getAmi": lambda args: {
+        "id": args["filters"][0]["values"][0],
+        "rootDeviceName": "/dev/xvda",
+    },
+    "aws:ec2/getManagedPrefixList:getManagedPrefixList": lambda args: {
+        "id": "pl-3b927c52",
+        "name": args.get("name"),
+    },
+}
+
+
+class ProgramMocks(pulumi.runtime.Mocks):
+    """Records every resource registration and invoke the program makes."""
+
+    def __init__(self):
+        self.resources = []
+        self.calls = Counter()
+        # name -> {"type", "dependencies", "implicit", "inputs", "explicit"}; implicit ones come from
+        # Output inputs (per input property in "inputs"), explicit ones from depends_on
+        self.dependencies = {}
+        self.explicit_dependencies = {}
+
+    def record_explicit_dependencies(self, args: pulumi.ResourceTransformationArgs):
+        depends_on = args.opts.depends_on or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        self.explicit_dependencies[args.name] = {resource._name for resource in depends_on}
+        return None
+
+    def record_dependencies(self, request):
+        inputs = {
+            key: {urn_name(urn) for urn in property_dependencies.urns}
+            for key, property_dependencies in request.propertyDependencies.items() if property_dependencies.urns
+        }
+        self.dependencies[request.name] = {
+            "type": request.type,
+            "dependencies": {urn_name(urn) for urn in request.dependencies},
+            "implicit": set().union(*inputs.values()),
+            "inputs": inputs,
+            "explicit": self.explicit_dependencies.get(request.name, set()),
+        }
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.resources.append(args)
+        outputs = dict(args.inputs)
+        outputs.setdefault("arn", f"arn:aws:mock:us-east-1:000000000000:{args.name}")
+        # Stand in for auto-naming
+        outputs.setdefault("name", args.name)
+        outputs.update(RESOURCE_OUTPUTS.get(args.typ, lambda name: {})(args.name))
+        return f"{args.name}-id", outputs
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        self.calls[args.token] += 1
+        return CALL_RESULTS.get(args.token, lambda a: {})(args.args)
+
+    def resource_counts(self) -> Counter:
+        return Counter(resource.typ for resource in self.resources)
+
+
+class RecordingMonitor(MockMonitor):
+    """Mock monitor that also hands each registration's dependencies to the mocks."""
+
+    def RegisterResource(self, request):
+        if request.type != "pulumi:pulumi:Stack":
+            self.mocks.record_dependencies(request)
+        return super().RegisterResource(request)
+
+
+def urn_name(urn: str) -> str:
+    return urn.split("::")[-1]
+
+
+def load_stack_config(stack: str) -> dict:
+    """Read Pulumi.<stack>.yaml into the flat key/value map the runtime expects.
+
+    Secure values cannot be decrypted offline, so they are replaced by placeholders.
+    """
+    with open(os.path.join(PROJECT_DIR, f"Pulumi.{stack}.yaml")) as f:
+        values = (yaml.safe_load(f) or {}).get("config", {})
+
+    flat = {}
+    for key, value in values.items():
+        if isinstance(value, dict) and "secure" in value:
+            value = f"mock-secret-{key.split(':')[-1]}"
+        elif isinstance(value, (dict, list, bool)):
+            value = json.dumps(value)
+        else:
+            value = str(value)
+        flat[key] = value
+    return flat
+
+
+def temporary_cache_dir(env_var: str, prefix: str):
+    """Point `env_var` at a temporary directory removed at exit, unless the caller already set it."""
+    if env_var in os.environ:
+        return
+    directory = tempfile.TemporaryDirectory(prefix=prefix)
+    atexit.register(directory.cleanup)
+    os.environ[env_var] = directory.name
+
+
+def install(stack: str = "dev", preview: bool = True, config: dict = None) -> ProgramMocks:
+    """Point the Pulumi runtime at a fresh set of mocks and the given stack's config."""
+    # Keep mock zone names and test builds out of the operator's real caches.
+    temporary_cache_dir(CACHE_DIR_ENV, "az-cache-")
+    temporary_cache_dir(BUILD_CACHE_DIR_ENV, "lambda-build-cache-")
+
+    mocks = ProgramMocks()
+    stack_config = load_stack_config(stack)
+    stack_config.update(config or {})
+    pulumi.runtime.set_all_config(stack_config)
+    pulumi.runtime.set_mocks(mocks, project=PROJECT_NAME, stack=stack, preview=preview,
+                             monitor=RecordingMonitor(mocks))
+    pulumi.runtime.register_stack_transformation(mocks.record_explicit_dependencies)
+    return mocks
+
+
+def run_program(stack: str = "dev", preview: bool = True, config: dict = None) -> ProgramMocks:
+    """Evaluate infra.program.main() against mocks and wait for every registration to settle."""
+    from pulumi.runtime.stack import run_pulumi_func
+    from pulumi.runtime.sync_await import _sync_await
+
+    from infra.program import main
+
+    mocks = install(stack, preview, config)
+    _sync_await(run_pulumi_func(main))
+    return mocks
@@ -0,0 +1,155 @@
+"""Offline preview benchmark for the Pulumi program.
+
+Evaluates infra.program.main() against Pulumi mocks and reports how long the
+evaluation takes, how many resources and invokes it registers, how many
+Output.apply callbacks it builds and the peak memory of that graph.
+
+    python -m tools.preview_benchmark --stack dev
+    python -m tools.preview_benchmark --check            # fail on regressions against the baseline
+    python -m tools.preview_benchmark --update-baseline  # record the current numbers
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pulumi
+
+from infra.availability_zones import CACHE_DIR_ENV
+from tools.mocks import PROJECT_DIR, run_program
+
+BASELINE_PATH = os.path.join(PROJECT_DIR, "tools", "benchmark_baseline.json")
+
+# Wall-clock and memory numbers vary between machines, so only flag changes beyond these ratios.
+DEFAULT_TOLERANCES = {
+    "evaluation_seconds": 0.5,
+    "peak_memory_kib": 0.25,
+}
+COUNT_METRICS = ("resources", "invokes", "applies")
+
+
+@contextlib.contextmanager
+def count_applies():
+    """Count every Output.apply callback the program schedules while the context is open."""
+    counter = {"applies": 0}
+    original_apply = pulumi.Output.apply
+
+    def counting_apply(self, func, run_with_unknowns=False):
+        counter["applies"] += 1
+        return original_apply(self, func, run_with_unknowns)
+
+    pulumi.Output.apply = counting_apply
+    try:
+        yield counter
+    finally:
+        pulumi.Output.apply = original_apply
+
+
+@contextlib.contextmanager
+def cold_az_cache():
+    """Point the availability zone cache at an empty directory while the context is open.
+
+    Every run then looks the zones up again, as a fresh `pulumi preview` does, instead of only the first.
+    """
+    previous = os.environ.get(CACHE_DIR_ENV)
+    with tempfile.TemporaryDirectory(prefix="az-cache-") as directory:
+        os.environ[CACHE_DIR_ENV] = directory
+        try:
+            yield
+        finally:
+            if previous is None:
+                del os.environ[CACHE_DIR_ENV]
+            else:
+                os.environ[CACHE_DIR_ENV] = previous
+
+
+def benchmark(stack: str, iterations: int) -> dict:
+    """Evaluate the program `iterations` times and return the best timing plus graph metrics.
+
+    The best run is reported rather than the mean, as in timeit, since slower runs only add
+    scheduler and garbage collector noise.
+    """
+    timings = []
+    for _ in range(iterations):
+        with cold_az_cache():
+            started = time.perf_counter()
+            mocks = run_program(stack)
+            timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        with cold_az_cache(), count_applies() as applies:
+            run_program(stack)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "evaluation_seconds": round(min(timings), 4),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "resources": len(mocks.resources),
+        "invokes": sum(mocks.calls.values()),
+        "applies": applies["applies"],
+        "resources_by_type": dict(sorted(mocks.resource_counts().items())),
+        "invokes_by_token": dict(sorted(mocks.calls.items())),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerances: dict) -> list:
+    """Return a human readable line for every metric that regressed against the baseline."""
+    regressions = []
+    for metric, tolerance in tolerances.items():
+        limit = baseline[metric] * (1 + tolerance)
+        if result[metric] > limit:
+            regressions.append(f"{metric}: {result[metric]} > {baseline[metric]} (+{tolerance:.0%} allowed)")
+    for metric in COUNT_METRICS:
+        if result[metric] > baseline[metric]:
+            regressions.append(f"{metric}: {result[metric]} > {baseline[metric]}")
+    return regressions
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stack", action="append", help="stack config to evaluate (default: dev and demo)")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="exit non-zero when a metric regresses")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    stacks = args.stack or ["dev", "demo"]
+    baseline = load_baseline(args.baseline)
+    results = {stack: benchmark(stack, args.iterations) for stack in stacks}
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    failed = False
+    for stack, result in results.items():
+        if stack not in baseline:
+            print(f"{stack}: no baseline recorded", file=sys.stderr)
+            continue
+        for regression in compare(result, baseline[stack], DEFAULT_TOLERANCES):
+            print(f"{stack}: {regression}", file=sys.stderr)
+            failed = True
+    return 1 if failed and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Summarise MariaDB/MySQL slow query logs by query fingerprint, offline.
+
+Runs the parser the slow query Lambda uses (functions/slow_query/slowlog.py) over local
+log files, for example ones downloaded with `aws rds download-db-log-file-portion`, and
+prints the fingerprints ordered by total query time. `--check` verifies the parser
+without AWS: the hand-written cases in functions/slow_query/samples/fingerprints.json
+must fingerprint exactly as written there, and the sample logs must summarise to
+expected.json. Only expected.json is regenerated by `--update-expected`; review its diff.
+
+    python -m tools.slow_query_report mysql-slowquery.log
+    python -m tools.slow_query_report --top 5 --json logs/*.log
+    python -m tools.slow_query_report --check
+    python -m tools.slow_query_report --update-expected  # after an intentional parser change
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions", "slow_query")
+SAMPLES = os.path.join(SOURCE, "samples")
+EXPECTED = os.path.join(SAMPLES, "expected.json")
+# Hand-written statement -> fingerprint cases; never generated from the parser's own output
+FINGERPRINT_CASES = os.path.join(SAMPLES, "fingerprints.json")
+
+sys.path.insert(0, SOURCE)
+from slowlog import aggregate, fingerprint, parse  # noqa: E402
+
+
+def summarise(stats: dict) -> list:
+    """JSON-ready rows, slowest total first."""
+    rows = []
+    for key, item in stats.items():
+        rows.append({
+            "fingerprintId": key,
+            "fingerprint": item.fingerprint,
+            "count": item.count,
+            "totalTime": round(item.total_time, 6),
+            "avgTime": round(item.total_time / item.count, 6),
+            "maxTime": round(item.max_time, 6),
+            "totalLockTime": round(item.total_lock_time, 6),
+            "rowsExamined": item.total_rows_examined,
+            "databases": sorted(item.databases),
+            "lastSeen": item.last_seen,
+        })
+    return sorted(rows, key=lambda row: (-row["totalTime"], row["fingerprintId"]))
+
+
+def report_files(paths: list) -> list:
+    entries = []
+    for path in paths:
+        with open(path) as f:
+            entries.extend(parse(f.read()))
+    return summarise(aggregate(entries))
+
+
+def sample_reports() -> dict:
+    """sample file name -> its summary rows."""
+    return {
+        os.path.basename(path): report_files([path])
+        for path in sorted(glob.glob(os.path.join(SAMPLES, "*.log")))
+    }
+
+
+def check() -> list:
+    """Differences from fingerprints.json and expected.json, empty when everything matches."""
+    problems = []
+    with open(FINGERPRINT_CASES) as f:
+        for case in json.load(f):
+            actual = fingerprint(case["statement"])
+            if actual != case["fingerprint"]:
+                problems.append(f"{case['statement']!r}: expected {case['fingerprint']!r}, got {actual!r}")
+
+    with open(EXPECTED) as f:
+        expected = json.load(f)
+    actual = sample_reports()
+    for name in sorted(set(expected) | set(actual)):
+        if name not in actual:
+            problems.append(f"{name}: in expected.json but not in {SAMPLES}")
+        elif name not in expected:
+            problems.append(f"{name}: missing from expected.json")
+        elif actual[name] != expected[name]:
+            want = {row["fingerprintId"]: row for row in expected[name]}
+            got = {row["fingerprintId"]: row for row in actual[name]}
+            for key in sorted(set(want) | set(got)):
+                if want.get(key) != got.get(key):
+                    problems.append(f"{name}: {key}: expected {want.get(key)}, got {got.get(key)}")
+    return problems
+
+
+def print_table(rows: list):
+    print(f"{'count':>6} {'total s':>9} {'avg s':>8} {'max s':>8} {'rows exam.':>11}  fingerprint")
+    for row in rows:
+        print(f"{row['count']:>6} {row['totalTime']:>9.3f} {row['avgTime']:>8.3f} {row['maxTime']:>8.3f} "
+              f"{row['rowsExamined']:>11}  {row['fingerprint']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="*", help="slow query log files")
+    parser.add_argument("--top", type=int, default=20, help="number of fingerprints to show")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--check", action="store_true", help="check fingerprints.json and the sample logs")
+    parser.add_argument("--update-expected", action="store_true", help="rewrite expected.json from the sample logs")
+    args = parser.parse_args(argv)
+
+    if args.update_expected:
+        with open(EXPECTED, "w") as f:
+            json.dump(sample_reports(), f, indent=2)
+            f.write("\n")
+        print(f"wrote {EXPECTED}")
+        return 0
+    if args.check:
+        problems = check()
+        for problem in problems:
+            print(problem)
+        print("FAIL" if problems else "OK")
+        return 1 if problems else 0
+    if not args.logs:
+        parser.error("give at least one log file, or --check")
+
+    rows = report_files(args.logs)[:args.top]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())